@@ -0,0 +1,176 @@
+"""
+Headless JSON API next to the Gradio UI (app.py).
+
+POST /api/plan        {"user_request": str, "start_coordinates": {"lat", "lon"}, "time_budget_min"?: number}
+POST /api/plan/batch  {"requests": [<same as /api/plan>, ...]}
+POST /api/plan/fleet  {"user_request": str, "trucks": [{"start_coordinates", "truck_capacity", "time_budget_min"?}, ...]}
+DELETE /api/reservations/{reservation_id}   release the holds of a finished plan
+GET  /api/health     status, tool-cache hit ratios, backend circuit breakers, LLM stats per role
+
+Responses carry the structured approved_plan / approved_score instead of the
+formatted driver instructions.
+"""
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from bike_agent.agent.orchestrator import run_orchestration
+from bike_agent.agent.routing import route_stats
+from bike_agent.resilience import CircuitOpen, DeadlineExceeded, breaker_stats
+from bike_agent.tools.registry import tool_cache_stats
+from bike_agent.tools.reservations import get_ledger
+
+MAX_BATCH_SIZE = 50
+
+
+def _parse_request(item) -> dict:
+    if not isinstance(item, dict):
+        raise ValueError("request must be a JSON object")
+
+    coords = item.get("start_coordinates")
+    if not isinstance(coords, dict) or "lat" not in coords or "lon" not in coords:
+        raise ValueError("start_coordinates must be an object with keys 'lat' and 'lon'")
+
+    try:
+        lat, lon = float(coords["lat"]), float(coords["lon"])
+    except (TypeError, ValueError):
+        raise ValueError("start_coordinates.lat/lon must be numbers")
+
+    payload = {
+        "user_request": str(item.get("user_request") or "Give me my route for the coming hour."),
+        "start_coordinates": {"lat": lat, "lon": lon},
+    }
+    if item.get("time_budget_min") is not None:
+        try:
+            budget = float(item["time_budget_min"])
+        except (TypeError, ValueError):
+            raise ValueError("time_budget_min must be a number")
+        if budget <= 0:
+            raise ValueError("time_budget_min must be positive")
+        payload["time_budget_min"] = budget
+    return payload
+
+
+async def _read_json(request: Request):
+    try:
+        return await request.json()
+    except ValueError:
+        raise ValueError("body must be valid JSON")
+
+
+async def health(request: Request):
+    return JSONResponse({
+        "status": "ok",
+        "tool_cache": tool_cache_stats(),
+        "breakers": breaker_stats(),
+        "llm_roles": route_stats(),
+    })
+
+
+def _error_response(e: Exception) -> JSONResponse:
+    # 504: out of time, 503: a backend is known to be down, 502: anything else upstream
+    if isinstance(e, DeadlineExceeded):
+        return JSONResponse({"error": str(e)}, status_code=504)
+    if isinstance(e, CircuitOpen):
+        return JSONResponse({"error": str(e)}, status_code=503)
+    return JSONResponse({"error": str(e)}, status_code=502)
+
+
+async def plan(request: Request):
+    try:
+        task_payload = _parse_request(await _read_json(request))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    try:
+        out = await run_in_threadpool(run_orchestration, task_payload)
+    except Exception as e:
+        return _error_response(e)
+
+    return JSONResponse({
+        "start_coordinates": task_payload["start_coordinates"],
+        "approved_plan": out["approved_plan"],
+        "approved_score": out["approved_score"],
+        "reservation_id": out["reservation_id"],
+        "trace": out.get("trace"),
+    })
+
+
+async def plan_batch_endpoint(request: Request):
+    try:
+        body = await _read_json(request)
+        items = body.get("requests") if isinstance(body, dict) else None
+        if not isinstance(items, list) or not items:
+            raise ValueError("'requests' must be a non-empty list")
+        if len(items) > MAX_BATCH_SIZE:
+            raise ValueError(f"at most {MAX_BATCH_SIZE} requests per batch")
+        requests = [_parse_request(item) for item in items]
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    # Imported on first use: batch/fleet planning pull in pandas
+    from bike_agent.agent.batch import plan_batch
+
+    try:
+        results = await run_in_threadpool(plan_batch, requests)
+    except Exception as e:
+        return _error_response(e)
+
+    return JSONResponse({"results": results})
+
+
+async def plan_fleet_endpoint(request: Request):
+    try:
+        body = await _read_json(request)
+        items = body.get("trucks") if isinstance(body, dict) else None
+        if not isinstance(items, list) or not items:
+            raise ValueError("'trucks' must be a non-empty list")
+        if len(items) > MAX_BATCH_SIZE:
+            raise ValueError(f"at most {MAX_BATCH_SIZE} trucks per fleet")
+
+        trucks = []
+        for item in items:
+            truck = _parse_request(item)
+            # Fall back to the fleet-wide request unless this truck has its own
+            truck["user_request"] = item.get("user_request")
+            try:
+                truck["truck_capacity"] = int(item["truck_capacity"])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("every truck needs an integer truck_capacity")
+            trucks.append(truck)
+
+        user_request = str(body.get("user_request") or "Give me my route for the coming hour.")
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    from bike_agent.agent.fleet import plan_fleet
+
+    try:
+        out = await run_in_threadpool(plan_fleet, trucks, user_request)
+    except Exception as e:
+        return _error_response(e)
+
+    return JSONResponse(out)
+
+
+async def release_reservation(request: Request):
+    released = get_ledger().release(request.path_params["reservation_id"])
+    return JSONResponse({"released": released})
+
+
+api = Starlette(routes=[
+    Route("/api/health", health, methods=["GET"]),
+    Route("/api/plan", plan, methods=["POST"]),
+    Route("/api/plan/batch", plan_batch_endpoint, methods=["POST"]),
+    Route("/api/plan/fleet", plan_fleet_endpoint, methods=["POST"]),
+    Route("/api/reservations/{reservation_id}", release_reservation, methods=["DELETE"]),
+])
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(api, host="0.0.0.0", port=7861)
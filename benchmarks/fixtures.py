@@ -0,0 +1,109 @@
+# benchmarks/fixtures.py
+"""
+Recorded inputs for the benchmarks, replayed without any network access.
+
+- snapshot.json: station rows around a fixed start point (the planner's candidates)
+- osrm_table.json: recorded OSRM /table responses, keyed by the coordinate string
+- llm_session.json: recorded planner / critic completions for one request
+
+synthetic_snapshot(n) pads the recorded stations with n - len(recorded) filler
+stations further out than the planner's search radius, so the same recorded
+session stays valid at every snapshot size. OSRM tables for coordinates that
+were not recorded come from the local OSRM stand-in (bike_agent.tools.osrm_local).
+"""
+
+import json
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bike_agent.agent.llm_standin import ReplayLLM
+from bike_agent.tools.osrm_local import table_response
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+def load_json(name: str):
+    return json.loads((FIXTURES_DIR / name).read_text())
+
+
+def recorded_snapshot():
+    data = load_json("snapshot.json")
+    df = pd.DataFrame(data["stations"])
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+    return df, data["start_coordinates"]
+
+
+def synthetic_snapshot(n: int, seed: int = 0):
+    """Recorded stations plus filler stations 2.5-15 km from the start; n rows in total."""
+    df, start = recorded_snapshot()
+    extra = max(0, n - len(df))
+    rng = np.random.default_rng(seed)
+
+    bearing = rng.uniform(0, 2 * np.pi, extra)
+    radius_km = rng.uniform(2.5, 15.0, extra)
+    lat = start["lat"] + (radius_km / 111.0) * np.cos(bearing)
+    lon = start["lon"] + (radius_km / (111.0 * np.cos(np.radians(start["lat"])))) * np.sin(bearing)
+    capacity = rng.integers(10, 30, extra)
+    free = rng.integers(0, capacity + 1)
+
+    filler = pd.DataFrame({
+        "id": [f"s{i:06d}" for i in range(extra)],
+        "latitude": lat,
+        "longitude": lon,
+        "free_bikes": free,
+        "empty_slots": capacity - free,
+        "timestamp": df["timestamp"].iloc[0],
+    })
+    return pd.concat([df, filler], ignore_index=True).head(n), start
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+class ReplayOSRM:
+    """Stands in for the `requests` module inside get_distances."""
+
+    def __init__(self):
+        path = FIXTURES_DIR / "osrm_table.json"
+        self.recorded = json.loads(path.read_text()) if path.exists() else {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url, params=None, timeout=None):
+        coords = url.rsplit("/", 1)[1]
+        payload = self.recorded.get(coords)
+        if payload is None:
+            self.misses += 1
+            payload = table_response(coords)
+        else:
+            self.hits += 1
+        # Round-trip through JSON text so parsing cost is part of the measurement
+        return _Response(json.loads(json.dumps(payload)))
+
+
+def replay_llm():
+    """LLM stand-in replaying llm_session.json."""
+    return ReplayLLM(session=load_json("llm_session.json"))
+
+
+@contextmanager
+def patched(obj, name, value):
+    old = getattr(obj, name)
+    setattr(obj, name, value)
+    try:
+        yield value
+    finally:
+        setattr(obj, name, old)
@@ -0,0 +1,150 @@
+# benchmarks/load.py
+"""
+Load test: many concurrent synthetic requests through the orchestrator.
+
+    python -m benchmarks.load --requests 2000 --concurrency 200 --stations 1000
+
+In-process by default (LLM_BACKEND=scripted, OSRM_BASE_URL=local, pinned synthetic
+snapshot). With --url the same requests go to a running API instead, e.g.
+
+    LLM_BACKEND=scripted OSRM_BASE_URL=local python api.py
+    python -m benchmarks.load --url http://localhost:7861
+
+LLM_STANDIN_LATENCY_MS emulates model latency in the stand-in.
+"""
+
+import os
+
+# Offline by default: scripted LLM and in-process OSRM stand-in (set before bike_agent imports)
+os.environ.setdefault("LLM_BACKEND", "scripted")
+os.environ.setdefault("OSRM_BASE_URL", "local")
+
+import argparse
+import contextlib
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bike_agent.agent.orchestrator import get_ledger, run_orchestration
+from bike_agent.agent.routing import reset_stats, route_stats
+from bike_agent.tools.feature_store import use_snapshot
+
+from benchmarks.fixtures import synthetic_snapshot
+
+
+def _starts(snapshot, n, seed=0):
+    """Request start points next to random stations, so requests spread over the network."""
+    rng = np.random.default_rng(seed)
+    rows = snapshot.iloc[rng.integers(0, len(snapshot), n)]
+    jitter = rng.normal(0, 0.001, (n, 2))
+    return [
+        {"lat": float(lat + d[0]), "lon": float(lon + d[1])}
+        for lat, lon, d in zip(rows["latitude"], rows["longitude"], jitter)
+    ]
+
+
+def _in_process(snapshot, keep_reservations):
+    def one(start):
+        with use_snapshot(snapshot):
+            out = run_orchestration({"user_request": "Load test request.", "start_coordinates": start})
+        if not keep_reservations:
+            get_ledger().release(out["reservation_id"])
+        return out["trace"]["llm"]["calls"]
+    return one
+
+
+def _over_http(url, keep_reservations):
+    import requests
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=1024)
+    session.mount("http://", adapter)
+
+    def one(start):
+        r = session.post(f"{url}/api/plan", json={"user_request": "Load test request.", "start_coordinates": start}, timeout=300)
+        r.raise_for_status()
+        body = r.json()
+        if not keep_reservations:
+            session.delete(f"{url}/api/reservations/{body['reservation_id']}", timeout=30)
+        return (body.get("trace") or {}).get("llm", {}).get("calls", 0)
+    return one
+
+
+def run(requests=1000, concurrency=100, stations=1000, url=None, keep_reservations=False, seed=0) -> dict:
+    snapshot, _ = synthetic_snapshot(stations, seed=seed)
+    one = _over_http(url.rstrip("/"), keep_reservations) if url else _in_process(snapshot, keep_reservations)
+
+    latencies = []
+    errors = []
+    llm_calls = 0
+
+    def timed(start):
+        t0 = time.perf_counter()
+        try:
+            calls = one(start)
+            return (time.perf_counter() - t0) * 1000.0, calls, None
+        except Exception as e:
+            return (time.perf_counter() - t0) * 1000.0, 0, f"{type(e).__name__}: {e}"
+
+    reset_stats()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for ms, calls, err in pool.map(timed, _starts(snapshot, requests, seed)):
+            latencies.append(ms)
+            llm_calls += calls
+            if err:
+                errors.append(err)
+    elapsed = time.perf_counter() - started
+
+    if url:
+        import requests as http
+
+        roles = http.get(f"{url.rstrip('/')}/api/health", timeout=10).json().get("llm_roles", {})
+    else:
+        roles = route_stats()
+
+    t = np.asarray(latencies)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "stations": stations,
+        "errors": len(errors),
+        "first_errors": errors[:5],
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(float(np.percentile(t, 50)), 1),
+        "p90_ms": round(float(np.percentile(t, 90)), 1),
+        "p99_ms": round(float(np.percentile(t, 99)), 1),
+        "llm_calls": llm_calls,
+        # Server-wide since its start in --url mode
+        "llm_roles": roles,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive concurrent synthetic requests through the orchestrator.")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--stations", type=int, default=1000, help="Synthetic snapshot size (in-process mode).")
+    parser.add_argument("--url", default=None, help="Base URL of a running API instead of in-process calls.")
+    parser.add_argument("--keep-reservations", action="store_true",
+                        help="Do not release each plan's holds (exercises reservation conflicts).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    result = run(
+        requests=args.requests,
+        concurrency=args.concurrency,
+        stations=args.stations,
+        url=args.url,
+        keep_reservations=args.keep_reservations,
+        seed=args.seed,
+    )
+    for k, v in result.items():
+        print(f"{k:<16} {v}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/record.py
+"""
+Refresh the benchmark fixtures from live services (feature store, OSRM, OpenAI).
+
+    python -m benchmarks.record --lat 39.5648 --lon 2.6549
+
+Runs one real orchestration and stores the stations near the start point, every
+OSRM /table response and every LLM completion it saw.
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+import bike_agent.agent.orchestrator as orch_mod
+import bike_agent.tools.get_distances as gd
+from bike_agent.tools.feature_store import get_latest_features
+
+from benchmarks.fixtures import FIXTURES_DIR, patched
+
+
+class _RecordingRequests:
+    def __init__(self, real):
+        self.real = real
+        self.tables = {}
+
+    def get(self, url, params=None, timeout=None):
+        response = self.real.get(url, params=params, timeout=timeout)
+        if "/table/" in url and response.ok:
+            self.tables[url.rsplit("/", 1)[1]] = response.json()
+        return response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record benchmark fixtures from live services.")
+    parser.add_argument("--lat", type=float, default=39.5648)
+    parser.add_argument("--lon", type=float, default=2.6549)
+    parser.add_argument("--keep", type=int, default=40, help="Stations nearest to the start to keep in snapshot.json.")
+    parser.add_argument("--user-request", default="Plan a short rebalancing route and keep it under 1 hour.")
+    args = parser.parse_args(argv)
+
+    latest = get_latest_features(api_key=os.getenv("HOPSWORKS_API_KEY"))
+    dist = np.hypot(latest["latitude"] - args.lat, latest["longitude"] - args.lon)
+    near = latest.loc[dist.sort_values().index[:args.keep]].copy()
+    near["timestamp"] = near["timestamp"].astype(str)
+    cols = ["id", "latitude", "longitude", "free_bikes", "empty_slots", "timestamp"]
+
+    session = {"planner": [], "critic": []}
+    real_call_llm = orch_mod.call_llm
+
+    def recording_call_llm(llm_input):
+        out = real_call_llm(llm_input)
+        role = "critic" if llm_input.get("system_prompt") == orch_mod.CRITIC_SYSTEM_PROMPT else "planner"
+        session[role].append(out)
+        return out
+
+    recorder = _RecordingRequests(gd.requests)
+    with patched(orch_mod, "call_llm", recording_call_llm), patched(gd, "requests", recorder):
+        out = orch_mod.run_orchestration({
+            "user_request": args.user_request,
+            "start_coordinates": {"lat": args.lat, "lon": args.lon},
+        })
+    orch_mod.get_ledger().release(out["reservation_id"])
+
+    FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+    (FIXTURES_DIR / "snapshot.json").write_text(json.dumps({
+        "start_coordinates": {"lat": args.lat, "lon": args.lon},
+        "stations": near[cols].to_dict(orient="records"),
+    }, indent=1))
+    (FIXTURES_DIR / "osrm_table.json").write_text(json.dumps(recorder.tables))
+    (FIXTURES_DIR / "llm_session.json").write_text(json.dumps(session, indent=1))
+    print(f"Recorded {len(near)} stations, {len(recorder.tables)} OSRM tables, "
+          f"{len(session['planner'])} planner / {len(session['critic'])} critic completions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+# benchmarks/run.py
+"""
+Benchmarks for the tools, validators, serialization and the full orchestrator,
+replaying recorded fixtures (no network, no API keys).
+
+    python -m benchmarks.run                      # all benchmarks, all sizes
+    python -m benchmarks.run --only nearby,validate --sizes 100,100000
+    python -m benchmarks.run --check              # exit 1 on regressions vs baseline.json
+                                                  # or on import-time budget violations
+    python -m benchmarks.run --update-baseline
+
+Sizes are snapshot station counts, except for get_distances where they are the
+number of candidates sent to OSRM (its /table endpoint caps at 100 by default).
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+import bike_agent.agent.orchestrator as orch_mod
+import bike_agent.tools.get_distances as gd
+from bike_agent.agent.serialization import encoded
+from bike_agent.tools.feature_store import use_snapshot
+from bike_agent.tools.get_nearby_stations import get_nearby_stations
+from bike_agent.tools.score_plan import score_plan
+from bike_agent.tools.station_table import StationTable
+from bike_agent.tools.validate_plan import validate_plan
+
+from benchmarks.fixtures import ReplayOSRM, load_json, patched, replay_llm, synthetic_snapshot
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+SIZES = (100, 1000, 10000, 100000)
+DISTANCE_SIZES = (10, 25, 50, 100)
+# A p50 must be this much slower (relative and absolute) to count as a regression
+TOLERANCE = 0.25
+NOISE_MS = 0.5
+
+# Cold start: importing these (in a fresh interpreter) must stay within budget and
+# must not load any of HEAVY_MODULES; they are imported on first use instead
+IMPORT_BUDGETS_MS = {
+    "bike_agent.agent.orchestrator": 300,
+    "api": 600,
+}
+HEAVY_MODULES = ("pandas", "pyarrow", "openai", "hopsworks", "dotenv", "gradio")
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _recorded_plan():
+    session = load_json("llm_session.json")
+    plans = [json.loads(m) for m in session["planner"]]
+    return next(p for p in plans if p.get("type") == "PLAN")
+
+
+def _station_context(n):
+    df, _ = synthetic_snapshot(n)
+    records = orch_mod.serialize_tool_result(StationTable.from_frame(df))
+    return {"get_nearby_stations": records, "nearby_stations": records}
+
+
+# Each setup returns a zero-argument callable that is timed
+
+
+def setup_nearby(n):
+    df, start = synthetic_snapshot(n)
+
+    def run():
+        with use_snapshot(df):
+            return get_nearby_stations(8, 1.6, start["lat"], start["lon"])
+    return run
+
+
+def setup_distances(n):
+    df, start = synthetic_snapshot(n)
+    stations = df[["id", "latitude", "longitude"]].head(n).to_dict(orient="records")
+    osrm = ReplayOSRM()
+
+    def run():
+        with patched(gd, "requests", osrm):
+            return gd.get_distances(stations, start_coordinates=start)
+    return run
+
+
+def setup_validate(n):
+    context = _station_context(n)
+    plan = _recorded_plan()
+    return lambda: validate_plan(plan, context)
+
+
+def setup_score(n):
+    context = _station_context(n)
+    plan = _recorded_plan()
+    return lambda: score_plan(plan, context)
+
+
+def setup_serialize(n):
+    df, _ = synthetic_snapshot(n)
+    table = StationTable.from_frame(df)
+    # A fresh result every call, so the encoding is never served from the cache
+    return lambda: encoded(orch_mod.serialize_tool_result(table))
+
+
+def setup_orchestrator(n):
+    df, start = synthetic_snapshot(n)
+    llm = replay_llm()
+    osrm = ReplayOSRM()
+    payload = {"user_request": "Plan a short rebalancing route and keep it under 1 hour.", "start_coordinates": start}
+
+    def run():
+        llm.reset()
+        with use_snapshot(df), patched(orch_mod, "call_llm", llm), patched(gd, "requests", osrm):
+            out = orch_mod.run_orchestration(payload)
+        orch_mod.get_ledger().release(out["reservation_id"])
+        return orch_mod.format_final_instructions(out)
+    return run
+
+
+BENCHMARKS = {
+    "nearby": (setup_nearby, SIZES),
+    "distances": (setup_distances, DISTANCE_SIZES),
+    "validate": (setup_validate, SIZES),
+    "score": (setup_score, SIZES),
+    "serialize": (setup_serialize, SIZES),
+    "orchestrator": (setup_orchestrator, SIZES),
+}
+
+
+def measure(fn, repeat=20, max_seconds=5.0) -> dict:
+    """Latency percentiles over up to `repeat` runs, plus peak traced allocation of one run."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()  # warm-up
+
+        times = []
+        deadline = time.perf_counter() + max_seconds
+        while len(times) < repeat and (len(times) < 3 or time.perf_counter() < deadline):
+            t0 = time.perf_counter()
+            fn()
+            times.append((time.perf_counter() - t0) * 1000.0)
+
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    t = np.asarray(times)
+    return {
+        "runs": len(times),
+        "p50_ms": round(float(np.percentile(t, 50)), 3),
+        "p90_ms": round(float(np.percentile(t, 90)), 3),
+        "p99_ms": round(float(np.percentile(t, 99)), 3),
+        "mean_ms": round(float(t.mean()), 3),
+        "peak_alloc_kib": round(peak / 1024.0, 1),
+    }
+
+
+_IMPORT_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+ms = (time.perf_counter() - t0) * 1000.0
+print(json.dumps({{"ms": ms, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(module: str, repeat=5) -> dict:
+    """Import time of `module` in fresh interpreters, and which heavy modules it loaded."""
+    times = []
+    heavy = set()
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+        )
+        probe = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(probe["ms"])
+        heavy.update(probe["heavy"])
+
+    t = np.asarray(times)
+    return {
+        "runs": repeat,
+        "p50_ms": round(float(np.percentile(t, 50)), 3),
+        "p90_ms": round(float(np.percentile(t, 90)), 3),
+        "p99_ms": round(float(np.percentile(t, 99)), 3),
+        "mean_ms": round(float(t.mean()), 3),
+        "heavy_modules": sorted(heavy),
+    }
+
+
+def check_imports(results: dict, budgets=None) -> list:
+    """Import benchmarks over their absolute budget or loading heavy modules."""
+    budgets = IMPORT_BUDGETS_MS if budgets is None else budgets
+    failures = []
+    for module, budget in budgets.items():
+        stats = results.get(f"import/{module}")
+        if stats is None:
+            continue
+        if stats["p50_ms"] > budget:
+            failures.append(f"import/{module}: p50 {stats['p50_ms']:.1f} ms over the {budget} ms budget")
+        if stats["heavy_modules"]:
+            failures.append(f"import/{module}: loads {', '.join(stats['heavy_modules'])} at import time")
+    return failures
+
+
+def compare(results: dict, baseline: dict, tolerance=TOLERANCE, noise_ms=NOISE_MS) -> list:
+    """Keys whose p50 regressed beyond tolerance (relative) and noise_ms (absolute)."""
+    regressions = []
+    for key, cur in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if cur["p50_ms"] > base["p50_ms"] * (1 + tolerance) and cur["p50_ms"] - base["p50_ms"] > noise_ms:
+            regressions.append(f"{key}: p50 {base['p50_ms']:.3f} → {cur['p50_ms']:.3f} ms")
+    return regressions
+
+
+def run(only=None, sizes=None, repeat=20, max_seconds=5.0) -> dict:
+    results = {}
+    if not only or "import" in only:
+        for module in IMPORT_BUDGETS_MS:
+            stats = measure_import(module)
+            results[f"import/{module}"] = stats
+            print(f"{'import/' + module:<40} p50 {stats['p50_ms']:>10.3f} ms   p90 {stats['p90_ms']:>10.3f} ms   "
+                  f"heavy: {', '.join(stats['heavy_modules']) or '-'}")
+
+    for name, (setup, default_sizes) in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        for n in (sizes or default_sizes) if name != "distances" else default_sizes:
+            stats = measure(setup(n), repeat=repeat, max_seconds=max_seconds)
+            results[f"{name}/{n}"] = stats
+            print(f"{name + '/' + str(n):<24} p50 {stats['p50_ms']:>10.3f} ms   p90 {stats['p90_ms']:>10.3f} ms   "
+                  f"p99 {stats['p99_ms']:>10.3f} ms   peak {stats['peak_alloc_kib']:>10.1f} KiB   ({stats['runs']} runs)")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite against recorded fixtures.")
+    parser.add_argument("--only", default=None, help=f"Comma-separated subset of: import, {', '.join(BENCHMARKS)}")
+    parser.add_argument("--sizes", default=None, help="Comma-separated station counts (default 100..100000).")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per benchmark and size.")
+    parser.add_argument("--max-seconds", type=float, default=5.0, help="Time budget per benchmark and size.")
+    parser.add_argument("--json", default=None, help="Write results to this file.")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--check", action="store_true", help="Exit 1 if any p50 regressed against the baseline.")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    only = set(args.only.split(",")) if args.only else None
+    sizes = [int(s) for s in args.sizes.split(",")] if args.sizes else None
+    results = run(only=only, sizes=sizes, repeat=args.repeat, max_seconds=args.max_seconds)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=1))
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        baseline.update(results)
+        baseline_path.write_text(json.dumps(baseline, indent=1, sort_keys=True))
+        print(f"Baseline updated ({platform.python_version()}, {platform.machine()}): {baseline_path}")
+
+    if args.check:
+        if not baseline_path.exists():
+            print(f"No baseline at {baseline_path}")
+            return 1
+        regressions = check_imports(results)
+        regressions += compare(results, json.loads(baseline_path.read_text()), tolerance=args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for r in regressions:
+                print(f"  {r}")
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
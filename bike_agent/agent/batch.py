@@ -0,0 +1,133 @@
+# bike_agent/agent/batch.py
+"""
+Batch planning: plan routes for several trucks in one call.
+
+The feature snapshot is read once and the OSRM matrix is fetched once for the
+union of all trucks' candidate stations. Each truck's context is pre-seeded with
+its own nearby stations and distances, so the planner can go straight to a PLAN.
+
+Up to BATCH_WORKERS requests are planned concurrently, so a batch takes about
+as long as its slowest few requests rather than the sum of all LLM round-trips.
+Each request sees the holds made before it started; overlaps between requests
+planned at the same time are caught by the reservation check at reserve time.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+from bike_agent.agent.orchestrator import run_orchestration, serialize_tool_result
+from bike_agent.tools.candidates import DEFAULT_TIME_BUDGET_MIN, select_candidates
+from bike_agent.tools.feature_store import get_features, use_snapshot
+from bike_agent.tools.get_nearby_stations import get_nearby_stations
+from bike_agent.tools.get_distances import get_distance_matrix, distances_from_matrix
+from bike_agent.tools.reservations import get_ledger, subtract_holds
+
+DEFAULT_K = 8
+DEFAULT_RADIUS_KM = 2.0
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))
+
+
+def _start_id(i: int) -> str:
+    return f"start:{i}"
+
+
+def prepare_batch_contexts(requests: list, k: int = DEFAULT_K, radius_km: float = DEFAULT_RADIUS_KM) -> list:
+    """
+    Build one pre-seeded context per request from a single snapshot + distance matrix.
+    Must be called inside `use_snapshot(...)` if the snapshot should be shared.
+    """
+    nearby_per_request = []
+    candidates_per_request = []
+    points = {}
+
+    for i, req in enumerate(requests):
+        start = req["start_coordinates"]
+        nearby = get_nearby_stations(k, radius_km, float(start["lat"]), float(start["lon"]))
+        records = serialize_tool_result(nearby)
+        nearby_per_request.append(records)
+        # Only the most valuable stations go into the shared OSRM matrix
+        candidates = select_candidates(
+            records, start, time_budget_min=float(req.get("time_budget_min") or DEFAULT_TIME_BUDGET_MIN)
+        )
+        candidates_per_request.append(candidates)
+
+        points[_start_id(i)] = (float(start["lat"]), float(start["lon"]))
+        for s in candidates:
+            points.setdefault(str(s["id"]), (float(s["latitude"]), float(s["longitude"])))
+
+    matrix = get_distance_matrix(
+        [{"id": sid, "latitude": lat, "longitude": lon} for sid, (lat, lon) in points.items()]
+    )
+
+    contexts = []
+    for i, (records, candidates) in enumerate(zip(nearby_per_request, candidates_per_request)):
+        ids = [_start_id(i)] + [str(s["id"]) for s in candidates]
+        distances = distances_from_matrix(matrix, ids, rename={_start_id(i): "start"})
+        contexts.append({
+            "get_nearby_stations": records,
+            "nearby_stations": records,
+            "get_distances": distances,
+        })
+
+    return contexts
+
+
+def plan_batch(
+    requests: list, k: int = DEFAULT_K, radius_km: float = DEFAULT_RADIUS_KM, max_workers: int = BATCH_WORKERS
+) -> list:
+    """
+    requests: list of {"user_request": str, "start_coordinates": {"lat", "lon"}, "time_budget_min"?: number}
+    max_workers: requests planned concurrently (1: one after the other)
+
+    Returns one result per request, in order:
+      {"start_coordinates", "approved_plan", "approved_score"} or {"start_coordinates", "error"}
+    """
+    if not requests:
+        return []
+
+    snapshot = get_features(api_key=os.getenv("HOPSWORKS_API_KEY"))
+
+    ledger = get_ledger()
+    with use_snapshot(snapshot):
+        since = ledger.seq()
+        contexts = prepare_batch_contexts(requests, k=k, radius_km=radius_km)
+
+        def plan_one(req, ctx):
+            print(f"\n[BATCH] Planning for start {req['start_coordinates']}")
+            # Other trucks in this batch may have reserved since the contexts were built.
+            # Take the seq first: holds up to `seen` are subtracted here and reserve()
+            # re-checks everything after it, so nothing slips between the two reads
+            seen = ledger.seq()
+            held = ledger.holds(since=since)
+            if held:
+                for key in ("get_nearby_stations", "nearby_stations"):
+                    ctx[key] = subtract_holds(ctx[key], held)
+            task_payload = {
+                "user_request": req.get("user_request", ""),
+                "start_coordinates": req["start_coordinates"],
+                "context": ctx,
+            }
+            if req.get("time_budget_min") is not None:
+                task_payload["time_budget_min"] = req["time_budget_min"]
+            try:
+                out = run_orchestration(task_payload, reservation_since=seen)
+            except Exception as e:
+                return {"start_coordinates": req["start_coordinates"], "error": str(e)}
+
+            return {
+                "start_coordinates": req["start_coordinates"],
+                "approved_plan": out["approved_plan"],
+                "approved_score": out["approved_score"],
+                "reservation_id": out["reservation_id"],
+                "trace": out.get("trace"),
+            }
+
+        workers = max(1, min(max_workers, len(requests)))
+        if workers == 1:
+            return [plan_one(req, ctx) for req, ctx in zip(requests, contexts)]
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # copy_context: workers keep the pinned snapshot
+            futures = [pool.submit(copy_context().run, plan_one, req, ctx) for req, ctx in zip(requests, contexts)]
+            return [f.result() for f in futures]
@@ -0,0 +1,212 @@
+# bike_agent/agent/dispatch.py
+"""
+Concurrent LLM dispatch for batch / fleet planning and replays.
+
+- RateLimits: process-wide RPM / TPM token buckets (LLM_RPM, LLM_TPM). Every
+  OpenAI call waits for its share first, so many concurrent requests slow down
+  smoothly instead of failing with 429s.
+- AsyncClientPool: one AsyncOpenAI client with a pooled HTTP connection limit,
+  running on a background event loop. With LLM_DISPATCH=async, call_llm sends
+  its request through it, so concurrent planner/critic calls from any thread
+  share keep-alive connections.
+- dispatch_many(): run many independent call_llm inputs concurrently.
+- submit_batch() / batch_results(): the provider's Batch API for single-turn,
+  non-urgent prompts (e.g. pre-seeded batch contexts planned overnight); cheaper,
+  with results within the completion window.
+"""
+
+import asyncio
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextvars import copy_context
+
+from bike_agent.resilience import DeadlineExceeded, check, remaining
+
+LLM_RPM = float(os.getenv("LLM_RPM", "500"))
+LLM_TPM = float(os.getenv("LLM_TPM", "200000"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+LLM_DISPATCH_CONCURRENCY = int(os.getenv("LLM_DISPATCH_CONCURRENCY", "16"))
+
+
+class TokenBucket:
+    """Refills at per_minute / 60 per second up to per_minute (0 or less: unlimited)."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, n: float = 1.0) -> float:
+        """Block until n tokens are available (respecting the current deadline). Returns seconds waited."""
+        if self.capacity <= 0:
+            return 0.0
+        n = min(float(n), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= n:
+                    self._tokens -= n
+                    return waited
+                wait = (n - self._tokens) / self.rate
+
+            check("rate limit wait")
+            left = remaining()
+            if left is not None and left < wait:
+                raise DeadlineExceeded(f"rate limit: {wait:.1f}s wait exceeds the remaining deadline")
+            time.sleep(min(wait, 1.0))
+            waited += min(wait, 1.0)
+
+    def refund(self, n: float) -> None:
+        """Give back (or, if negative, take) tokens once the actual cost is known."""
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + n)
+
+
+class RateLimits:
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def acquire(self, est_tokens: int) -> float:
+        return self.requests.acquire(1) + self.tokens.acquire(est_tokens)
+
+    def settle(self, est_tokens: int, actual_tokens: int) -> None:
+        if actual_tokens:
+            self.tokens.refund(est_tokens - actual_tokens)
+
+
+_LIMITS = {"limits": None}
+_LIMITS_LOCK = threading.Lock()
+
+
+def rate_limits() -> RateLimits:
+    if _LIMITS["limits"] is None:
+        with _LIMITS_LOCK:
+            if _LIMITS["limits"] is None:
+                _LIMITS["limits"] = RateLimits()
+    return _LIMITS["limits"]
+
+
+def estimate_tokens(body: dict) -> int:
+    """Upper estimate of a request's TPM cost: ~4 characters per prompt token plus max_tokens."""
+    chars = sum(len(m.get("content") or "") for m in body.get("messages", []))
+    if body.get("tools"):
+        chars += len(json.dumps(body["tools"]))
+    return chars // 4 + int(body.get("max_tokens") or 0)
+
+
+class AsyncClientPool:
+    """AsyncOpenAI on a background event loop, usable from any thread."""
+
+    def __init__(self, api_key: str, max_connections: int = LLM_MAX_CONNECTIONS):
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self._client = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-dispatch", daemon=True)
+        self._thread.start()
+
+    async def _create(self, body: dict, timeout: float):
+        if self._client is None:
+            import httpx
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            self._client = AsyncOpenAI(api_key=self.api_key, http_client=DefaultAsyncHttpxClient(limits=limits))
+        return await self._client.chat.completions.create(**body, timeout=timeout)
+
+    def create(self, body: dict, timeout: float):
+        future = asyncio.run_coroutine_threadsafe(self._create(body, timeout), self._loop)
+        try:
+            # The SDK enforces `timeout` per attempt; allow for its retries before giving up
+            return future.result(timeout=timeout * 3)
+        except FutureTimeout:
+            future.cancel()
+            raise DeadlineExceeded(f"llm call timed out after {timeout:.1f}s")
+
+
+def dispatch_many(inputs: list, max_concurrency: int = LLM_DISPATCH_CONCURRENCY) -> list:
+    """
+    call_llm for independent inputs, up to max_concurrency at a time.
+    Results are in input order; a failed call's exception is returned in its place.
+    """
+    from bike_agent.agent.llm_client import call_llm
+
+    def one(input_data):
+        try:
+            return call_llm(input_data)
+        except Exception as e:
+            return e
+
+    if not inputs:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(inputs)))) as pool:
+        # Each call keeps the caller's trace and deadline
+        futures = [pool.submit(copy_context().run, one, x) for x in inputs]
+        return [f.result() for f in futures]
+
+
+def submit_batch(inputs: list, completion_window: str = "24h", metadata: dict = None) -> str:
+    """Submit single-turn call_llm inputs to the provider's Batch API. Returns the batch id."""
+    from bike_agent.agent.llm_client import build_request, get_client
+
+    lines = []
+    for i, input_data in enumerate(inputs):
+        _, body = build_request(input_data)
+        lines.append(json.dumps({"custom_id": str(i), "method": "POST", "url": "/v1/chat/completions", "body": body}))
+
+    client = get_client()
+    upload = client.files.create(
+        file=("requests.jsonl", io.BytesIO("\n".join(lines).encode("utf-8"))),
+        purpose="batch",
+    )
+    batch = client.batches.create(
+        input_file_id=upload.id,
+        endpoint="/v1/chat/completions",
+        completion_window=completion_window,
+        metadata=metadata,
+    )
+    print(f"[DISPATCH] Submitted batch {batch.id} with {len(inputs)} requests")
+    return batch.id
+
+
+def batch_results(batch_id: str, inputs: list):
+    """
+    Outputs of a finished batch in input order (None for requests that failed),
+    or None while the batch is still running.
+    """
+    from bike_agent.agent.llm_client import get_client, parse_response
+
+    client = get_client()
+    batch = client.batches.retrieve(batch_id)
+    if batch.status in ("failed", "expired", "cancelled"):
+        raise RuntimeError(f"Batch {batch_id} {batch.status}")
+    if batch.status != "completed":
+        return None
+
+    outputs = [None] * len(inputs)
+    if batch.output_file_id:
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            row = json.loads(line)
+            body = (row.get("response") or {}).get("body") or {}
+            if not body.get("choices"):
+                continue
+            i = int(row["custom_id"])
+            outputs[i] = parse_response(inputs[i], body["choices"][0]["message"])
+    return outputs
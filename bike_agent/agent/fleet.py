@@ -0,0 +1,108 @@
+# bike_agent/agent/fleet.py
+"""
+Fleet planning: several trucks at once, without double-booking stations.
+
+Stations are partitioned between trucks (each station goes to the truck whose
+start is closest), so every truck plans against its own slice of the snapshot
+and station capacity is reserved for exactly one truck. Per-truck planning runs
+in parallel; the combined plans are then checked with validate_fleet_plan, which
+applies validate_plan's rules to one shared station state.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bike_agent.agent.orchestrator import run_orchestration
+from bike_agent.tools.feature_store import get_features, latest_rows, use_snapshot
+from bike_agent.tools.get_nearby_stations import _haversine_km
+from bike_agent.tools.validate_plan import validate_fleet_plan
+
+
+def partition_stations(latest, starts) -> np.ndarray:
+    """
+    Assign each station (row of `latest`) to the nearest truck start.
+    Returns an int array of truck indices aligned with `latest`.
+    """
+    lat = latest["latitude"].to_numpy(dtype=float)
+    lon = latest["longitude"].to_numpy(dtype=float)
+
+    # (n_stations, n_trucks) haversine distances
+    dist = np.stack(
+        [_haversine_km(s["lat"], s["lon"], lat, lon) for s in starts],
+        axis=1,
+    )
+    return np.argmin(dist, axis=1)
+
+
+def _truck_payload(truck: dict, user_request: str) -> dict:
+    capacity = int(truck["truck_capacity"])
+    request = truck.get("user_request") or user_request
+    payload = {
+        "user_request": f"{request} Truck capacity: {capacity} bikes.",
+        "start_coordinates": truck["start_coordinates"],
+        "truck_capacity": capacity,
+    }
+    if truck.get("time_budget_min") is not None:
+        payload["time_budget_min"] = truck["time_budget_min"]
+    return payload
+
+
+def plan_fleet(trucks: list, user_request: str = "Give me my route for the coming hour.", max_workers: int = 8) -> dict:
+    """
+    trucks: list of {"start_coordinates": {"lat", "lon"}, "truck_capacity": int,
+                     "user_request": str (optional), "time_budget_min": number (optional)}
+
+    Returns:
+    {
+      "trucks": [{"start_coordinates", "truck_capacity", "approved_plan", "approved_score"} | {..., "error"}],
+      "fleet_errors": [...]   # validate_fleet_plan output over all approved plans
+    }
+    """
+    if not trucks:
+        return {"trucks": [], "fleet_errors": []}
+
+    df = get_features(api_key=os.getenv("HOPSWORKS_API_KEY"))
+    latest = latest_rows(df)
+
+    starts = [t["start_coordinates"] for t in trucks]
+    owner = partition_stations(latest, starts)
+    owner_by_id = dict(zip(latest["id"], owner))
+    df_owner = df["id"].map(owner_by_id)
+
+    def run_truck(i):
+        truck = trucks[i]
+        print(f"\n[FLEET] Truck {i}: {int((owner == i).sum())} stations in partition")
+        # Each worker thread pins its own partition of the snapshot
+        with use_snapshot(df[df_owner == i]):
+            try:
+                out = run_orchestration(_truck_payload(truck, user_request))
+            except Exception as e:
+                return {"start_coordinates": truck["start_coordinates"], "truck_capacity": truck["truck_capacity"], "error": str(e)}
+
+        return {
+            "start_coordinates": truck["start_coordinates"],
+            "truck_capacity": truck["truck_capacity"],
+            "approved_plan": out["approved_plan"],
+            "approved_score": out["approved_score"],
+            "reservation_id": out["reservation_id"],
+            "trace": out.get("trace"),
+        }
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(trucks))) as pool:
+        results = list(pool.map(run_truck, range(len(trucks))))
+
+    shared_context = {
+        "nearby_stations": latest[["id", "free_bikes", "empty_slots"]].to_dict(orient="records"),
+    }
+    fleet_errors = validate_fleet_plan(
+        [r.get("approved_plan") for r in results],
+        shared_context,
+        truck_capacities=[int(t["truck_capacity"]) for t in trucks],
+    )
+    if fleet_errors:
+        print("[FLEET] Joint validation errors")
+        print(fleet_errors)
+
+    return {"trucks": results, "fleet_errors": fleet_errors}
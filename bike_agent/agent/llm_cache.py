@@ -0,0 +1,125 @@
+# bike_agent/agent/llm_cache.py
+"""
+Persistent LLM response cache (optional, enabled with LLM_CACHE_PATH).
+
+Identical calls (same model, temperature, output settings and normalized
+system + user content) are answered from a SQLite file instead of the API,
+across processes and restarts. Entries expire after LLM_CACHE_TTL_S and the
+least recently used ones are evicted beyond LLM_CACHE_MAX_ENTRIES.
+
+Sampled critic calls (temperature > 0) are never cached: a repeated revision
+request should get a fresh answer, not the one that was just rejected.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+# Eviction scans the table; only do it every this many writes
+_EVICT_EVERY = 100
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def cache_key(model, temperature, max_tokens, mode, system_prompt, user_content) -> str:
+    payload = json.dumps(
+        [model, round(float(temperature), 3), max_tokens, mode, _normalize(system_prompt), _normalize(user_content)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cacheable(role: str, temperature: float) -> bool:
+    return not (role == "critic" and temperature > 0)
+
+
+class LLMCache:
+    def __init__(self, path: str, ttl_s: float = LLM_CACHE_TTL_S, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY,"
+                " response TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_used ON llm_cache (used_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not shareable across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT response FROM llm_cache WHERE key = ? AND created_at > ?", (key, now - self.ttl_s)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE llm_cache SET used_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        if not response:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, response, created_at, used_at) VALUES (?, ?, ?, ?)",
+            (key, response, now, now),
+        )
+        self._writes += 1
+        if self._writes % _EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self) -> int:
+        conn = self._conn()
+        expired = conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (time.time() - self.ttl_s,)).rowcount
+        over = conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            " SELECT key FROM llm_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        return expired + over
+
+    def __len__(self) -> int:
+        return int(self._conn().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0])
+
+
+_CACHE = {"cache": None, "path": None}
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache for LLM_CACHE_PATH, or None when caching is off."""
+    path = os.getenv("LLM_CACHE_PATH", LLM_CACHE_PATH or "")
+    if not path:
+        return None
+    if _CACHE["path"] != path:
+        with _CACHE_LOCK:
+            if _CACHE["path"] != path:
+                _CACHE["cache"] = LLMCache(path)
+                _CACHE["path"] = path
+    return _CACHE["cache"]
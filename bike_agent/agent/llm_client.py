@@ -1,22 +1,152 @@
 # bike_agent/agent/llm_client.py
 import os
-import json
-from dotenv import load_dotenv
-from openai import OpenAI
+import threading
+import time
 
-# Load environment variables from .env (local dev only)
-load_dotenv()
+from bike_agent.agent.dispatch import AsyncClientPool, estimate_tokens, rate_limits
+from bike_agent.agent.llm_cache import cache_key, cacheable, get_cache
+from bike_agent.agent.routing import DEFAULT_MODEL, record, route_for
+from bike_agent.agent.schemas import MIN_OUTPUT_TOKENS, output_token_budget, response_functions, to_output
+from bike_agent.agent.serialization import dumps, encode_message
+from bike_agent.resilience import breaker, check, timeout_for
+from bike_agent.tracing import span
 
-# Read API key (works for both .env and GitHub Secrets)
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("OPENAI_API_KEY is not set")
+# Default OpenAI model; per-role models are configured in routing.py (LLM_ROUTES)
+MODEL_NAME = DEFAULT_MODEL
+# Per-call cap; shortened further by the request deadline
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "30"))
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Nothing is loaded at import time: .env, the OpenAI SDK and the client are set up
+# on the first call, so importing the agent stays cheap and works without a key.
+_STATE = {"env_loaded": False, "client": None, "async_pool": None, "standins": {}}
+_LOCK = threading.Lock()
 
-# Choose your OpenAI model
-MODEL_NAME = "gpt-4o-mini"
+
+def _load_env():
+    if not _STATE["env_loaded"]:
+        from dotenv import load_dotenv
+
+        # Load environment variables from .env (local dev only)
+        load_dotenv()
+        _STATE["env_loaded"] = True
+
+
+def llm_backend() -> str:
+    """The LLM backend: "openai" (default), or a local stand-in for offline/load testing: "scripted", "replay"."""
+    _load_env()
+    return os.getenv("LLM_BACKEND", "openai").lower()
+
+
+def llm_output_mode() -> str:
+    """
+    "tools" (default): responses with a response_schema are function calls constrained
+    to the planner/critic schemas (see schemas.py). "text": free-form JSON as before.
+    """
+    _load_env()
+    return os.getenv("LLM_OUTPUT_MODE", "tools").lower()
+
+
+def llm_dispatch() -> str:
+    """
+    "sync" (default): each call uses the blocking client on the calling thread.
+    "async": calls go through one pooled AsyncOpenAI client on a shared event loop
+    (see dispatch.py), so concurrent callers share connections.
+    """
+    _load_env()
+    return os.getenv("LLM_DISPATCH", "sync").lower()
+
+
+def _api_key() -> str:
+    _load_env()
+    # Read API key (works for both .env and GitHub Secrets)
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY is not set")
+    return api_key
+
+
+def get_client():
+    """OpenAI client, created on first use."""
+    if _STATE["client"] is None:
+        with _LOCK:
+            if _STATE["client"] is None:
+                api_key = _api_key()
+
+                from openai import OpenAI
+
+                _STATE["client"] = OpenAI(api_key=api_key)
+    return _STATE["client"]
+
+
+def get_async_pool() -> AsyncClientPool:
+    """Shared async client for LLM_DISPATCH=async, created on first use."""
+    if _STATE["async_pool"] is None:
+        with _LOCK:
+            if _STATE["async_pool"] is None:
+                _STATE["async_pool"] = AsyncClientPool(_api_key())
+    return _STATE["async_pool"]
+
+
+def _get_standin(backend: str):
+    standin = _STATE["standins"].get(backend)
+    if standin is None:
+        with _LOCK:
+            standin = _STATE["standins"].get(backend)
+            if standin is None:
+                from bike_agent.agent.llm_standin import create_standin
+
+                standin = _STATE["standins"][backend] = create_standin(backend)
+    return standin
+
+
+def _user_content(user_message) -> str:
+    # Serialize user message (tool results in the context are encoded once and reused)
+    if isinstance(user_message, dict):
+        return encode_message(user_message)
+    return str(user_message)
+
+
+def build_request(input_data, user_content=None) -> tuple:
+    """
+    (role, body): the routed chat.completions arguments for input_data, without
+    the timeout. Shared by call_llm and the Batch API submission in dispatch.py.
+    """
+    system_prompt = input_data.get("system_prompt", "")
+    user_message = input_data.get("user_message", {})
+    if user_content is None:
+        user_content = _user_content(user_message)
+
+    role, route = route_for(input_data)
+    schema = input_data.get("response_schema")
+    tools_mode = schema is not None and llm_output_mode() == "tools"
+    body = {
+        "model": route.model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content},
+        ],
+        "temperature": route.temperature,
+        # Sized budgets only for schema-bound function calls; free text keeps the fixed one
+        "max_tokens": route.max_tokens or (output_token_budget(user_message) if tools_mode else MIN_OUTPUT_TOKENS),
+    }
+    if tools_mode:
+        body.update(tools=response_functions(schema), tool_choice="required", parallel_tool_calls=False)
+    return role, body
+
+
+def _field(obj, name):
+    # SDK objects from the API, plain dicts from Batch API result files
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+
+def parse_response(input_data, message) -> str:
+    """The response text for a chat completion message: protocol JSON for function calls, else its content."""
+    schema = input_data.get("response_schema")
+    tool_calls = _field(message, "tool_calls")
+    if schema is not None and tool_calls:
+        call = _field(tool_calls[0], "function")
+        return dumps(to_output(schema, _field(call, "name"), _field(call, "arguments")))
+    return _field(message, "content")
 
 
 def call_llm(input_data):
@@ -24,25 +154,62 @@ def call_llm(input_data):
     input_data: dict with keys:
       - "system_prompt": str
       - "user_message": dict or str
+      - "response_schema": optional "planner" or "critic"; constrains the response
+        in LLM_OUTPUT_MODE=tools
+
+    Returns the response as JSON text.
     """
 
     system_prompt = input_data.get("system_prompt", "")
-    user_message = input_data.get("user_message", {})
+    user_content = _user_content(input_data.get("user_message", {}))
 
-    # Serialize user message safely
-    if isinstance(user_message, dict):
-        user_content = json.dumps(user_message, ensure_ascii=False)
-    else:
-        user_content = str(user_message)
+    backend = llm_backend()
+    if backend != "openai":
+        role, _ = route_for(input_data)
+        check("llm call")
+        t0 = time.perf_counter()
+        with span("llm.call", model=f"standin:{backend}", role=role, prompt_chars=len(system_prompt) + len(user_content)):
+            out = _get_standin(backend)(input_data)
+        record(role, f"standin:{backend}", (time.perf_counter() - t0) * 1000.0)
+        return out
 
-    response = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_content},
-        ],
-        temperature=0.2,
-        max_tokens=512,
-    )
+    role, body = build_request(input_data, user_content)
+    model, temperature = body["model"], body["temperature"]
+
+    cache = get_cache() if cacheable(role, temperature) else None
+    if cache is not None:
+        mode = input_data.get("response_schema") if "tools" in body else "text"
+        key = cache_key(model, temperature, body["max_tokens"], mode, system_prompt, user_content)
+        t0 = time.perf_counter()
+        with span("llm.cache", model=model, role=role) as s:
+            cached = cache.get(key)
+            s.set(hit=cached is not None)
+        if cached is not None:
+            record(role, f"cache:{model}", (time.perf_counter() - t0) * 1000.0)
+            return cached
+
+    limits = rate_limits()
+    est_tokens = estimate_tokens(body)
+    t0 = time.perf_counter()
+    with span("llm.call", model=model, role=role, prompt_chars=len(system_prompt) + len(user_content)) as s:
+        # Wait for RPM/TPM headroom before the breaker: queueing is not a backend failure
+        waited = limits.acquire(est_tokens)
+        if waited:
+            s.set(rate_limit_wait_ms=round(waited * 1000.0, 1))
+        with breaker("openai").guard():
+            timeout = timeout_for(LLM_TIMEOUT_S, "llm call")
+            if llm_dispatch() == "async":
+                response = get_async_pool().create(body, timeout)
+            else:
+                response = get_client().chat.completions.create(**body, timeout=timeout)
+
+        usage = getattr(response, "usage", None)
+        tokens = (usage.prompt_tokens, usage.completion_tokens) if usage is not None else (0, 0)
+        limits.settle(est_tokens, sum(tokens))
+        s.set(prompt_tokens=tokens[0], completion_tokens=tokens[1])
+    record(role, model, (time.perf_counter() - t0) * 1000.0, *tokens)
 
-    return response.choices[0].message.content
+    out = parse_response(input_data, response.choices[0].message)
+    if cache is not None:
+        cache.put(key, out)
+    return out
@@ -1,7 +1,10 @@
 import json
-import pandas as pd
+import threading
+import time
+import uuid
 
 from bike_agent.agent.llm_client import call_llm
+from bike_agent.agent.serialization import dumps, encoded, register, to_python
 from bike_agent.agent.system_prompt import SYSTEM_PROMPT, CRITIC_SYSTEM_PROMPT
 
 from bike_agent.tools.registry import get_tool_spec
@@ -9,30 +12,38 @@ from bike_agent.agent.tool_calling import coerce_args, validate_args_against_sig
 from bike_agent.agent.prompt_tools import build_tool_catalog
 
 from bike_agent.tools.validate_plan import validate_plan
-from bike_agent.tools.score_plan import score_plan
+from bike_agent.tools.score_plan import LOW_THRESHOLD, score_plan, score_upper_bound
+from bike_agent.tools.reservations import INTERACTIVE_TTL_S, get_ledger, subtract_holds
+from bike_agent.tools.travel_matrix import legs
+from bike_agent.resilience import (
+    REQUEST_DEADLINE_S,
+    CircuitOpen,
+    DeadlineExceeded,
+    call_with_deadline,
+    check,
+    deadline,
+    remaining,
+)
+from bike_agent.tracing import current_span, span, start_trace
+
+MAX_RESERVATION_ATTEMPTS = 3
+# Critic revisions are optional: skip them unless this much of the request deadline is left
+CRITIC_MIN_BUDGET_S = 10.0
+# Stop revising once the critic expects to gain less than this
+CRITIC_MIN_DELTA = 1
+
+_CRITIC_MS = {"ewma": None}
+_CRITIC_MS_LOCK = threading.Lock()
 
 
 def serialize_tool_result(result):
-    if isinstance(result, pd.DataFrame):
-        return result.to_dict(orient="records")
+    serialized = to_python(result)
+    # Encoded lazily from `result` and reused across planner steps
+    register(serialized, result)
+    return serialized
 
-    if isinstance(result, dict):
-        return {k: serialize_tool_result(v) for k, v in result.items()}
 
-    if isinstance(result, (list, tuple)):
-        return [serialize_tool_result(x) for x in result]
-
-    try:
-        import numpy as np
-        if isinstance(result, (np.integer, np.floating)):
-            return result.item()
-    except Exception:
-        pass
-
-    return result
-
-
-def critic_llm(*, context: dict, plan: dict, score: dict, max_low_threshold: int = 3) -> dict:
+def critic_llm(*, context: dict, plan: dict, score: dict, max_low_threshold: int = LOW_THRESHOLD) -> dict:
     print("\n[CRITIC] Calling critic LLM")
     print(f"[CRITIC] Current score: {score.get('score')}")
 
@@ -45,11 +56,12 @@ def critic_llm(*, context: dict, plan: dict, score: dict, max_low_threshold: int
     llm_input = {
         "system_prompt": CRITIC_SYSTEM_PROMPT,
         "user_message": critic_user_message,
+        "response_schema": "critic",
     }
     llm_output = call_llm(llm_input)
 
     try:
-        out = json.loads(llm_output)
+        out = json.loads(llm_output or "")
     except json.JSONDecodeError:
         print("[CRITIC] Non-JSON output → APPROVED")
         return {
@@ -98,15 +110,31 @@ def critic_llm(*, context: dict, plan: dict, score: dict, max_low_threshold: int
     }
 
 
+def _traced_validate(plan_json, context, source):
+    with span("validate", source=source, stops=len(plan_json.get("stops", []))) as s:
+        errors = validate_plan(plan_json, context)
+        s.set(errors=len(errors))
+    return errors
+
+
 def planner_step(user_context: dict, updated_system_prompt: str, max_steps: int = 20) -> dict:
     print("\n[PLANNER] Starting planner loop")
 
     for step in range(1, max_steps + 1):
         print(f"\n[PLANNER] Step {step}/{max_steps}")
+        check("planner")
 
-        llm_input = {"system_prompt": updated_system_prompt, "user_message": user_context}
+        llm_input = {"system_prompt": updated_system_prompt, "user_message": user_context, "response_schema": "planner"}
         llm_output = call_llm(llm_input)
 
+        if not llm_output:
+            # No content (e.g. a refusal or cut off by max_tokens): ask again with a note
+            print("[PLANNER] Empty output → retrying")
+            user_context["validation_errors"] = [
+                {"code": "EMPTY_OUTPUT", "detail": "The previous response was empty; reply with one JSON object."}
+            ]
+            continue
+
         try:
             output_json = json.loads(llm_output)
         except json.JSONDecodeError:
@@ -125,9 +153,30 @@ def planner_step(user_context: dict, updated_system_prompt: str, max_steps: int
 
             args = coerce_args(raw_args, spec.arg_types)
             validate_args_against_signature(tool_fn, args)
-
-            tool_result = tool_fn(**args)
-            serialized = serialize_tool_result(tool_result)
+            if spec.prepare is not None:
+                args = spec.prepare(args, user_context)
+
+            cache = spec.cache
+            with span(f"tool.{tool_name}", args_bytes=len(dumps(args))) as s:
+                key = cache.key(args) if cache is not None else None
+                serialized = cache.get(key) if cache is not None else None
+                if serialized is not None:
+                    print(f"[PLANNER] {tool_name} served from cache")
+                    s.incr("cache_hits")
+                else:
+                    try:
+                        tool_result = call_with_deadline(lambda: tool_fn(**args), spec.timeout_s, f"tool {tool_name}")
+                    except (DeadlineExceeded, CircuitOpen) as e:
+                        # Let the planner work around a slow or unavailable backend
+                        print(f"[PLANNER] {tool_name} failed: {e}")
+                        s.set(error=str(e))
+                        user_context.setdefault("tool_errors", []).append({"tool": tool_name, "error": str(e)})
+                        continue
+                    serialized = serialize_tool_result(tool_result)
+                    if cache is not None:
+                        cache.put(key, serialized)
+                # Encodes (and caches) the result the next prompt will carry anyway
+                s.set(result_bytes=len(encoded(serialized)))
 
             ctx = user_context.setdefault("context", {})
             ctx[tool_name] = serialized
@@ -138,7 +187,7 @@ def planner_step(user_context: dict, updated_system_prompt: str, max_steps: int
 
         if out_type == "PLAN":
             ctx = user_context.setdefault("context", {})
-            errors = validate_plan(output_json, ctx)
+            errors = _traced_validate(output_json, ctx, source="planner")
             if errors:
                 print("[PLANNER] Validation errors → retrying")
                 print(errors)
@@ -153,12 +202,32 @@ def planner_step(user_context: dict, updated_system_prompt: str, max_steps: int
     raise RuntimeError("Planner did not produce a valid plan within max_steps")
 
 
+def _critic_call_ms(ms=None) -> float:
+    """Moving average of critic LLM call latency (updated when `ms` is given)."""
+    with _CRITIC_MS_LOCK:
+        if ms is not None:
+            prev = _CRITIC_MS["ewma"]
+            _CRITIC_MS["ewma"] = ms if prev is None else 0.8 * prev + 0.2 * ms
+        return _CRITIC_MS["ewma"] or 0.0
+
+
+def _critic_done(best_plan, best_score_obj, *, reason, calls, bound, avoided=0):
+    """Record why the critic loop stopped and the critic calls it saved, then return the result."""
+    saved_ms = round(avoided * _critic_call_ms(), 1)
+    s = current_span()
+    if s is not None:
+        s.set(critic_calls=calls, stop_reason=reason, score_bound=bound, saved_calls=avoided, saved_ms_est=saved_ms)
+    if avoided:
+        print(f"[CRITIC LOOP] Stopped early ({reason}); ~{saved_ms:.0f} ms of critic calls saved")
+    return best_plan, best_score_obj
+
+
 def improve_with_critic(
     *,
     context: dict,
     initial_plan: dict,
     max_revisions: int = 3,
-    low_threshold: int = 3
+    low_threshold: int = LOW_THRESHOLD
 ) -> tuple[dict, dict]:
     print("\n[CRITIC LOOP] Starting critic revision loop")
 
@@ -168,17 +237,40 @@ def improve_with_critic(
     best_score_obj = score_plan(best_plan, context, low_threshold=low_threshold)
     best_score = best_score_obj.get("score", 0)
 
-    print(f"[CRITIC LOOP] Initial score: {best_score}")
+    # No plan can score more than this; once the best plan reaches it, revisions cannot help
+    bound = score_upper_bound(
+        context,
+        low_threshold=low_threshold,
+        time_budget_min=initial_plan.get("assumptions", {}).get("time_budget_min"),
+    )
+    print(f"[CRITIC LOOP] Initial score: {best_score} (upper bound {bound})")
 
+    calls = 0
     for r in range(max_revisions):
+        if best_score >= bound:
+            # The loop would have made at least this one more call
+            return _critic_done(best_plan, best_score_obj, reason="score_bound", calls=calls, bound=bound, avoided=1)
+
+        left = remaining()
+        if left is not None and left < CRITIC_MIN_BUDGET_S:
+            print(f"[CRITIC LOOP] {left:.1f}s left of the request deadline → keeping current plan")
+            return _critic_done(best_plan, best_score_obj, reason="deadline", calls=calls, bound=bound, avoided=1)
+
         print(f"\n[CRITIC LOOP] Revision {r + 1}/{max_revisions}")
 
-        critic_out = critic_llm(
-            context=context,
-            plan=best_plan,
-            score=best_score_obj,
-            max_low_threshold=low_threshold,
-        )
+        t0 = time.perf_counter()
+        try:
+            critic_out = critic_llm(
+                context=context,
+                plan=best_plan,
+                score=best_score_obj,
+                max_low_threshold=low_threshold,
+            )
+        except (DeadlineExceeded, CircuitOpen) as e:
+            print(f"[CRITIC LOOP] Critic unavailable ({e}) → keeping current plan")
+            return _critic_done(best_plan, best_score_obj, reason="unavailable", calls=calls, bound=bound)
+        calls += 1
+        _critic_call_ms((time.perf_counter() - t0) * 1000.0)
 
         print("CRITIC----PLAN")
         print(critic_out)
@@ -188,13 +280,13 @@ def improve_with_critic(
 
         if ctype == "APPROVED":
             print("[CRITIC LOOP] Approved → stopping revisions")
-            return best_plan, best_score_obj
+            return _critic_done(best_plan, best_score_obj, reason="approved", calls=calls, bound=bound)
 
         if ctype != "PLAN":
             print("[CRITIC LOOP] Unexpected output → stopping revisions")
-            return best_plan, best_score_obj
+            return _critic_done(best_plan, best_score_obj, reason="unexpected", calls=calls, bound=bound)
 
-        errors = validate_plan(critic_out, context)
+        errors = _traced_validate(critic_out, context, source="critic")
         if errors:
             print("[CRITIC LOOP] Revised plan invalid → continuing (errors added to context)")
             print(errors)
@@ -217,33 +309,108 @@ def improve_with_critic(
                 best_score = cand_score
                 best_plan = critic_out
 
-    print("[CRITIC LOOP] Max revisions reached")
-    return best_plan, best_score_obj
-
+        # The critic itself expects little from another round
+        if critic_out.get("expected_score_delta", 0) < CRITIC_MIN_DELTA and r + 1 < max_revisions:
+            return _critic_done(best_plan, best_score_obj, reason="small_delta", calls=calls, bound=bound, avoided=1)
 
-def orchestrator(task_payload):
+    print("[CRITIC LOOP] Max revisions reached")
+    return _critic_done(best_plan, best_score_obj, reason="max_revisions", calls=calls, bound=bound)
+
+
+def run_orchestration(
+    task_payload,
+    deadline_s: float = REQUEST_DEADLINE_S,
+    reservation_ttl_s: float = None,
+    reservation_since: int = None,
+):
+    """
+    Run planner + critic and return the full user context, including the
+    structured "approved_plan" and "approved_score" (no text formatting),
+    and a "trace" summary of where the time went.
+
+    Raises DeadlineExceeded if no plan is found within deadline_s; the critic
+    is skipped when little of it is left.
+    reservation_ttl_s: how long the plan's holds last (None: the ledger default).
+    reservation_since: ledger seq the context's station counts already reflect
+    (None: the seq when this call starts).
+    """
+    with start_trace("orchestration") as trace, deadline(deadline_s):
+        user_context = _run_orchestration(task_payload, reservation_ttl_s, reservation_since)
+
+    user_context["trace"] = trace.summary()
+    return user_context
+
+
+def _run_orchestration(task_payload, reservation_ttl_s=None, reservation_since=None):
     print("\n[ORCHESTRATOR] Starting orchestration")
 
+    # Holds made after this point are not reflected in what the tools return to us
+    ledger = get_ledger()
+    if reservation_since is None:
+        reservation_since = ledger.seq()
+    reservation_id = uuid.uuid4().hex
+
     user_context = task_payload.copy()
+    if isinstance(user_context.get("context"), dict):
+        # Pre-seeded context (batch planning) must not be mutated across requests
+        user_context["context"] = dict(user_context["context"])
     tool_catalog_text = build_tool_catalog()
     UPDATED_SYSTEM_PROMPT = SYSTEM_PROMPT.replace("__TOOLS__", tool_catalog_text)
 
-    plan = planner_step(user_context, UPDATED_SYSTEM_PROMPT, max_steps=20)
+    with span("planner"):
+        plan = planner_step(user_context, UPDATED_SYSTEM_PROMPT, max_steps=20)
 
     ctx = user_context.setdefault("context", {})
-    best_plan, best_score_obj = improve_with_critic(
-        context=ctx,
-        initial_plan=plan,
-        max_revisions=4,
-        low_threshold=3,
-    )
+    with span("critic"):
+        best_plan, best_score_obj = improve_with_critic(
+            context=ctx,
+            initial_plan=plan,
+            max_revisions=4,
+            low_threshold=LOW_THRESHOLD,
+        )
+
+    for attempt in range(MAX_RESERVATION_ATTEMPTS):
+        with span("reserve", attempt=attempt) as s:
+            errors = ledger.reserve(
+                reservation_id,
+                best_plan,
+                ttl_s=reservation_ttl_s,
+                since=reservation_since,
+                # Only re-validate if someone else reserved overlapping stations meanwhile
+                check=lambda held: validate_plan(best_plan, ctx, reserved=held) if held else [],
+            )
+            s.set(conflicts=len(errors))
+        if not errors:
+            break
+
+        print("[ORCHESTRATOR] Plan conflicts with in-flight reservations → replanning")
+        print(errors)
+        next_since = ledger.seq()
+        held = ledger.holds(since=reservation_since)
+        for key in ("get_nearby_stations", "nearby_stations"):
+            if isinstance(ctx.get(key), list):
+                ctx[key] = subtract_holds(ctx[key], held)
+        reservation_since = next_since
+
+        user_context["validation_errors"] = errors
+        with span("replan"):
+            best_plan = planner_step(user_context, UPDATED_SYSTEM_PROMPT, max_steps=20)
+        best_score_obj = score_plan(best_plan, ctx, low_threshold=LOW_THRESHOLD)
+    else:
+        raise RuntimeError("Could not reserve station capacity for a conflict-free plan")
 
     print("\n[ORCHESTRATOR] Final plan approved")
     print(f"[ORCHESTRATOR] Final score: {best_score_obj.get('score')}")
 
     user_context["approved_plan"] = best_plan
     user_context["approved_score"] = best_score_obj
-    return format_final_instructions(user_context)
+    user_context["reservation_id"] = reservation_id
+    return user_context
+
+
+def orchestrator(task_payload):
+    # The UI never releases its plans, so their holds only last INTERACTIVE_TTL_S
+    return format_final_instructions(run_orchestration(task_payload, reservation_ttl_s=INTERACTIVE_TTL_S))
 
 
 
@@ -251,25 +418,14 @@ def format_final_instructions(payload):
     plan = payload["approved_plan"]
     context = payload.get("context", {})
 
-    # Build distance lookup if available
-    distances = context.get("get_distances", {})
-    pair_lookup = {}
-    if isinstance(distances, dict):
-        for p in distances.get("pairs", []):
-            a, b = p.get("from"), p.get("to")
-            if a and b:
-                pair_lookup[(a, b)] = p
-                pair_lookup[(b, a)] = p  # treat as undirected
+    # Distance lookup (directed legs if available, else the undirected pairs)
+    leg_lookup = legs(context.get("get_distances", {}))
 
     def leg_info(frm, to):
-        p = pair_lookup.get((frm, to))
-        if not p:
+        info = leg_lookup(frm, to)
+        if info is None:
             return None
-        d = p.get("distance_km")
-        t = p.get("duration_min")
-        if isinstance(d, (int, float)) and isinstance(t, (int, float)):
-            return f"{d:.2f} km · {t:.1f} min"
-        return None
+        return f"{info[0]:.2f} km · {info[1]:.1f} min"
 
     lines = []
     lines.append("🚚 Citybike Rebalancing Route\n")
@@ -0,0 +1,142 @@
+# bike_agent/agent/routing.py
+"""
+Model routing by call role.
+
+Every LLM call gets a role:
+
+- "planner_tool": a planner turn that is expected to request a tool (the context
+  still lacks stations or distances). Small, predictable outputs.
+- "planner_plan": a planner turn that is expected to produce the PLAN (all inputs
+  present, or validation errors to fix).
+- "critic": a critic revision.
+- "default": anything else.
+
+LLM_ROUTES overrides the model, max_tokens and temperature per role, as JSON or as
+a path to a JSON file:
+
+    LLM_ROUTES='{"planner_tool": {"model": "gpt-4o-mini", "temperature": 0},
+                 "planner_plan": {"model": "gpt-4o"}}'
+
+max_tokens None means "sized to the response schema" (schemas.output_token_budget) in
+tools mode, and schemas.MIN_OUTPUT_TOKENS in text mode.
+route_stats() reports calls, latency and tokens per role.
+"""
+
+import json
+import os
+import threading
+from dataclasses import dataclass, replace
+from typing import Optional
+
+DEFAULT_MODEL = "gpt-4o-mini"
+ROLES = ("planner_tool", "planner_plan", "critic", "default")
+
+
+@dataclass(frozen=True)
+class Route:
+    model: str = DEFAULT_MODEL
+    max_tokens: Optional[int] = None
+    temperature: float = 0.2
+
+
+DEFAULT_ROUTES = {
+    # Tool requests are near-deterministic; sampling only adds variance
+    "planner_tool": Route(temperature=0.0),
+    "planner_plan": Route(),
+    "critic": Route(),
+    "default": Route(max_tokens=512),
+}
+
+# Context a planner turn needs before it can plan rather than fetch
+_PLAN_INPUTS = ("get_nearby_stations", "get_distances")
+
+
+def _load_overrides() -> dict:
+    raw = os.getenv("LLM_ROUTES", "").strip()
+    if not raw:
+        return {}
+    if not raw.startswith("{"):
+        with open(raw, encoding="utf-8") as f:
+            raw = f.read()
+    overrides = json.loads(raw)
+    unknown = set(overrides) - set(ROLES)
+    if unknown:
+        raise ValueError(f"Unknown LLM_ROUTES roles: {sorted(unknown)}. Available: {', '.join(ROLES)}")
+    return overrides
+
+
+_ROUTES = {"table": None}
+_ROUTES_LOCK = threading.Lock()
+
+
+def routes() -> dict:
+    """Route per role: DEFAULT_ROUTES with LLM_ROUTES applied (read once)."""
+    if _ROUTES["table"] is None:
+        with _ROUTES_LOCK:
+            if _ROUTES["table"] is None:
+                table = dict(DEFAULT_ROUTES)
+                for role, fields in _load_overrides().items():
+                    table[role] = replace(table[role], **fields)
+                _ROUTES["table"] = table
+    return _ROUTES["table"]
+
+
+def reload_routes() -> dict:
+    _ROUTES["table"] = None
+    return routes()
+
+
+def call_role(input_data: dict) -> str:
+    """Role of an LLM call, from its response schema and the planner's context."""
+    schema = input_data.get("response_schema")
+    if schema == "critic":
+        return "critic"
+    if schema != "planner":
+        return "default"
+
+    message = input_data.get("user_message")
+    if not isinstance(message, dict):
+        return "planner_plan"
+    ctx = message.get("context") or {}
+    if message.get("validation_errors") or all(k in ctx for k in _PLAN_INPUTS):
+        return "planner_plan"
+    return "planner_tool"
+
+
+def route_for(input_data: dict) -> tuple:
+    role = call_role(input_data)
+    return role, routes()[role]
+
+
+_STATS = {}
+_STATS_LOCK = threading.Lock()
+
+
+def record(role: str, model: str, ms: float, prompt_tokens=0, completion_tokens=0) -> None:
+    with _STATS_LOCK:
+        st = _STATS.setdefault(role, {"calls": 0, "ms": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "models": {}})
+        st["calls"] += 1
+        st["ms"] += ms
+        st["prompt_tokens"] += prompt_tokens or 0
+        st["completion_tokens"] += completion_tokens or 0
+        st["models"][model] = st["models"].get(model, 0) + 1
+
+
+def route_stats() -> dict:
+    """Per role: calls, mean latency, tokens and calls per model since start."""
+    with _STATS_LOCK:
+        return {
+            role: {
+                "calls": st["calls"],
+                "mean_ms": round(st["ms"] / st["calls"], 1),
+                "prompt_tokens": st["prompt_tokens"],
+                "completion_tokens": st["completion_tokens"],
+                "models": dict(st["models"]),
+            }
+            for role, st in _STATS.items()
+        }
+
+
+def reset_stats() -> None:
+    with _STATS_LOCK:
+        _STATS.clear()
@@ -0,0 +1,157 @@
+# bike_agent/agent/schemas.py
+"""
+Constrained outputs for the planner and critic (LLM_OUTPUT_MODE=tools).
+
+Instead of asking for free-form JSON, call_llm offers the model one function per
+allowed action and requires it to call exactly one:
+
+- planner: one function per registered tool (parameters generated from
+  ToolSpec.arg_types / arg_schemas) plus submit_plan.
+- critic: approve_plan and revise_plan.
+
+Functions are strict, so arguments always match the schema. to_output() turns
+the call back into the TOOL_REQUEST / PLAN / APPROVED JSON the orchestrator
+already understands, so nothing downstream changes.
+"""
+
+import inspect
+import json
+import os
+from functools import lru_cache
+
+from bike_agent.tools.registry import get_tool_spec, list_tools
+
+# Upper bound on output tokens; the budget grows with the stations in context
+MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "4096"))
+# Also the fixed budget of free-text (LLM_OUTPUT_MODE=text) responses; never go below it
+MIN_OUTPUT_TOKENS = 512
+# A PLAN stop or a station in a get_distances request is ~25-35 tokens of JSON
+TOKENS_PER_STATION = 40
+DEFAULT_STATIONS = 10
+
+_TAG_SCHEMAS = {
+    "int": {"type": "integer"},
+    "float": {"type": "number"},
+    "str": {"type": "string"},
+    "bool": {"type": "boolean"},
+    "list": {"type": "array", "items": {"type": "string"}},
+}
+
+
+def _object(properties: dict) -> dict:
+    # Strict function schemas: every property listed as required, nothing else allowed
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+STOP_SCHEMA = _object({
+    "station_id": {"type": "string"},
+    "action": {"type": "string", "enum": ["pickup", "dropoff"]},
+    "bikes": {"type": "integer"},
+})
+
+PLAN_PROPERTIES = {
+    "assumptions": _object({
+        "truck_capacity": {"type": "integer"},
+        "time_budget_min": {"type": "integer"},
+    }),
+    "stops": {"type": "array", "items": STOP_SCHEMA},
+}
+
+
+def _nullable(schema: dict) -> dict:
+    schema = dict(schema)
+    t = schema.get("type")
+    schema["type"] = [t, "null"] if isinstance(t, str) else list(t) + ["null"]
+    return schema
+
+
+def tool_parameters(name: str):
+    """Strict JSON schema for a tool's arguments, or None if an argument has no exact schema."""
+    spec = get_tool_spec(name)
+    overrides = spec.arg_schemas
+    try:
+        params = inspect.signature(spec.fn).parameters
+    except (TypeError, ValueError):
+        params = {}
+
+    properties = {}
+    for arg, tag in spec.arg_types.items():
+        schema = overrides.get(arg) or _TAG_SCHEMAS.get(tag)
+        if schema is None:
+            return None
+        p = params.get(arg)
+        if p is not None and p.default is not inspect.Parameter.empty:
+            # Strict mode requires every property; optional ones may be null (dropped in to_output)
+            schema = _nullable(schema)
+        properties[arg] = schema
+    return _object(properties)
+
+
+def _function(name, description, parameters, strict=True):
+    return {
+        "type": "function",
+        "function": {"name": name, "description": description, "parameters": parameters, "strict": strict},
+    }
+
+
+@lru_cache(maxsize=None)
+def _planner_functions() -> tuple:
+    functions = []
+    for name in sorted(list_tools()):
+        params = tool_parameters(name)
+        strict = params is not None
+        if params is None:
+            params = {"type": "object", "properties": {}, "additionalProperties": True}
+        functions.append(_function(name, get_tool_spec(name).description, params, strict=strict))
+
+    functions.append(_function("submit_plan", "Submit the route PLAN.", _object(PLAN_PROPERTIES)))
+    return tuple(functions)
+
+
+@lru_cache(maxsize=None)
+def _critic_functions() -> tuple:
+    delta = {"reason": {"type": "string"}, "expected_score_delta": {"type": "integer"}}
+    return (
+        _function("approve_plan", "APPROVED: keep the current plan.", _object(delta)),
+        _function("revise_plan", "PLAN: a revised, valid plan that scores higher.", _object({**PLAN_PROPERTIES, **delta})),
+    )
+
+
+def response_functions(role: str) -> list:
+    """Function definitions offered to the model for `role` ("planner" or "critic")."""
+    if role == "planner":
+        return list(_planner_functions())
+    if role == "critic":
+        return list(_critic_functions())
+    raise ValueError(f"Unknown response schema: {role}")
+
+
+def to_output(role: str, name: str, arguments) -> dict:
+    """The orchestrator's JSON protocol for a function call made by the model."""
+    args = json.loads(arguments) if isinstance(arguments, str) else dict(arguments or {})
+
+    if role == "critic":
+        if name == "approve_plan":
+            return {"type": "APPROVED", **args}
+        return {"type": "PLAN", **args}
+
+    if name == "submit_plan":
+        return {"type": "PLAN", **args}
+    # Optional arguments the model left null fall back to the tool's defaults
+    return {"type": "TOOL_REQUEST", "tool": name, "args": {k: v for k, v in args.items() if v is not None}}
+
+
+def output_token_budget(user_message) -> int:
+    """max_tokens for one structured response, sized to the stations it may list."""
+    n = DEFAULT_STATIONS
+    if isinstance(user_message, dict):
+        ctx = user_message.get("context") or {}
+        stations = ctx.get("nearby_stations") or ctx.get("get_nearby_stations")
+        if isinstance(stations, list) and stations:
+            n = max(n, len(stations))
+    return int(min(MAX_OUTPUT_TOKENS, max(MIN_OUTPUT_TOKENS, 96 + TOKENS_PER_STATION * n)))
@@ -0,0 +1,145 @@
+# bike_agent/agent/serialization.py
+"""
+Tool-result serialization for the planner/critic prompts.
+
+- to_python(): tool result -> plain Python (what the context and validators keep).
+- dumps(): compact JSON, via orjson when available.
+- encode_message(): JSON for an LLM user message. Tool results registered by
+  serialize_tool_result are encoded once, straight from their DataFrame /
+  StationTable / ndarray form, and the cached text is spliced into every later
+  prompt instead of re-encoding the whole context each planner step.
+
+Registered tool results are treated as immutable: replace a context entry,
+never mutate it in place.
+"""
+
+import json
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from bike_agent.tools.station_table import StationTable, remember
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used when orjson is not installed
+    orjson = None
+
+
+def _pandas():
+    # pandas is never imported here: if nothing imported it, no value can be a DataFrame
+    return sys.modules.get("pandas")
+
+
+def _is_frame(obj) -> bool:
+    pd = _pandas()
+    return pd is not None and isinstance(obj, pd.DataFrame)
+
+
+def _default(obj):
+    if isinstance(obj, (np.integer, np.floating, np.bool_)):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if _is_frame(obj):
+        return obj.to_dict(orient="records")
+    if isinstance(obj, StationTable):
+        return obj.to_records()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> str:
+    if orjson is not None:
+        return orjson.dumps(
+            obj,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        ).decode()
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default)
+
+
+def to_python(result):
+    """Plain Python form of a tool result (records for tables, lists for arrays)."""
+    if isinstance(result, StationTable):
+        # Records go to the LLM; validation/scoring map them back to the table
+        records = result.to_records()
+        remember(records, result)
+        return records
+
+    if _is_frame(result):
+        return result.to_dict(orient="records")
+
+    if isinstance(result, dict):
+        return {k: to_python(v) for k, v in result.items()}
+
+    if isinstance(result, (list, tuple)):
+        return [to_python(x) for x in result]
+
+    if isinstance(result, (np.integer, np.floating)):
+        return result.item()
+
+    if isinstance(result, np.ndarray):
+        return result.tolist()
+
+    return result
+
+
+def encode_value(value) -> str:
+    """JSON text for a tool result, encoded from its columnar form where possible."""
+    if isinstance(value, StationTable):
+        df = value.to_frame()
+        if df["distance_km"].isna().all():
+            df = df.drop(columns=["distance_km"])
+        value = df
+
+    if _is_frame(value):
+        # pandas' C encoder, no per-row dicts
+        return value.to_json(orient="records", force_ascii=False, date_format="iso", double_precision=15)
+
+    if isinstance(value, dict):
+        return "{" + ",".join(f"{dumps(str(k))}:{encode_value(v)}" for k, v in value.items()) + "}"
+
+    return dumps(value)
+
+
+# serialized tool result (by identity) -> (result, source, encoded JSON or None)
+_ENCODED = OrderedDict()
+_ENCODED_LOCK = threading.Lock()
+_ENCODED_MAX = 256
+
+
+def register(serialized, source) -> None:
+    """Remember that `serialized` came from `source`; it is encoded on first use."""
+    if not isinstance(serialized, (dict, list)):
+        return
+    with _ENCODED_LOCK:
+        _ENCODED[id(serialized)] = (serialized, source, None)
+        _ENCODED.move_to_end(id(serialized))
+        while len(_ENCODED) > _ENCODED_MAX:
+            _ENCODED.popitem(last=False)
+
+
+def encoded(obj) -> str:
+    """JSON text for obj, reusing the cached encoding of registered tool results."""
+    hit = _ENCODED.get(id(obj))
+    if hit is None or hit[0] is not obj:
+        return dumps(obj)
+
+    if hit[2] is None:
+        text = encode_value(hit[1])
+        with _ENCODED_LOCK:
+            if id(obj) in _ENCODED:
+                _ENCODED[id(obj)] = (obj, hit[1], text)
+        return text
+    return hit[2]
+
+
+def encode_message(message) -> str:
+    """JSON for an LLM user message; nested dicts are spliced so cached results are reused."""
+    if isinstance(message, dict) and id(message) not in _ENCODED:
+        return "{" + ",".join(f"{dumps(str(k))}:{encode_message(v)}" for k, v in message.items()) + "}"
+    return encoded(message)
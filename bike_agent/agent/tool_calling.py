@@ -1,6 +1,5 @@
 import inspect
 import math
-import pandas as pd
 from typing import Any, Dict
 
 def _is_nan(x: Any) -> bool:
@@ -30,6 +29,8 @@ def coerce_value(value: Any, type_tag: str):
             raise TypeError(f"Expected list, got {type(value)}")
         return value
     if type_tag == "dataframe_records":
+        import pandas as pd
+
         # Expect list[dict] or dict with "records"
         if isinstance(value, list):
             return pd.DataFrame(value)
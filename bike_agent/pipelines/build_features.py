@@ -1,18 +1,38 @@
 # bike_agent/pipelines/build_features.py
 
+import argparse
+import json
 import os
+import time
+from pathlib import Path
+
 import requests
 import pandas as pd
-import hopsworks
 
-def main():
-    network_id = "bicipalma"
-    url = f"https://api.citybik.es/v2/networks/{network_id}"
+from bike_agent.tools.feature_backends import ParquetBackend
+
+NETWORK_ID = "bicipalma"
+FEATURE_GROUP = "station_dynamics"
+FEATURE_VIEW = "station_dynamics_view"
+
+# Incremental mode keeps its watermark/hash per station and not-yet-inserted rows here
+STATE_PATH = Path(os.getenv("INGEST_STATE_PATH", ".ingest_state.json"))
+BUFFER_PATH = Path(os.getenv("INGEST_BUFFER_PATH", ".ingest_buffer.pkl"))
+
+# Re-insert an unchanged station after this long so history has no long gaps
+HEARTBEAT_MIN = 120
+# Columns that define "the station changed" (timestamp alone is not a change)
+CHANGE_COLUMNS = ["free_bikes", "empty_slots", "latitude", "longitude"]
+
 
-    response = requests.get(url, timeout=30)
+def fetch_network(network_id: str = NETWORK_ID, session=None) -> dict:
+    url = f"https://api.citybik.es/v2/networks/{network_id}"
+    response = (session or requests).get(url, timeout=30)
     response.raise_for_status()
-    data = response.json()
+    return response.json()
+
 
+def stations_frame(data: dict) -> pd.DataFrame:
     stations = data["network"]["stations"]
     df = pd.DataFrame(stations)
     df["id"] = df["id"].astype(str).str.slice(0, 4)
@@ -24,33 +44,192 @@ def main():
     )
     if "extra" in df.columns:
         df.drop(columns=["extra"], inplace=True)
+    return df
+
 
-    api_key = os.getenv("HOPSWORKS_API_KEY")
+def connect(api_key: str = None):
+    """Login once and return (project, feature_store, station feature group)."""
+    api_key = api_key or os.getenv("HOPSWORKS_API_KEY")
     if not api_key:
         raise RuntimeError("HOPSWORKS_API_KEY is not set (use GitHub Secrets in Actions).")
 
+    import hopsworks
+
     project = hopsworks.login(api_key_value=api_key)
     print(f"Connected to Hopsworks project: {project.name}")
 
     fs = project.get_feature_store()
     bike_fg = fs.get_or_create_feature_group(
-        name="station_dynamics",
+        name=FEATURE_GROUP,
         version=1,
         primary_key=["id"],
         event_time="timestamp",
         online_enabled=True,
     )
-    bike_fg.insert(df)
+    return project, fs, bike_fg
+
+
+def ensure_feature_view(fs, bike_fg):
+    """Create the feature view only if it does not exist yet."""
+    try:
+        feature_view = fs.get_feature_view(name=FEATURE_VIEW, version=1)
+        if feature_view is not None:
+            return feature_view
+    except Exception:
+        pass
 
-    query = bike_fg.select_all()
     feature_view = fs.get_or_create_feature_view(
-        name="station_dynamics_view",
+        name=FEATURE_VIEW,
         version=1,
         description="Interface for Rebalancing Agent to get station state and history",
-        query=query,
+        query=bike_fg.select_all(),
     )
-
     print(f"Feature View '{feature_view.name}' version {feature_view.version} is ready!")
+    return feature_view
+
+
+# ----------------------------
+# Incremental ingest
+# ----------------------------
+
+
+def load_state(path: Path = None) -> dict:
+    path = path or STATE_PATH
+    if path.exists():
+        return json.loads(path.read_text())
+    return {"stations": {}, "feature_view_ready": False}
+
+
+def save_state(state: dict, path: Path = None) -> None:
+    path = path or STATE_PATH
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(state))
+    tmp.replace(path)
+
+
+def load_buffer(path: Path = None) -> pd.DataFrame:
+    path = path or BUFFER_PATH
+    if path.exists():
+        return pd.read_pickle(path)
+    return pd.DataFrame()
+
+
+def save_buffer(df: pd.DataFrame, path: Path = None) -> None:
+    path = path or BUFFER_PATH
+    if df.empty:
+        path.unlink(missing_ok=True)
+        return
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    df.to_pickle(tmp)
+    tmp.replace(path)
+
+
+def station_hashes(df: pd.DataFrame) -> pd.Series:
+    cols = [c for c in CHANGE_COLUMNS if c in df.columns]
+    return pd.util.hash_pandas_object(df[cols], index=False).astype(str)
+
+
+def changed_rows(df: pd.DataFrame, state: dict, heartbeat_min: float = HEARTBEAT_MIN) -> pd.DataFrame:
+    """
+    Rows that are newer than the station's watermark AND either changed content
+    or are older than the heartbeat. Updates state["stations"] for the returned rows.
+    """
+    seen = state.setdefault("stations", {})
+    hashes = station_hashes(df)
+    ts_s = df["timestamp"].astype("int64").to_numpy() // 10**9
+
+    keep = []
+    for i, (sid, h, ts) in enumerate(zip(df["id"], hashes, ts_s)):
+        prev = seen.get(sid)
+        if prev is not None:
+            if ts <= prev["ts"]:
+                continue
+            if h == prev["hash"] and ts - prev["ts"] < heartbeat_min * 60:
+                continue
+        keep.append(i)
+        seen[sid] = {"hash": h, "ts": int(ts)}
+
+    return df.iloc[keep]
+
+
+def ingest_incremental(df, fs, bike_fg, state, min_batch_rows=0, max_delay_min=None, local=None) -> int:
+    """
+    Buffer changed rows for Hopsworks and insert once the buffer has min_batch_rows
+    rows or its oldest row waited max_delay_min, then write them to the local store
+    (if given). bike_fg=None skips Hopsworks. Returns rows inserted there.
+
+    State is saved last, so a failed run is retried with the same rows; the local
+    store drops repeated (id, timestamp) rows on read.
+    """
+    changed = changed_rows(df, state)
+
+    if bike_fg is None:
+        if local is not None:
+            local.write(changed)
+        save_state(state)
+        return 0
+
+    buffer = load_buffer()
+    if not changed.empty:
+        changed = changed.assign(_buffered_at=time.time())
+        buffer = pd.concat([buffer, changed], ignore_index=True)
+    print(f"{len(changed)} changed stations, {len(buffer)} rows buffered")
+
+    inserted = 0
+    if not buffer.empty:
+        age_min = (time.time() - buffer["_buffered_at"].min()) / 60.0
+        if len(buffer) >= min_batch_rows or (max_delay_min is not None and age_min >= max_delay_min):
+            bike_fg.insert(buffer.drop(columns=["_buffered_at"]))
+            inserted = len(buffer)
+            buffer = buffer.iloc[0:0]
+
+    if not state.get("feature_view_ready"):
+        ensure_feature_view(fs, bike_fg)
+        state["feature_view_ready"] = True
+
+    if local is not None:
+        local.write(changed.drop(columns=["_buffered_at"], errors="ignore"))
+
+    # Buffer first: a crash between the two saves re-inserts at worst, never drops rows
+    save_buffer(buffer)
+    save_state(state)
+    return inserted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch citybik.es stations into Hopsworks.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only insert stations that changed since the last run (watermark/hash state in "
+                             "INGEST_STATE_PATH; keep that file between runs, e.g. via the CI cache).")
+    parser.add_argument("--min-batch-rows", type=int, default=0,
+                        help="Incremental mode: buffer rows across runs until at least this many are pending.")
+    parser.add_argument("--max-delay-min", type=float, default=None,
+                        help="Incremental mode: flush the buffer once its oldest row waited this long.")
+    parser.add_argument("--no-hopsworks", action="store_true",
+                        help="Only write the local Parquet store (FEATURE_STORE_DIR), skip the Hopsworks sync.")
+    args = parser.parse_args(argv)
+
+    df = stations_frame(fetch_network())
+    local = ParquetBackend()
+    fs, bike_fg = None, None
+    if not args.no_hopsworks:
+        project, fs, bike_fg = connect()
+
+    if args.incremental:
+        inserted = ingest_incremental(
+            df, fs, bike_fg, load_state(),
+            min_batch_rows=args.min_batch_rows,
+            max_delay_min=args.max_delay_min,
+            local=local,
+        )
+        print(f"Inserted {inserted} rows")
+        return
+
+    # Local store is the fast read path; Hopsworks is the sync target
+    local.write(df)
+    if bike_fg is not None:
+        bike_fg.insert(df)
+        ensure_feature_view(fs, bike_fg)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
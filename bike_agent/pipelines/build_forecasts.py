@@ -0,0 +1,62 @@
+# bike_agent/pipelines/build_forecasts.py
+"""
+Forecast stage: runs after build_features.
+
+Fits per-station, per-time-of-day drift rates on the station_dynamics history,
+stores them in `station_forecast_rates` (read by the get_station_forecast tool)
+and stores the predicted 15/30/60-minute states for the latest snapshot in
+`station_forecasts`, both on the feature backend chosen with --backend
+(default: FEATURE_BACKEND). CI passes --backend hopsworks: the runner's local
+store only holds the rows of the latest poll and is thrown away after the job.
+"""
+
+import argparse
+import os
+import pandas as pd
+
+from bike_agent.tools.feature_backends import get_backend, latest_rows
+from bike_agent.tools.forecasting import cumulative_rates, fit_rates, rates_to_frame
+from bike_agent.tools.get_station_forecast import RATES_FEATURE_GROUP, forecast_latest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit the demand forecaster and store its forecasts.")
+    parser.add_argument("--backend", choices=["auto", "local", "hopsworks"], default=None,
+                        help="Feature backend to read history from and write to (default: FEATURE_BACKEND).")
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv("HOPSWORKS_API_KEY")
+    backend = get_backend(api_key, args.backend)
+    if backend.name == "hopsworks" and not api_key:
+        raise RuntimeError("HOPSWORKS_API_KEY is not set (use GitHub Secrets in Actions).")
+    print(f"Feature backend: {backend.name}")
+
+    history = backend.read()
+    station_ids, rates = fit_rates(history)
+    print(f"Fitted drift rates for {len(station_ids)} stations")
+
+    backend.write_group(RATES_FEATURE_GROUP, rates_to_frame(station_ids, rates), primary_key=["id", "slot"])
+
+    latest = latest_rows(history)
+    model = {
+        "index": {sid: i for i, sid in enumerate(station_ids)},
+        "rates": rates,
+        "cum": cumulative_rates(rates),
+    }
+
+    now = pd.Timestamp(latest["timestamp"].max())
+    forecasts = forecast_latest(latest, model, now=now)
+    forecasts["timestamp"] = now
+
+    backend.write_group(
+        "station_forecasts",
+        forecasts,
+        primary_key=["id"],
+        event_time="timestamp",
+        online_enabled=True,
+    )
+    print(f"Stored 15/30/60-minute forecasts for {len(forecasts)} stations at {now}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# bike_agent/pipelines/ingest_daemon.py
+"""
+Long-running ingest service (alternative to the scheduled build_features run).
+
+- Polls citybik.es every --interval-s seconds with conditional requests
+  (If-None-Match / If-Modified-Since), so unchanged networks cost a 304.
+- Keeps one Hopsworks session open and pushes changed rows through the same
+  incremental path as `build_features --incremental`.
+- Writes changed rows to the local Parquet store (the default read path).
+- Publishes every fresh snapshot to the latest-state store, which
+  get_nearby_stations / get_station_features read without any network hop.
+"""
+
+import argparse
+import signal
+import threading
+import time
+
+import requests
+
+from bike_agent.pipelines.build_features import (
+    NETWORK_ID,
+    connect,
+    ingest_incremental,
+    load_state,
+    stations_frame,
+)
+from bike_agent.tools.feature_backends import ParquetBackend
+from bike_agent.tools.latest_state import publish_latest, touch_latest
+
+
+class ConditionalFetcher:
+    def __init__(self, network_id: str = NETWORK_ID):
+        self.url = f"https://api.citybik.es/v2/networks/{network_id}"
+        self.session = requests.Session()
+        self.etag = None
+        self.last_modified = None
+
+    def fetch(self):
+        """Return the network JSON, or None if unchanged since the last fetch (HTTP 304)."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        response = self.session.get(self.url, headers=headers, timeout=30)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+
+        self.etag = response.headers.get("ETag", self.etag)
+        self.last_modified = response.headers.get("Last-Modified", self.last_modified)
+        return response.json()
+
+
+def run(interval_s=60.0, min_batch_rows=0, max_delay_min=None, publish_only=False):
+    stop = threading.Event()
+
+    def _handle_signal(signum, frame):
+        print(f"Received signal {signum}, stopping")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _handle_signal)
+    signal.signal(signal.SIGINT, _handle_signal)
+
+    fetcher = ConditionalFetcher()
+    local = ParquetBackend()
+    state = load_state()
+    session = None  # (fs, bike_fg), opened once and re-opened only after a failure
+
+    while not stop.is_set():
+        started = time.monotonic()
+        try:
+            data = fetcher.fetch()
+            if data is None:
+                print("Network unchanged (304)")
+                touch_latest()
+            else:
+                df = stations_frame(data)
+                publish_latest(df)
+
+                if session is None and not publish_only:
+                    _, fs, bike_fg = connect()
+                    session = (fs, bike_fg)
+                inserted = ingest_incremental(
+                    df, *(session or (None, None)), state,
+                    min_batch_rows=min_batch_rows,
+                    max_delay_min=max_delay_min,
+                    local=local,
+                )
+                print(f"Published {len(df)} stations, inserted {inserted} rows")
+        except Exception as e:
+            print(f"Ingest poll failed: {e}")
+            # Drop the session and the in-memory state; both are rebuilt next poll
+            session = None
+            state = load_state()
+
+        elapsed = time.monotonic() - started
+        stop.wait(max(0.0, interval_s - elapsed))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Continuously ingest citybik.es snapshots.")
+    parser.add_argument("--interval-s", type=float, default=60.0, help="Polling interval in seconds.")
+    parser.add_argument("--min-batch-rows", type=int, default=0,
+                        help="Buffer changed rows until at least this many are pending.")
+    parser.add_argument("--max-delay-min", type=float, default=None,
+                        help="Flush the buffer once its oldest row waited this long.")
+    parser.add_argument("--publish-only", action="store_true",
+                        help="Only update the latest-state and local Parquet stores, do not write to Hopsworks.")
+    args = parser.parse_args(argv)
+
+    run(
+        interval_s=args.interval_s,
+        min_batch_rows=args.min_batch_rows,
+        max_delay_min=args.max_delay_min,
+        publish_only=args.publish_only,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# bike_agent/pipelines/sync_features.py
+"""
+Sync between the local Parquet store and Hopsworks.
+
+  --pull     copy station history from Hopsworks into the local store (bootstrap)
+  --push     insert local rows newer than --since into Hopsworks
+  --compact  merge per-poll files into one file per date partition
+"""
+
+import argparse
+
+from bike_agent.tools.feature_backends import HopsworksBackend, ParquetBackend
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync the local feature store with Hopsworks.")
+    parser.add_argument("--pull", action="store_true")
+    parser.add_argument("--push", action="store_true")
+    parser.add_argument("--since", default=None, help="Only sync rows at or after this timestamp (ISO 8601).")
+    parser.add_argument("--compact", action="store_true")
+    args = parser.parse_args(argv)
+
+    local = ParquetBackend()
+    remote = HopsworksBackend()
+
+    if args.pull:
+        df = remote.read(since=args.since)
+        local.write(df)
+        print(f"Pulled {len(df)} rows into {local.root}")
+
+    if args.push:
+        df = local.read(since=args.since)
+        if not df.empty:
+            remote.write(df)
+        print(f"Pushed {len(df)} rows to Hopsworks")
+
+    if args.compact:
+        local.compact()
+        print(f"Compacted {local.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# bike_agent/resilience.py
+"""
+Deadlines, cooperative cancellation and circuit breakers.
+
+    with deadline(REQUEST_DEADLINE_S):          # whole orchestration
+        remaining()                             # seconds left (None: no deadline)
+        check("planner")                        # raise if out of time or cancelled
+        call_with_deadline(fn, 10, "tool x")    # fn gets min(10 s, what is left)
+
+Deadlines nest through a ContextVar and only ever shrink. call_with_deadline runs
+fn on a worker thread and stops waiting when its deadline passes; Python threads
+cannot be killed, so the worker's scope is marked cancelled and long-running
+code checks it (check(), timeout_for() for socket timeouts) to give up early.
+Top-level calls share a pool of DEADLINE_WORKERS threads. Nested calls (e.g.
+hopsworks.login inside a tool), and all calls while half the pool is held by
+timed-out work, get a thread of their own, so the pool can neither deadlock on
+itself nor be drained by stuck backends.
+
+Breakers wrap calls to one backend (breaker("osrm").guard()). After
+BREAKER_FAILURES consecutive failures the breaker opens and calls fail fast with
+CircuitOpen for BREAKER_RESET_S; then one trial call decides whether it closes.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_S", "90"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_S = float(os.getenv("BREAKER_RESET_S", "30"))
+# Worker threads for calls with a deadline; stuck calls occupy one each until they return
+DEADLINE_WORKERS = int(os.getenv("DEADLINE_WORKERS", "32"))
+# hopsworks.login has no timeout of its own and can hang indefinitely
+HOPSWORKS_LOGIN_TIMEOUT_S = float(os.getenv("HOPSWORKS_LOGIN_TIMEOUT_S", "20"))
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Cancelled(DeadlineExceeded):
+    """Raised by check(): the caller gave up, which says nothing about the backend."""
+
+
+class CircuitOpen(RuntimeError):
+    pass
+
+
+class _Scope:
+    __slots__ = ("deadline", "parent", "cancelled")
+
+    def __init__(self, deadline, parent=None):
+        self.deadline = deadline
+        self.parent = parent
+        self.cancelled = threading.Event()
+
+    def is_cancelled(self) -> bool:
+        scope = self
+        while scope is not None:
+            if scope.cancelled.is_set():
+                return True
+            scope = scope.parent
+        return False
+
+
+_SCOPE = ContextVar("deadline_scope", default=None)
+
+
+def _new_scope(seconds):
+    parent = _SCOPE.get()
+    at = time.monotonic() + seconds if seconds is not None else None
+    if parent is not None and parent.deadline is not None:
+        at = parent.deadline if at is None else min(at, parent.deadline)
+    return _Scope(at, parent)
+
+
+@contextmanager
+def deadline(seconds):
+    """Limit the block to `seconds` (never extends an enclosing deadline)."""
+    token = _SCOPE.set(_new_scope(seconds))
+    try:
+        yield
+    finally:
+        _SCOPE.reset(token)
+
+
+def remaining():
+    """Seconds until the current deadline, or None without one."""
+    scope = _SCOPE.get()
+    if scope is None or scope.deadline is None:
+        return None
+    return scope.deadline - time.monotonic()
+
+
+def check(what="request") -> None:
+    """Raise DeadlineExceeded if the current scope was cancelled or ran out of time."""
+    scope = _SCOPE.get()
+    if scope is None:
+        return
+    if scope.is_cancelled():
+        raise Cancelled(f"{what} cancelled")
+    if scope.deadline is not None and time.monotonic() >= scope.deadline:
+        raise Cancelled(f"{what} exceeded its deadline")
+
+
+def timeout_for(cap: float, what="request") -> float:
+    """Socket timeout for a blocking call: `cap`, or less if the deadline is closer."""
+    check(what)
+    left = remaining()
+    return cap if left is None else max(0.001, min(cap, left))
+
+
+_EXECUTOR = {"pool": None, "stuck": 0}
+_EXECUTOR_LOCK = threading.Lock()
+_WORKER = threading.local()
+
+
+def _pool() -> ThreadPoolExecutor:
+    if _EXECUTOR["pool"] is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR["pool"] is None:
+                _EXECUTOR["pool"] = ThreadPoolExecutor(max_workers=DEADLINE_WORKERS, thread_name_prefix="deadline")
+    return _EXECUTOR["pool"]
+
+
+def _spawn(fn) -> Future:
+    """Run fn on a dedicated daemon thread."""
+    future = Future()
+
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, name="deadline-nested", daemon=True).start()
+    return future
+
+
+def _unstuck(_future) -> None:
+    with _EXECUTOR_LOCK:
+        _EXECUTOR["stuck"] -= 1
+
+
+def call_with_deadline(fn, timeout_s=None, what="call"):
+    """
+    fn() limited to timeout_s and the current deadline, whichever is sooner.
+    Without either, fn runs inline.
+    """
+    check(what)
+    scope = _new_scope(timeout_s)
+    if scope.deadline is None:
+        return fn()
+
+    ctx = copy_context()
+
+    def run():
+        _SCOPE.set(scope)
+        _WORKER.active = True
+        return fn()
+
+    pooled = not getattr(_WORKER, "active", False) and _EXECUTOR["stuck"] < DEADLINE_WORKERS // 2
+    future = _pool().submit(ctx.run, run) if pooled else _spawn(lambda: ctx.run(run))
+    try:
+        return future.result(timeout=max(0.0, scope.deadline - time.monotonic()))
+    except FutureTimeout:
+        scope.cancelled.set()
+        if not future.cancel() and pooled:
+            # The worker stays busy until fn returns; count it so new calls avoid a drained pool
+            with _EXECUTOR_LOCK:
+                _EXECUTOR["stuck"] += 1
+            future.add_done_callback(_unstuck)
+        raise DeadlineExceeded(f"{what} timed out after {timeout_s if timeout_s is not None else 'the request deadline'}s")
+
+
+# Bad input or a caller that gave up: they say nothing about the backend's health
+_NEUTRAL_ERRORS = (ValueError, KeyError, TypeError, Cancelled)
+
+
+class CircuitBreaker:
+    def __init__(self, name, failures=BREAKER_FAILURES, reset_s=BREAKER_RESET_S):
+        self.name = name
+        self.failures = failures
+        self.reset_s = reset_s
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_s:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> None:
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half_open" and self._trial):
+                raise CircuitOpen(f"{self.name} is unavailable (circuit open after {self._consecutive} failures)")
+            if state == "half_open":
+                # Let exactly one call through to probe the backend
+                self._trial = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            self._trial = False
+            if self._opened_at is not None or self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+                print(f"[BREAKER] {self.name} open for {self.reset_s:.0f}s after {self._consecutive} failures")
+
+    @contextmanager
+    def guard(self):
+        self.allow()
+        try:
+            yield
+        except _NEUTRAL_ERRORS:
+            with self._lock:
+                self._trial = False
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._consecutive}
+
+
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def breaker(name: str) -> CircuitBreaker:
+    b = _BREAKERS.get(name)
+    if b is None:
+        with _BREAKERS_LOCK:
+            b = _BREAKERS.setdefault(name, CircuitBreaker(name))
+    return b
+
+
+def breaker_stats() -> dict:
+    return {name: b.stats() for name, b in _BREAKERS.items()}
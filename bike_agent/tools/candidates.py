@@ -0,0 +1,116 @@
+# bike_agent/tools/candidates.py
+"""
+Candidate pre-selection for get_distances.
+
+The OSRM matrix grows quadratically with the stations sent, so only a few fit in
+a request. Rather than leaving the choice to the LLM (which tends to pick the
+nearest stations), rank every station in the nearby index by how much it can
+contribute to the score, discounted by a cheap travel-time estimate from the
+start, and keep the best DISTANCE_CANDIDATES:
+
+- receivers (free_bikes < low_threshold): every bike dropped there scores, up to
+  their empty_slots
+- donors: bikes above low_threshold can be taken without creating a new shortage
+
+The estimate is the local OSRM stand-in (haversine x detour at a constant speed);
+stations further away than the time budget get no value. Receivers and donors are
+picked alternately so the matrix always covers both ends of a move. Stations the
+LLM asked for are kept first (up to DISTANCE_CANDIDATES); only the remaining
+slots are filled by rank.
+"""
+
+import os
+
+import numpy as np
+
+from .osrm_local import local_table
+from .score_plan import LOW_THRESHOLD
+
+DISTANCE_CANDIDATES = int(os.getenv("DISTANCE_CANDIDATES", "10"))
+# Used when the request does not set time_budget_min (same default as the planner prompt)
+DEFAULT_TIME_BUDGET_MIN = 60
+
+
+def travel_minutes(start: dict, lats, lons) -> np.ndarray:
+    """Estimated driving minutes from start to each point."""
+    lat = np.concatenate([[float(start["lat"])], np.asarray(lats, dtype=float)])
+    lon = np.concatenate([[float(start["lon"])], np.asarray(lons, dtype=float)])
+    _, dur_s = local_table(lat, lon)
+    return dur_s[0, 1:] / 60.0
+
+
+def select_candidates(
+    stations: list,
+    start: dict,
+    n: int = DISTANCE_CANDIDATES,
+    low_threshold: int = LOW_THRESHOLD,
+    time_budget_min: float = DEFAULT_TIME_BUDGET_MIN,
+) -> list:
+    """
+    The n most valuable station records (id, latitude, longitude, optionally
+    free_bikes / empty_slots), receivers and donors interleaved.
+    """
+    if len(stations) <= n:
+        return list(stations)
+
+    free = np.array([float(s.get("free_bikes") or 0) for s in stations])
+    empty = np.array([float(s.get("empty_slots") or 0) for s in stations])
+    has_state = np.array([s.get("free_bikes") is not None for s in stations])
+    minutes = travel_minutes(start, [s["latitude"] for s in stations], [s["longitude"] for s in stations])
+
+    receiver = has_state & (free < low_threshold)
+    value = np.where(receiver, np.maximum(empty, 0), np.maximum(free - low_threshold, 0))
+    priority = value * np.clip(1.0 - minutes / float(time_budget_min), 0.0, None)
+
+    # Highest priority first, nearer first among equals
+    order = np.lexsort((minutes, -priority))
+    queues = [[i for i in order if receiver[i] and priority[i] > 0], [i for i in order if not receiver[i] and priority[i] > 0]]
+
+    chosen = []
+    while len(chosen) < n and (queues[0] or queues[1]):
+        for q in queues:
+            if q and len(chosen) < n:
+                chosen.append(q.pop(0))
+
+    # Fill up with whatever is left (no value, but may still be useful legs)
+    taken = set(chosen)
+    chosen.extend([i for i in order if i not in taken][: n - len(chosen)])
+    return [stations[i] for i in chosen]
+
+
+def prune_distance_args(args: dict, user_context: dict) -> dict:
+    """
+    get_distances args with `stations` = the stations the LLM asked for (the best
+    DISTANCE_CANDIDATES of them if it asked for more), topped up to
+    DISTANCE_CANDIDATES with the best other candidates from the nearby index.
+    The time budget is the request's time_budget_min (DEFAULT_TIME_BUDGET_MIN if unset).
+    """
+    ctx = user_context.get("context") or {}
+    nearby = ctx.get("nearby_stations") or ctx.get("get_nearby_stations")
+    start = args.get("start_coordinates") or user_context.get("start_coordinates")
+    if not isinstance(nearby, list) or not start:
+        return args
+
+    index = {str(s.get("id")): s for s in nearby}
+    requested = {}
+    for s in args.get("stations") or []:
+        sid = str(s.get("id"))
+        if sid != "start":
+            # Prefer the index record: its coordinates come from the feature store
+            requested.setdefault(sid, index.get(sid, s))
+    extras = [s for sid, s in index.items() if sid not in requested and sid != "start"]
+
+    budget = float(user_context.get("time_budget_min") or DEFAULT_TIME_BUDGET_MIN)
+    # Asking for more than fit keeps the best of them, ranked like any other candidates
+    chosen = select_candidates(list(requested.values()), start, n=DISTANCE_CANDIDATES, time_budget_min=budget)
+    slots = DISTANCE_CANDIDATES - len(chosen)
+    if slots and extras:
+        chosen += select_candidates(extras, start, n=slots, time_budget_min=budget)
+    print(f"[CANDIDATES] get_distances for {len(chosen)} stations ({len(requested)} requested, {len(index)} nearby)")
+    return {
+        **args,
+        "stations": [
+            {"id": str(s["id"]), "latitude": float(s["latitude"]), "longitude": float(s["longitude"])} for s in chosen
+        ],
+        "start_coordinates": {"lat": float(start["lat"]), "lon": float(start["lon"])},
+    }
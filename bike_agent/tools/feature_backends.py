@@ -0,0 +1,397 @@
+# bike_agent/tools/feature_backends.py
+"""
+Feature backends behind feature_store.get_features().
+
+- ParquetBackend: local columnar snapshot store, partitioned by date
+  (date=YYYY-MM-DD/part-*.parquet). Reads are memory-mapped, project columns and
+  push id/timestamp predicates down to pyarrow (partition pruning + row-group stats).
+- HopsworksBackend: the hosted feature store (feature view, fallback feature group).
+
+FEATURE_BACKEND selects the backend: "local", "hopsworks" or "auto" (default:
+local when FEATURE_STORE_DIR holds data no older than LOCAL_STORE_MAX_AGE_S,
+else Hopsworks). The ingest pipeline writes the local store and syncs to Hopsworks.
+"""
+
+import abc
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+from bike_agent.resilience import HOPSWORKS_LOGIN_TIMEOUT_S, breaker, call_with_deadline
+from bike_agent.tracing import incr
+
+FEATURE_STORE_DIR = Path(os.getenv("FEATURE_STORE_DIR", "data/features"))
+
+# latest_only reads look this far back (in partitions / time) for each station's last row
+LATEST_PARTITIONS = 2
+LATEST_LOOKBACK = pd.Timedelta(days=1)
+# auto mode skips a local store whose newest row is older than this (ingest stopped)
+LOCAL_STORE_MAX_AGE_S = float(os.getenv("LOCAL_STORE_MAX_AGE_S", str(3 * 3600)))
+
+
+class FeatureBackend(abc.ABC):
+    name = "base"
+
+    @abc.abstractmethod
+    def read(self, columns=None, station_ids=None, since=None, until=None, latest_only=False) -> pd.DataFrame:
+        """
+        Station history. columns: projection (None = all); station_ids: only these ids;
+        since/until: timestamp window (inclusive / exclusive); latest_only: one row per station.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def write(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def lookup(self, station_ids, columns=None) -> pd.DataFrame:
+        """Latest row for each of `station_ids` (point lookup; cost scales with len(station_ids))."""
+        return self.read(columns=columns, station_ids=station_ids, latest_only=True)
+
+    @abc.abstractmethod
+    def read_group(self, name: str, version: int = 1):
+        """A whole (small) auxiliary feature group, e.g. fitted model tables; None if it does not exist."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def write_group(self, name: str, df: pd.DataFrame, primary_key, version: int = 1,
+                    event_time=None, online_enabled=False) -> None:
+        """Replace (local) or upsert into (Hopsworks) an auxiliary feature group."""
+        raise NotImplementedError
+
+
+def latest_rows(df):
+    """Latest observation per station id (ordered by id)."""
+    # Sort + drop_duplicates stays vectorized; groupby().idxmax() loops per station in pandas 2.1
+    latest = df.sort_values("timestamp", kind="stable").drop_duplicates("id", keep="last")
+    return latest.sort_values("id", kind="stable").copy()
+
+
+def _with_keys(columns):
+    """Projection plus the columns needed to pick the latest row per station."""
+    if columns is None:
+        return None
+    return list(dict.fromkeys(["id", "timestamp", *columns]))
+
+
+def _filter_frame(df, columns=None, station_ids=None, since=None, until=None):
+    """Apply a read() request in pandas (for backends without native pushdown)."""
+    if station_ids is not None:
+        df = df[df["id"].isin(list(station_ids))]
+    if since is not None:
+        df = df[df["timestamp"] >= pd.Timestamp(since)]
+    if until is not None:
+        df = df[df["timestamp"] < pd.Timestamp(until)]
+    if columns is not None:
+        df = df[list(columns)]
+    return df.reset_index(drop=True)
+
+
+class ParquetBackend(FeatureBackend):
+    name = "local"
+
+    def __init__(self, root: Path = None):
+        self.root = Path(root or FEATURE_STORE_DIR)
+
+    def has_data(self) -> bool:
+        return self.root.is_dir() and any(self.root.glob("date=*/*.parquet"))
+
+    def newest_timestamp(self):
+        """Newest row timestamp in the newest partition (None when empty). Memoized per file set."""
+        dates = sorted(self.root.glob("date=*"))
+        files = sorted(dates[-1].glob("part-*.parquet")) if dates else []
+        if not files:
+            return None
+        key = (str(self.root), tuple((f.name, f.stat().st_mtime_ns) for f in files))
+        if _NEWEST.get("key") != key:
+            import pyarrow.parquet as pq
+
+            newest = max(pd.Timestamp(pq.read_table(f, columns=["timestamp"])["timestamp"].to_pandas().max()) for f in files)
+            _NEWEST.update(key=key, ts=newest)
+        return _NEWEST["ts"]
+
+    def _dataset(self):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        from pyarrow import fs as pafs
+
+        return ds.dataset(
+            str(self.root),
+            format="parquet",
+            partitioning=ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive"),
+            filesystem=pafs.LocalFileSystem(use_mmap=True),
+        )
+
+    def read(self, columns=None, station_ids=None, since=None, until=None, latest_only=False) -> pd.DataFrame:
+        if not self.has_data():
+            return pd.DataFrame(columns=list(columns) if columns else [])
+
+        if not latest_only:
+            return self._scan(columns, station_ids, since, until)
+
+        # Only the newest partitions can hold a station's latest row (ingest heartbeats
+        # every active station); fall back to a full scan if that misses stations.
+        dates = sorted(p.name.split("=", 1)[1] for p in self.root.glob("date=*"))
+        recent = self._scan(_with_keys(columns), station_ids, since, until, min_date=dates[-LATEST_PARTITIONS:][0])
+        if recent.empty or (station_ids is not None and not set(station_ids) <= set(recent["id"])):
+            recent = self._scan(_with_keys(columns), station_ids, since, until)
+        if recent.empty:
+            return recent
+        latest = latest_rows(recent)
+        return (latest[list(columns)] if columns is not None else latest).reset_index(drop=True)
+
+    def _scan(self, columns=None, station_ids=None, since=None, until=None, min_date=None) -> pd.DataFrame:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        dataset = self._dataset()
+        ts_type = dataset.schema.field("timestamp").type
+
+        expr = None
+
+        def _and(e):
+            return e if expr is None else expr & e
+
+        if min_date is not None:
+            expr = _and(ds.field("date") >= min_date)
+        if station_ids is not None:
+            expr = _and(ds.field("id").isin(pa.array([str(s) for s in station_ids], type=pa.string())))
+        if since is not None:
+            since = pd.Timestamp(since)
+            expr = _and(ds.field("date") >= since.strftime("%Y-%m-%d"))
+            expr = _and(ds.field("timestamp") >= pa.scalar(since.to_pydatetime(), type=ts_type))
+        if until is not None:
+            until = pd.Timestamp(until)
+            expr = _and(ds.field("date") <= until.strftime("%Y-%m-%d"))
+            expr = _and(ds.field("timestamp") < pa.scalar(until.to_pydatetime(), type=ts_type))
+
+        names = [f for f in dataset.schema.names if f != "date"]
+        table = dataset.to_table(columns=_with_keys(columns) or names, filter=expr)
+        # A retried ingest may have written the same rows twice
+        df = table.to_pandas().drop_duplicates(["id", "timestamp"], ignore_index=True)
+        return df[list(columns)] if columns else df
+
+    def write(self, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        df = df.copy()
+        df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+        dates = df["timestamp"].dt.strftime("%Y-%m-%d")
+
+        for date, part in df.groupby(dates):
+            out_dir = self.root / f"date={date}"
+            out_dir.mkdir(parents=True, exist_ok=True)
+            tmp = out_dir / f".part-{uuid.uuid4().hex}.tmp"
+            part.sort_values(["id", "timestamp"]).to_parquet(tmp, index=False)
+            tmp.replace(out_dir / f"part-{uuid.uuid4().hex}.parquet")
+
+    def _group_path(self, name: str, version: int) -> Path:
+        # Outside the date=* partitions, so station reads never see it
+        return self.root / "groups" / f"{name}_v{version}.parquet"
+
+    def read_group(self, name: str, version: int = 1):
+        path = self._group_path(name, version)
+        return pd.read_parquet(path) if path.exists() else None
+
+    def write_group(self, name: str, df: pd.DataFrame, primary_key, version: int = 1,
+                    event_time=None, online_enabled=False) -> None:
+        path = self._group_path(name, version)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.parent / f".{path.name}.{uuid.uuid4().hex}.tmp"
+        df.to_parquet(tmp, index=False)
+        tmp.replace(path)
+
+    def compact(self, date: str = None) -> None:
+        """Merge the small per-poll files of one date (or all dates) into one file."""
+        dirs = [self.root / f"date={date}"] if date else sorted(self.root.glob("date=*"))
+        for d in dirs:
+            files = sorted(d.glob("part-*.parquet"))
+            if len(files) < 2:
+                continue
+            merged = pd.concat([pd.read_parquet(f) for f in files], ignore_index=True)
+            merged = merged.drop_duplicates(["id", "timestamp"])
+            tmp = d / f".part-{uuid.uuid4().hex}.tmp"
+            merged.sort_values(["id", "timestamp"]).to_parquet(tmp, index=False)
+            tmp.replace(d / f"part-{uuid.uuid4().hex}.parquet")
+            for f in files:
+                f.unlink()
+
+
+_NEWEST = {}
+
+
+# Online lookups: one serving-initialised feature view per API key, and a short
+# per-(key, station) LRU cache in front of it so repeated lookups skip the network.
+ONLINE_CACHE_TTL_S = float(os.getenv("ONLINE_CACHE_TTL_S", "30"))
+ONLINE_CACHE_SIZE = int(os.getenv("ONLINE_CACHE_SIZE", "10000"))
+_SERVING = {}
+_SERVING_LOCK = threading.Lock()
+_ONLINE_CACHE = OrderedDict()
+_ONLINE_CACHE_LOCK = threading.Lock()
+
+
+def _query_errors():
+    """Errors meaning "this query shape is not supported", not "Hopsworks is down"."""
+    from hsfs.client.exceptions import FeatureStoreException, RestAPIError
+
+    return (FeatureStoreException, RestAPIError, AttributeError, NotImplementedError, ValueError)
+
+
+class HopsworksBackend(FeatureBackend):
+    name = "hopsworks"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key or os.getenv("HOPSWORKS_API_KEY")
+
+    def _feature_store(self):
+        import hopsworks
+
+        project = call_with_deadline(
+            lambda: hopsworks.login(api_key_value=self.api_key), HOPSWORKS_LOGIN_TIMEOUT_S, "hopsworks.login"
+        )
+        return project.get_feature_store()
+
+    def _serving_view(self):
+        fv = _SERVING.get(self.api_key)
+        if fv is None:
+            with _SERVING_LOCK:
+                fv = _SERVING.get(self.api_key)
+                if fv is None:
+                    fv = self._feature_store().get_feature_view(name="station_dynamics_view", version=1)
+                    fv.init_serving()
+                    _SERVING[self.api_key] = fv
+        return fv
+
+    def lookup(self, station_ids, columns=None) -> pd.DataFrame:
+        now = time.time()
+        ids = [str(s) for s in station_ids]
+
+        rows = {}
+        misses = []
+        for sid in ids:
+            hit = _ONLINE_CACHE.get((self.api_key, sid))
+            if hit is not None and now - hit[0] < ONLINE_CACHE_TTL_S:
+                rows[sid] = hit[1]
+            else:
+                misses.append(sid)
+        incr("cache_hits", len(ids) - len(misses))
+
+        if misses:
+            # One batched primary-key lookup against the online store for all misses
+            with breaker("hopsworks").guard():
+                fetched = self._serving_view().get_feature_vectors(
+                    entry=[{"id": sid} for sid in misses],
+                    return_type="pandas",
+                )
+            with _ONLINE_CACHE_LOCK:
+                for row in fetched.to_dict(orient="records"):
+                    if row.get("id") is None:
+                        continue
+                    key = (self.api_key, str(row["id"]))
+                    _ONLINE_CACHE[key] = (now, row)
+                    _ONLINE_CACHE.move_to_end(key)
+                    rows[str(row["id"])] = row
+                while len(_ONLINE_CACHE) > ONLINE_CACHE_SIZE:
+                    _ONLINE_CACHE.popitem(last=False)
+
+        df = pd.DataFrame([rows[sid] for sid in ids if sid in rows])
+        if columns is not None:
+            df = df.reindex(columns=list(columns)) if df.empty else df[list(columns)]
+        return df.reset_index(drop=True)
+
+    def read(self, columns=None, station_ids=None, since=None, until=None, latest_only=False) -> pd.DataFrame:
+        with breaker("hopsworks").guard():
+            return self._read(columns, station_ids, since, until, latest_only)
+
+    def _read(self, columns, station_ids, since, until, latest_only) -> pd.DataFrame:
+        fs = self._feature_store()
+
+        if latest_only:
+            window_since = pd.Timestamp.now(tz="UTC") - LATEST_LOOKBACK
+            if since is not None:
+                window_since = max(window_since, pd.Timestamp(since))
+            df = self._query(fs, _with_keys(columns), station_ids, window_since, until)
+            if df.empty:
+                df = self._query(fs, _with_keys(columns), station_ids, since, until)
+            if df.empty:
+                return df
+            latest = latest_rows(df)
+            return (latest[list(columns)] if columns is not None else latest).reset_index(drop=True)
+
+        return self._query(fs, columns, station_ids, since, until)
+
+    def _query(self, fs, columns, station_ids, since, until) -> pd.DataFrame:
+        fg = fs.get_feature_group(name="station_dynamics", version=1)
+        errors = _query_errors()
+
+        # Push projection and filters into the feature group query
+        try:
+            query = fg.select(list(columns)) if columns is not None else fg.select_all()
+            conditions = []
+            if station_ids is not None:
+                conditions.append(fg.id.isin([str(s) for s in station_ids]))
+            if since is not None:
+                conditions.append(fg.timestamp >= pd.Timestamp(since))
+            if until is not None:
+                conditions.append(fg.timestamp < pd.Timestamp(until))
+            if conditions:
+                cond = conditions[0]
+                for c in conditions[1:]:
+                    cond = cond & c
+                query = query.filter(cond)
+            return query.read().reset_index(drop=True)
+        except errors as e:
+            print(f"[FEATURES] Filtered query failed ({e!r}); filtering a full read instead")
+
+        # Try to get the view first for speed, fallback to group
+        try:
+            fv = fs.get_feature_view(name="station_dynamics_view", version=1)
+            df = fv.get_batch_data()
+        except errors as e:
+            print(f"[FEATURES] Feature view read failed ({e!r}); reading the feature group")
+            df = fg.read()
+        return _filter_frame(df, columns, station_ids, since, until)
+
+    def write(self, df: pd.DataFrame) -> None:
+        fs = self._feature_store()
+        fs.get_feature_group(name="station_dynamics", version=1).insert(df)
+
+    def read_group(self, name: str, version: int = 1):
+        with breaker("hopsworks").guard():
+            fg = self._feature_store().get_feature_group(name=name, version=version)
+            return None if fg is None else fg.read()
+
+    def write_group(self, name: str, df: pd.DataFrame, primary_key, version: int = 1,
+                    event_time=None, online_enabled=False) -> None:
+        fg = self._feature_store().get_or_create_feature_group(
+            name=name,
+            version=version,
+            primary_key=list(primary_key),
+            event_time=event_time,
+            online_enabled=online_enabled,
+        )
+        fg.insert(df)
+
+
+def get_backend(api_key=None, choice: str = None) -> FeatureBackend:
+    """Backend for `choice` ("local", "hopsworks" or "auto"; default: FEATURE_BACKEND)."""
+    choice = (choice or os.getenv("FEATURE_BACKEND", "auto")).lower()
+    if choice == "local":
+        return ParquetBackend()
+    if choice == "hopsworks":
+        return HopsworksBackend(api_key)
+
+    local = ParquetBackend()
+    if not local.has_data():
+        return HopsworksBackend(api_key)
+    newest = local.newest_timestamp()
+    age_s = (pd.Timestamp.now(tz="UTC") - pd.Timestamp(newest)).total_seconds() if newest is not None else float("inf")
+    if age_s > LOCAL_STORE_MAX_AGE_S and (api_key or os.getenv("HOPSWORKS_API_KEY")):
+        print(f"[FEATURES] Local store is {age_s / 60:.0f} min old; reading from Hopsworks")
+        return HopsworksBackend(api_key)
+    return local
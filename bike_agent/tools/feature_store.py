@@ -1,14 +1,115 @@
-import hopsworks
+import itertools
 import os
+import threading
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
 
-def get_features(api_key):
-    project = hopsworks.login(api_key_value=api_key)
-    fs = project.get_feature_store()
-    
-    # Try to get the view first for speed, fallback to group
+from .feature_backends import _filter_frame, get_backend, latest_rows
+from .latest_state import latest_version, read_latest
+
+# Snapshot pinned by the caller (e.g. batch planning) so every tool call in the
+# same context reads one shared DataFrame instead of going back to Hopsworks.
+_SNAPSHOT = ContextVar("feature_snapshot", default=None)
+
+
+@contextmanager
+def use_snapshot(df):
+    """Serve get_features() from `df` for the duration of the block."""
+    token = _SNAPSHOT.set(df)
     try:
-        fv = fs.get_feature_view(name="station_dynamics_view", version=1)
-        return fv.get_batch_data()
-    except:
-        fg = fs.get_feature_group(name="station_dynamics", version=1)
-        return fg.read()
\ No newline at end of file
+        yield df
+    finally:
+        _SNAPSHOT.reset(token)
+
+
+# id(snapshot) -> (weakref, version): one version per pinned DataFrame, however often it is pinned
+_SNAPSHOT_VERSIONS = {}
+_SNAPSHOT_SEQ = itertools.count(1)
+_VERSIONS_LOCK = threading.Lock()
+
+
+def _pinned_version(df) -> int:
+    key = id(df)
+    hit = _SNAPSHOT_VERSIONS.get(key)
+    if hit is not None and hit[0]() is df:
+        return hit[1]
+
+    def _forget(ref, key=key):
+        with _VERSIONS_LOCK:
+            if _SNAPSHOT_VERSIONS.get(key, (None,))[0] is ref:
+                del _SNAPSHOT_VERSIONS[key]
+
+    with _VERSIONS_LOCK:
+        version = next(_SNAPSHOT_SEQ)
+        _SNAPSHOT_VERSIONS[key] = (weakref.ref(df, _forget), version)
+    return version
+
+
+def snapshot_version():
+    """
+    Identifies the station data get_latest_features() would serve right now:
+    the pinned snapshot, the latest-state publication, or None for the feature
+    store (which has no cheap version; callers fall back to a TTL).
+    """
+    snapshot = _SNAPSHOT.get()
+    if snapshot is not None:
+        return ("snapshot", _pinned_version(snapshot))
+
+    if read_latest() is not None:
+        return ("latest", latest_version())
+    return None
+
+
+def get_features(api_key, columns=None, latest_only=False, since=None, until=None, station_ids=None):
+    """
+    Station history (or only the latest row per station with latest_only=True).
+
+    columns: only these columns; since/until: timestamp window; station_ids: only these
+    stations. All of them are pushed down into the backend query where possible.
+    """
+    snapshot = _SNAPSHOT.get()
+    if snapshot is not None:
+        df = latest_rows(snapshot) if latest_only else snapshot
+        return _filter_frame(df, columns, station_ids, since, until)
+
+    return get_backend(api_key).read(
+        columns=columns,
+        station_ids=station_ids,
+        since=since,
+        until=until,
+        latest_only=latest_only,
+    )
+
+
+def get_latest_features(api_key, columns=None, station_ids=None):
+    """
+    Latest row per station. Served from the pinned snapshot or the ingest daemon's
+    latest-state store when available, otherwise from the feature store.
+    """
+    if _SNAPSHOT.get() is None:
+        latest = read_latest()
+        if latest is not None:
+            return _filter_frame(latest, columns, station_ids)
+
+    return get_features(api_key, columns=columns, latest_only=True, station_ids=station_ids)
+
+
+def lookup_latest(api_key, station_ids, columns=None):
+    """
+    Point lookup of the latest row for `station_ids` only: pinned snapshot, latest-state
+    store, then the backend's online lookup. Falls back to the bulk latest read on errors.
+    """
+    if _SNAPSHOT.get() is not None or read_latest() is not None:
+        return get_latest_features(api_key, columns=columns, station_ids=station_ids)
+
+    try:
+        return get_backend(api_key).lookup(station_ids, columns=columns)
+    except Exception as e:
+        print(f"[FEATURE STORE] Online lookup failed ({e}); falling back to bulk read")
+        return get_features(api_key, columns=columns, latest_only=True, station_ids=station_ids)
+
+
+def read_feature_group(api_key, name, version=1):
+    """Read a whole (small) feature group, e.g. fitted model tables, from the active backend. None if missing."""
+    return get_backend(api_key).read_group(name, version)
@@ -0,0 +1,120 @@
+# bike_agent/tools/forecasting.py
+"""
+Lightweight per-station, per-time-of-day demand model.
+
+For every station and every 15-minute slot of the (local) day we estimate the
+average drift of free_bikes in bikes/minute from consecutive snapshots in
+station_dynamics. A forecast for horizon h integrates the drift over
+[now, now + h], so 15/30/60-minute predictions come from the same table.
+
+Everything is plain vectorized NumPy: fitting is a couple of bincounts and
+inference for all stations is a handful of array lookups.
+"""
+
+import numpy as np
+import pandas as pd
+
+SLOT_MIN = 15
+N_SLOTS = 24 * 60 // SLOT_MIN
+HORIZONS_MIN = (15, 30, 60)
+LOCAL_TZ = "Europe/Madrid"
+
+# Pseudo-count pulling sparse slots towards the station's all-day mean drift
+SHRINK = 4.0
+# Gaps longer than this are not used to estimate drift (missed polls, outages)
+MAX_GAP_MIN = 180.0
+
+
+def minute_of_day(timestamps) -> np.ndarray:
+    ts = pd.to_datetime(pd.Series(timestamps), utc=True).dt.tz_convert(LOCAL_TZ)
+    return (ts.dt.hour * 60 + ts.dt.minute + ts.dt.second / 60.0).to_numpy(dtype=float)
+
+
+def fit_rates(df: pd.DataFrame, shrink: float = SHRINK):
+    """
+    df: station history with columns id, timestamp, free_bikes.
+
+    Returns (station_ids, rates) where rates has shape (n_stations, N_SLOTS) in bikes/min.
+    """
+    d = df[["id", "timestamp", "free_bikes"]].dropna().copy()
+    d["timestamp"] = pd.to_datetime(d["timestamp"], utc=True)
+    d = d.sort_values(["id", "timestamp"])
+
+    station_ids, sidx = np.unique(d["id"].astype(str).to_numpy(), return_inverse=True)
+    n = len(station_ids)
+    if n == 0:
+        return station_ids, np.zeros((0, N_SLOTS))
+
+    t_min = d["timestamp"].astype("int64").to_numpy() / 60e9
+    free = d["free_bikes"].to_numpy(dtype=float)
+    mod = minute_of_day(d["timestamp"])
+
+    # Consecutive snapshot pairs of the same station
+    same = sidx[1:] == sidx[:-1]
+    dt = t_min[1:] - t_min[:-1]
+    ok = same & (dt > 0) & (dt <= MAX_GAP_MIN)
+
+    s = sidx[:-1][ok]
+    slot = (mod[:-1][ok] // SLOT_MIN).astype(int) % N_SLOTS
+    rate = (free[1:] - free[:-1])[ok] / dt[ok]
+
+    flat = s * N_SLOTS + slot
+    sums = np.bincount(flat, weights=rate, minlength=n * N_SLOTS).reshape(n, N_SLOTS)
+    counts = np.bincount(flat, minlength=n * N_SLOTS).reshape(n, N_SLOTS)
+
+    station_sum = np.bincount(s, weights=rate, minlength=n)
+    station_cnt = np.bincount(s, minlength=n)
+    station_mean = np.divide(station_sum, station_cnt, out=np.zeros(n), where=station_cnt > 0)
+
+    rates = (sums + shrink * station_mean[:, None]) / (counts + shrink)
+    return station_ids, rates
+
+
+def rates_to_frame(station_ids, rates) -> pd.DataFrame:
+    """Long format (id, slot, rate_per_min) for storage in the feature store."""
+    n = len(station_ids)
+    return pd.DataFrame({
+        "id": np.repeat(np.asarray(station_ids, dtype=str), N_SLOTS),
+        "slot": np.tile(np.arange(N_SLOTS), n),
+        "rate_per_min": rates.reshape(-1),
+    })
+
+
+def rates_from_frame(df: pd.DataFrame):
+    """Inverse of rates_to_frame."""
+    station_ids, sidx = np.unique(df["id"].astype(str).to_numpy(), return_inverse=True)
+    rates = np.zeros((len(station_ids), N_SLOTS))
+    rates[sidx, df["slot"].to_numpy(dtype=int)] = df["rate_per_min"].to_numpy(dtype=float)
+    return station_ids, rates
+
+
+def cumulative_rates(rates: np.ndarray) -> np.ndarray:
+    # Two days of slots so horizons crossing midnight need no special case
+    tiled = np.concatenate([rates, rates], axis=1) * SLOT_MIN
+    return np.concatenate([np.zeros((rates.shape[0], 1)), np.cumsum(tiled, axis=1)], axis=1)
+
+
+def _integral(rates, cum, rows, m):
+    """Integral of drift from local midnight to minute m (m < 2 days), per row."""
+    slot = (m // SLOT_MIN).astype(int)
+    within = m - slot * SLOT_MIN
+    return cum[rows, slot] + rates[rows, slot % N_SLOTS] * within
+
+
+def predict_free_bikes(rates, free_bikes, capacity, minute_now: float, horizons=HORIZONS_MIN, rows=None, cum=None) -> np.ndarray:
+    """
+    Predicted free_bikes for each station (row) and horizon, shape (n, len(horizons)).
+    Clipped to [0, capacity]. Pass `cum=cumulative_rates(rates)` to reuse it across calls.
+    """
+    rows = np.arange(rates.shape[0]) if rows is None else np.asarray(rows)
+    cum = cumulative_rates(rates) if cum is None else cum
+    m0 = np.full(len(rows), float(minute_now) % (24 * 60))
+    base = _integral(rates, cum, rows, m0)
+
+    free_bikes = np.asarray(free_bikes, dtype=float)
+    capacity = np.asarray(capacity, dtype=float)
+    out = np.empty((len(rows), len(horizons)))
+    for j, h in enumerate(horizons):
+        delta = _integral(rates, cum, rows, m0 + h) - base
+        out[:, j] = np.clip(free_bikes + delta, 0, capacity)
+    return out
@@ -6,6 +6,15 @@ import numpy as np
 import pandas as pd
 import requests
 
+from bike_agent.resilience import breaker, timeout_for
+
+from .hierarchical import OSRM_MAX_TABLE_POINTS, hierarchical_table
+from .osrm_local import local_table
+from .travel_matrix import TravelMatrix, directed_mode, store
+
+# Per-request cap; shortened further by the tool / request deadline
+OSRM_TIMEOUT_S = float(os.getenv("OSRM_TIMEOUT_S", "30"))
+
 
 def get_distances(
     stations: Union[pd.DataFrame, List[Dict]],
@@ -28,10 +37,69 @@ def get_distances(
 
     Note: This is an UNDIRECTED approximation for readability.
     We take the average of OSRM(i->j) and OSRM(j->i) for distance/time.
+    With DIRECTED_DISTANCES=1 the full matrices are kept aside (see travel_matrix)
+    and the result carries their "matrix_id".
     """
-    if base_url is None:
-        base_url = os.getenv("OSRM_BASE_URL", "http://router.project-osrm.org")
+    df = _stations_frame(stations, start_coordinates)
+
+    if df.empty:
+        return {"ids": [], "pairs": [], "units": {"distance": "km", "duration": "min"}}
+
+    # Stable ordering
+    ids = df["id"].tolist()
+    dist_m, dur_s = _osrm_table(df, base_url=base_url, profile=profile)
+
+    return _result(ids, dist_m, dur_s)
+
+
+def get_distance_matrix(
+    stations: Union[pd.DataFrame, List[Dict]],
+    base_url: str = None,
+    profile: str = "driving",
+) -> Dict:
+    """
+    Fetch the full OSRM matrix for a set of points in a single table call
+    (per-cluster calls, composed, above OSRM_MAX_TABLE_POINTS points).
+
+    Used when several requests share the same candidate stations (batch planning):
+    fetch once, then cut per-request results out with `distances_from_matrix`.
+
+    RETURNS:
+    {"ids": [...], "distances_m": np.ndarray (n, n), "durations_s": np.ndarray (n, n)}
+    """
+    if len(stations) == 0:
+        return {"ids": [], "distances_m": np.zeros((0, 0)), "durations_s": np.zeros((0, 0))}
+
+    df = _stations_frame(stations, None)
+    ids = df["id"].tolist()
+    dist_m, dur_s = _osrm_table(df, base_url=base_url, profile=profile)
+    return {"ids": ids, "distances_m": dist_m, "durations_s": dur_s}
+
 
+def distances_from_matrix(matrix: Dict, ids: List[str], rename: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    Build a get_distances-shaped result for a subset of a shared matrix.
+
+    rename: optional mapping of matrix ids to output ids, e.g. {"start:2": "start"}.
+    """
+    index = {sid: i for i, sid in enumerate(matrix["ids"])}
+    missing = [sid for sid in ids if sid not in index]
+    if missing:
+        raise ValueError(f"ids not present in distance matrix: {missing}")
+
+    idx = [index[sid] for sid in ids]
+    dist_m = matrix["distances_m"][np.ix_(idx, idx)]
+    dur_s = matrix["durations_s"][np.ix_(idx, idx)]
+
+    rename = rename or {}
+    out_ids = [rename.get(sid, sid) for sid in ids]
+    return _result(out_ids, dist_m, dur_s)
+
+
+def _stations_frame(
+    stations: Union[pd.DataFrame, List[Dict]],
+    start_coordinates: Optional[Dict[str, float]],
+) -> pd.DataFrame:
     # Normalize input to DataFrame
     if isinstance(stations, list):
         df = pd.DataFrame(stations)
@@ -61,27 +129,56 @@ def get_distances(
             }])
             df = pd.concat([start_row, df], ignore_index=True)
 
-    if df.empty:
-        return {"ids": [], "pairs": [], "units": {"distance": "km", "duration": "min"}}
+    return df
 
-    # Stable ordering
-    ids = df["id"].tolist()
+
+def _osrm_table(df: pd.DataFrame, base_url: str = None, profile: str = "driving"):
+    if base_url is None:
+        base_url = os.getenv("OSRM_BASE_URL", "http://router.project-osrm.org")
+
+    lat = df["latitude"].to_numpy(dtype=float)
+    lon = df["longitude"].to_numpy(dtype=float)
+
+    def table(lat, lon):
+        return _table(lat, lon, base_url, profile)
+
+    # Above the per-request limit: per-cluster tables composed via hubs (see hierarchical.py)
+    return hierarchical_table(lat, lon, table, max_points=OSRM_MAX_TABLE_POINTS)
+
+
+def _table(lat: np.ndarray, lon: np.ndarray, base_url: str, profile: str):
+    if base_url == "local":
+        # In-process stand-in (offline runs, load tests): same matrices, no HTTP
+        return local_table(lat, lon)
 
     # OSRM wants "lon,lat" pairs
-    coords = ";".join([f"{lon},{lat}" for lon, lat in zip(df["longitude"], df["latitude"])])
+    coords = ";".join([f"{x},{y}" for x, y in zip(lon, lat)])
     url = f"{base_url}/table/v1/{profile}/{coords}"
     params = {"annotations": "distance,duration"}
 
-    r = requests.get(url, params=params, timeout=30)
-    r.raise_for_status()
-    data = r.json()
+    with breaker("osrm").guard():
+        r = requests.get(url, params=params, timeout=timeout_for(OSRM_TIMEOUT_S, "OSRM table"))
+        r.raise_for_status()
+        data = r.json()
 
-    if data.get("code") != "Ok":
-        raise RuntimeError(f"OSRM table failed: {data.get('code')}")
+        if data.get("code") != "Ok":
+            raise RuntimeError(f"OSRM table failed: {data.get('code')}")
 
     dist_m = np.array(data["distances"], dtype=float)   # meters
     dur_s  = np.array(data["durations"], dtype=float)   # seconds
+    return dist_m, dur_s
+
 
+def _result(ids: List[str], dist_m: np.ndarray, dur_s: np.ndarray) -> Dict:
+    result = _undirected_result(ids, dist_m, dur_s)
+    if directed_mode():
+        # Directed legs for validation / scoring / instructions; the LLM still sees the pairs
+        result["matrix_id"] = store(TravelMatrix(ids, dist_m, dur_s))
+        result["note"] = "pairs are undirected approx: avg(i->j, j->i). Routes are timed with directed legs."
+    return result
+
+
+def _undirected_result(ids: List[str], dist_m: np.ndarray, dur_s: np.ndarray) -> Dict:
     # Build triangular unique pairs, using undirected approximation:
     # avg(i->j, j->i) to reduce directional noise and keep "one value per pair".
     n = len(ids)
@@ -112,4 +209,4 @@ def get_distances(
         "pairs": pairs,
         "units": {"distance": "km", "duration": "min"},
         "note": "pairs are undirected approx: avg(i->j, j->i). Use full matrix if you need directionality.",
-    }
\ No newline at end of file
+    }
@@ -1,8 +1,3 @@
-import os
-import numpy as np
-import pandas as pd
-from .feature_store import get_features
-
 """
 Computes distance from the current driver location (START_LAT, START_LON) to each station.
 
@@ -15,6 +10,12 @@ Use case: “I'm at this spot — which stations are close enough to visit next?
 So get_nearby_stations is driver-centric and gives a local, filtered view.
 """
 
+import os
+import numpy as np
+from .feature_store import get_latest_features
+from .reservations import get_ledger
+from .station_table import StationTable
+
 def _haversine_km(lat1, lon1, lat2, lon2):
     """
     Compute Haversine distance in km between two points.
@@ -37,11 +38,11 @@ def _haversine_km(lat1, lon1, lat2, lon2):
     R = 6371  # Earth radius in km
     return R * c
 
-def get_nearby_stations(k: int, radius_km: float, lat: float, lon: float) -> pd.DataFrame:
+def get_nearby_stations(k: int, radius_km: float, lat: float, lon: float) -> StationTable:
     """
     Returns nearby station IDs, coordinates, free_bikes, empty_slots in order of how close they are.
 
-    Output columns:
+    Output: StationTable with fields
       id, latitude, longitude, free_bikes, empty_slots, distance_km
     """
     if k <= 0:
@@ -49,25 +50,42 @@ def get_nearby_stations(k: int, radius_km: float, lat: float, lon: float) -> pd.
     if radius_km <= 0:
         raise ValueError("radius_km must be > 0.")
 
-    df = get_features(api_key=os.getenv("HOPSWORKS_API_KEY"))
+    # Latest observation per station id
+    required = ["id", "latitude", "longitude", "free_bikes", "empty_slots"]
+    try:
+        latest = get_latest_features(api_key=os.getenv("HOPSWORKS_API_KEY"), columns=required)
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"get_features() is missing required columns: {e}") from e
 
-    required = {"id", "latitude", "longitude", "timestamp", "free_bikes", "empty_slots"}
-    missing = required - set(df.columns)
+    missing = set(required) - set(latest.columns)
     if missing:
         raise ValueError(f"get_features() is missing required columns: {sorted(missing)}")
 
-    # Take latest observation per station id
-    latest_idx = df.groupby("id")["timestamp"].idxmax()
-    latest = df.loc[latest_idx].copy()
-
-    # Compute distance and filter by radius
-    latest["distance_km"] = _haversine_km(
-        lat, lon,
-        latest["latitude"], latest["longitude"]
+    # Compute distance and filter by radius (on arrays, no intermediate frames)
+    ids = latest["id"].astype(str).to_numpy()
+    lats = latest["latitude"].to_numpy(dtype=float)
+    lons = latest["longitude"].to_numpy(dtype=float)
+    dist = _haversine_km(lat, lon, lats, lons)
+
+    within = np.flatnonzero(dist <= float(radius_km))
+    order = within[np.argsort(dist[within], kind="stable")][:int(k)]
+
+    table = StationTable.from_columns(
+        ids[order].tolist(),
+        latitude=lats[order],
+        longitude=lons[order],
+        free_bikes=latest["free_bikes"].to_numpy()[order],
+        empty_slots=latest["empty_slots"].to_numpy()[order],
+        distance_km=dist[order],
     )
 
-    nearby = latest[latest["distance_km"] <= float(radius_km)].copy()
-    nearby = nearby.sort_values("distance_km", ascending=True).head(int(k))
+    # Bikes/slots held by in-flight plans are not available to this request
+    holds = get_ledger().holds(table.ids)
+    if holds:
+        for sid, held in holds.items():
+            i = table.index.get(sid)
+            if i is not None:
+                table.data["free_bikes"][i] = max(0, table.data["free_bikes"][i] - held.get("pickup", 0))
+                table.data["empty_slots"][i] = max(0, table.data["empty_slots"][i] - held.get("dropoff", 0))
 
-    # Return requested fields (plus distance_km which is useful)
-    return nearby[["id", "latitude", "longitude", "free_bikes", "empty_slots", "distance_km"]].reset_index(drop=True)
\ No newline at end of file
+    return table
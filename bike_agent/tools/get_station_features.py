@@ -1,18 +1,21 @@
 # get_station_features.py
 import os
 import pandas as pd
-from .feature_store import get_features
+from .feature_store import lookup_latest
 
 def get_station_features(station_ids, fields):
     """
     Fetch specified fields for given station IDs from the feature store.
     """
-    df = get_features(api_key=os.getenv("HOPSWORKS_API_KEY"))
-    latest_idx = df.groupby("id")["timestamp"].idxmax()
-    latest = df.loc[latest_idx].copy()
-
-    # Filter for requested station IDs
-    filtered = latest[latest["id"].isin(station_ids)]
+    # Point lookups for the requested stations only (online store / cache)
+    try:
+        filtered = lookup_latest(
+            api_key=os.getenv("HOPSWORKS_API_KEY"),
+            station_ids=list(station_ids),
+            columns=["id"] + list(fields),
+        )
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"Missing fields in feature store: {e}") from e
 
     # Ensure all requested fields exist
     missing_fields = set(fields) - set(filtered.columns)
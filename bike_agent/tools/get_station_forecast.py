@@ -0,0 +1,105 @@
+# get_station_forecast.py
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from bike_agent.tracing import incr
+
+from .feature_store import get_latest_features, read_feature_group
+from .forecasting import (
+    HORIZONS_MIN,
+    cumulative_rates,
+    minute_of_day,
+    predict_free_bikes,
+    rates_from_frame,
+)
+
+RATES_FEATURE_GROUP = "station_forecast_rates"
+# Rates only change when the forecast pipeline runs; no need to re-read them per call
+RATES_TTL_S = 900
+
+_MODEL = {"loaded_at": 0.0, "model": None}
+_MODEL_LOCK = threading.Lock()
+
+
+def load_forecaster(force: bool = False) -> dict:
+    """Fitted drift table (cached in-process for RATES_TTL_S)."""
+    now = time.time()
+    if not force and _MODEL["model"] is not None and now - _MODEL["loaded_at"] < RATES_TTL_S:
+        incr("cache_hits")
+        return _MODEL["model"]
+
+    with _MODEL_LOCK:
+        if not force and _MODEL["model"] is not None and now - _MODEL["loaded_at"] < RATES_TTL_S:
+            return _MODEL["model"]
+
+        df = read_feature_group(os.getenv("HOPSWORKS_API_KEY"), RATES_FEATURE_GROUP)
+        if df is None or df.empty:
+            # Forecast stage has not run for this backend yet: every station keeps its state
+            print("[FORECAST] No drift rates found; forecasting zero drift")
+            df = pd.DataFrame({"id": pd.Series(dtype=str), "slot": pd.Series(dtype=int), "rate_per_min": pd.Series(dtype=float)})
+        station_ids, rates = rates_from_frame(df)
+        _MODEL["model"] = {
+            "index": {sid: i for i, sid in enumerate(station_ids)},
+            "rates": rates,
+            "cum": cumulative_rates(rates),
+        }
+        _MODEL["loaded_at"] = now
+        return _MODEL["model"]
+
+
+def forecast_latest(latest: pd.DataFrame, model: dict, now=None, horizons=HORIZONS_MIN) -> pd.DataFrame:
+    """
+    Predicted free_bikes / empty_slots for every row of `latest` at each horizon.
+    Stations without a fitted model keep their current state (zero drift).
+    """
+    now = pd.Timestamp.now(tz="UTC") if now is None else pd.Timestamp(now)
+    minute_now = minute_of_day([now])[0]
+
+    free = latest["free_bikes"].to_numpy(dtype=float)
+    capacity = free + latest["empty_slots"].to_numpy(dtype=float)
+    rows = latest["id"].astype(str).map(model["index"]).to_numpy(dtype=float)
+    known = ~np.isnan(rows)
+
+    predicted = np.repeat(free[:, None], len(horizons), axis=1)
+    if known.any():
+        predicted[known] = predict_free_bikes(
+            model["rates"], free[known], capacity[known], minute_now,
+            horizons=horizons, rows=rows[known].astype(int), cum=model["cum"],
+        )
+
+    out = latest[["id", "free_bikes", "empty_slots"]].reset_index(drop=True).copy()
+    for j, h in enumerate(horizons):
+        out[f"free_bikes_{h}m"] = np.round(predicted[:, j], 1)
+        out[f"empty_slots_{h}m"] = np.round(capacity - predicted[:, j], 1)
+    return out
+
+
+def get_station_forecast(station_ids: list, horizon_min: int = 60) -> pd.DataFrame:
+    """
+    Predicted station state horizon_min minutes from now (15, 30 or 60).
+
+    Output columns:
+      id, free_bikes, empty_slots, horizon_min, predicted_free_bikes, predicted_empty_slots
+    """
+    if horizon_min not in HORIZONS_MIN:
+        raise ValueError(f"horizon_min must be one of {list(HORIZONS_MIN)}")
+
+    latest = get_latest_features(
+        api_key=os.getenv("HOPSWORKS_API_KEY"),
+        columns=["id", "free_bikes", "empty_slots"],
+        station_ids=list(station_ids),
+    )
+
+    fc = forecast_latest(latest, load_forecaster(), horizons=(horizon_min,))
+    return pd.DataFrame({
+        "id": fc["id"],
+        "free_bikes": fc["free_bikes"],
+        "empty_slots": fc["empty_slots"],
+        "horizon_min": horizon_min,
+        "predicted_free_bikes": fc[f"free_bikes_{horizon_min}m"],
+        "predicted_empty_slots": fc[f"empty_slots_{horizon_min}m"],
+    })
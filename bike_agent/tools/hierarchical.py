@@ -0,0 +1,171 @@
+# bike_agent/tools/hierarchical.py
+"""
+Hierarchical (clustered) travel matrices for large station sets.
+
+A full OSRM table for n points costs n^2 cells in one URL, which public servers
+cap (~100 points). Instead:
+
+1. Cluster the points (grid cells on the map, or k-means) into groups of at most
+   OSRM_CLUSTER_SIZE points.
+2. One table per cluster: exact legs inside the cluster.
+3. One table between the cluster hubs (the point nearest each centroid), itself
+   clustered again if there are too many.
+4. A leg between clusters is the hub-to-hub leg scaled by the straight-line
+   distance: the hub table gives each pair of clusters its own road factor
+   (detours, one-way systems, speed), applied to the points in those clusters.
+
+Routing cost is about n * OSRM_CLUSTER_SIZE cells instead of n^2. Legs inside a
+cluster are exact; legs between clusters are estimates, most accurate for
+clusters that are far apart relative to their size.
+
+The result is still two dense n x n float64 matrices (16 * n^2 bytes), filled one
+cluster's rows at a time so no other n x n array is built. Callers needing more
+than OSRM_MAX_MATRIX_POINTS points (default 4000, ~256 MB) get a ValueError and
+should split the station set first.
+"""
+
+import math
+import os
+
+import numpy as np
+
+from .osrm_local import EARTH_RADIUS_M, metric_matrix_m
+
+OSRM_MAX_TABLE_POINTS = int(os.getenv("OSRM_MAX_TABLE_POINTS", "100"))
+OSRM_CLUSTER_SIZE = int(os.getenv("OSRM_CLUSTER_SIZE", "25"))
+OSRM_CLUSTER_METHOD = os.getenv("OSRM_CLUSTER_METHOD", "grid")
+OSRM_MAX_MATRIX_POINTS = int(os.getenv("OSRM_MAX_MATRIX_POINTS", "4000"))
+
+
+def _split_oversized(labels: np.ndarray, lat: np.ndarray, lon: np.ndarray, max_size: int) -> np.ndarray:
+    # Cut clusters above max_size into slices along their longer axis
+    out = np.empty_like(labels)
+    next_label = 0
+    for c in np.unique(labels):
+        idx = np.flatnonzero(labels == c)
+        if len(idx) <= max_size:
+            out[idx] = next_label
+            next_label += 1
+            continue
+        axis = lat[idx] if np.ptp(lat[idx]) >= np.ptp(lon[idx]) else lon[idx]
+        ordered = idx[np.argsort(axis, kind="stable")]
+        for chunk in np.array_split(ordered, math.ceil(len(idx) / max_size)):
+            out[chunk] = next_label
+            next_label += 1
+    return out
+
+
+def grid_clusters(lat, lon, max_size: int = OSRM_CLUSTER_SIZE) -> np.ndarray:
+    """Square map cells sized for about max_size points each (on average)."""
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    cells = max(1, math.ceil(len(lat) / max_size))
+    side = max(1, math.ceil(math.sqrt(cells)))
+
+    # Equal-distance cells: scale longitude by the cosine of the mean latitude
+    x = lon * math.cos(math.radians(float(lat.mean())))
+    span = max(np.ptp(x), np.ptp(lat), 1e-9)
+    gx = np.minimum(((x - x.min()) / span * side).astype(int), side - 1)
+    gy = np.minimum(((lat - lat.min()) / span * side).astype(int), side - 1)
+    return _split_oversized(gy * side + gx, lat, lon, max_size)
+
+
+def kmeans_clusters(lat, lon, max_size: int = OSRM_CLUSTER_SIZE, iters: int = 20, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means on (lat, lon) with k = ceil(n / max_size), oversized clusters split."""
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    pts = np.column_stack([lat, lon * math.cos(math.radians(float(lat.mean())))])
+    k = max(1, math.ceil(len(pts) / max_size))
+
+    rng = np.random.default_rng(seed)
+    centers = pts[rng.choice(len(pts), size=k, replace=False)]
+    labels = np.zeros(len(pts), dtype=int)
+    for it in range(iters):
+        d2 = ((pts[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        new = d2.argmin(axis=1)
+        if it > 0 and np.array_equal(new, labels):
+            break
+        labels = new
+        for c in range(k):
+            members = pts[labels == c]
+            if len(members):
+                centers[c] = members.mean(axis=0)
+    return _split_oversized(labels, lat, lon, max_size)
+
+
+def cluster(lat, lon, method: str = None, max_size: int = OSRM_CLUSTER_SIZE) -> np.ndarray:
+    method = method or OSRM_CLUSTER_METHOD
+    if method == "grid":
+        return grid_clusters(lat, lon, max_size)
+    if method == "kmeans":
+        return kmeans_clusters(lat, lon, max_size)
+    raise ValueError(f"Unknown OSRM_CLUSTER_METHOD: {method}")
+
+
+def _haversine_m(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Straight-line metres from each point 1 (rows) to each point 2 (columns)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=float)) for a in (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2[None, :] - lat1[:, None]) / 2) ** 2
+        + np.cos(lat1[:, None]) * np.cos(lat2[None, :]) * np.sin((lon2[None, :] - lon1[:, None]) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def _medoid(lat, lon) -> int:
+    # Station closest to the cluster mean: a real, routable point (a mean can fall in the sea)
+    d = metric_matrix_m(np.append(lat, lat.mean()), np.append(lon, lon.mean()), "haversine")[-1, :-1]
+    return int(d.argmin())
+
+
+def hierarchical_table(lat, lon, table_fn, max_points: int = OSRM_MAX_TABLE_POINTS,
+                       max_size: int = OSRM_CLUSTER_SIZE, method: str = None):
+    """
+    (distances, durations) n x n matrices like table_fn(lat, lon), using tables of
+    at most max(max_size, max_points) points.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    n = len(lat)
+    if n <= max_points:
+        return table_fn(lat, lon)
+    if n > OSRM_MAX_MATRIX_POINTS:
+        raise ValueError(
+            f"{n} points need {16 * n * n / 1e9:.1f} GB of travel matrices; "
+            f"split the stations (OSRM_MAX_MATRIX_POINTS={OSRM_MAX_MATRIX_POINTS})"
+        )
+
+    labels = cluster(lat, lon, method, max_size)
+    k = int(labels.max()) + 1
+
+    dist = np.empty((n, n))
+    dur = np.empty((n, n))
+    hubs = np.empty(k, dtype=int)
+    members = []
+    for c in range(k):
+        idx = np.flatnonzero(labels == c)
+        members.append(idx)
+        hubs[c] = idx[_medoid(lat[idx], lon[idx])]
+        block = np.ix_(idx, idx)
+        dist[block], dur[block] = table_fn(lat[idx], lon[idx])
+
+    # Hub-to-hub legs; recursive when there are too many clusters for one table
+    hub_d, hub_t = hierarchical_table(lat[hubs], lon[hubs], table_fn, max_points, max_size, method)
+
+    # Road distance / time per straight-line metre between each pair of clusters
+    hub_straight = _haversine_m(lat[hubs], lon[hubs], lat[hubs], lon[hubs])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = np.where(hub_straight > 0, 1.0 / hub_straight, np.nan)
+
+    # One cluster's rows at a time: temporaries are |cluster| x n, never n x n
+    for c, idx in enumerate(members):
+        cols = np.flatnonzero(labels != c)
+        straight = _haversine_m(lat[idx], lon[idx], lat[cols], lon[cols])
+        for out, hub_m in ((dist, hub_d), (dur, hub_t)):
+            legs = straight * (hub_m[c] * scale[c])[labels[cols]]
+            # Clusters sharing a hub location: fall back to the hub-to-hub leg itself
+            fallback = ~np.isfinite(legs)
+            if fallback.any():
+                legs[fallback] = np.broadcast_to(hub_m[c][labels[cols]], legs.shape)[fallback]
+            out[np.ix_(idx, cols)] = legs
+    return dist, dur
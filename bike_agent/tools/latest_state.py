@@ -0,0 +1,135 @@
+# bike_agent/tools/latest_state.py
+"""
+"Latest state" store: the most recent row per station, readable with zero network hops.
+
+The ingest daemon publishes every fresh snapshot here. Readers in the same
+process get the DataFrame directly; other processes (API workers, the Gradio app)
+read a Feather file in shared memory (/dev/shm when available) and only reload it
+when its inode, mtime or size changes. The file lives in a per-user 0700 directory
+and is only read when it and its directory belong to the current user, so nobody
+else on the host can plant a snapshot. Its mtime is the publication time: the daemon
+re-stamps it when citybik.es reports no change, which keeps the data fresh
+without rewriting it.
+"""
+
+import os
+import stat
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+_DEFAULT_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+_UID = os.getuid() if hasattr(os, "getuid") else None
+LATEST_STATE_PATH = Path(os.getenv(
+    "LATEST_STATE_PATH",
+    os.path.join(_DEFAULT_DIR, f"bike_agent-{_UID if _UID is not None else 'user'}", "latest.feather"),
+))
+# Older snapshots are ignored and tools fall back to the feature store
+LATEST_STATE_MAX_AGE_S = float(os.getenv("LATEST_STATE_MAX_AGE_S", "900"))
+
+# key: (inode, mtime, size) of the file last looked at; inodes alone get reused.
+# version: key of the publication "df" came from, kept while its content is unchanged.
+# rejected: key of the last file refused by _load(), so it is only reported once.
+_STATE = {"df": None, "published_at": 0.0, "key": None, "version": None, "rejected": None}
+_LOCK = threading.Lock()
+
+
+def _key(st) -> tuple:
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _private(st) -> bool:
+    """Owned by this user and not writable by anyone else."""
+    if _UID is None:
+        return True
+    return st.st_uid == _UID and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def _private_dir(directory: Path) -> None:
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if not _private(directory.stat()):
+        raise PermissionError(f"{directory} must be owned by this user and not writable by others")
+
+
+def publish_latest(df: pd.DataFrame, path: Path = None) -> None:
+    """Store the latest row per station in-process and in the shared file (atomic rename)."""
+    path = path or LATEST_STATE_PATH
+    _private_dir(path.parent)
+    df = df.reset_index(drop=True)
+
+    tmp = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+    df.to_feather(tmp)
+    os.chmod(tmp, 0o600)
+    tmp.replace(path)
+
+    st = path.stat()
+    with _LOCK:
+        _STATE["df"] = df
+        _STATE["published_at"] = st.st_mtime_ns / 1e9
+        _STATE["key"] = _STATE["version"] = _key(st)
+
+
+def touch_latest(path: Path = None) -> None:
+    """Mark the published snapshot as still current (source reported no change)."""
+    path = path or LATEST_STATE_PATH
+    try:
+        before = _key(path.stat())
+        os.utime(path)
+        st = path.stat()
+    except FileNotFoundError:
+        return
+    with _LOCK:
+        # Still the file this process loaded: same content, just a newer stamp
+        if before == _STATE["key"]:
+            _STATE["key"] = _key(st)
+            _STATE["published_at"] = st.st_mtime_ns / 1e9
+
+
+def latest_version():
+    """Identity of the publication read_latest() last loaded (None before the first one)."""
+    return _STATE["version"]
+
+
+def _load(path: Path, st):
+    if not (_private(st) and _private(path.parent.stat())):
+        if _STATE["rejected"] != _key(st):
+            _STATE["rejected"] = _key(st)
+            print(f"[LATEST] Ignoring {path}: not private to this user")
+        return None
+    try:
+        return pd.read_feather(path)
+    except (OSError, ValueError):
+        return None
+
+
+def read_latest(max_age_s: float = None, path: Path = None):
+    """Latest station rows, or None if nothing fresh enough was published."""
+    path = path or LATEST_STATE_PATH
+    max_age_s = LATEST_STATE_MAX_AGE_S if max_age_s is None else max_age_s
+
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        st = None
+
+    if st is not None and _key(st) != _STATE["key"]:
+        with _LOCK:
+            if _key(st) != _STATE["key"]:
+                df = _load(path, st)
+                if df is not None:
+                    # A touch_latest() re-stamp reloads the same rows: keep the version
+                    # so caches keyed on it stay warm
+                    prev = _STATE["df"]
+                    if prev is None or not df.equals(prev):
+                        _STATE["df"] = df
+                        _STATE["version"] = _key(st)
+                    _STATE["key"] = _key(st)
+                    _STATE["published_at"] = st.st_mtime_ns / 1e9
+
+    df = _STATE["df"]
+    if df is None or time.time() - _STATE["published_at"] > max_age_s:
+        return None
+    return df
@@ -0,0 +1,105 @@
+# bike_agent/tools/osrm_local.py
+"""
+Local stand-in for the OSRM /table service (offline runs and load tests).
+
+Distances come from a straight-line metric times a detour factor; durations
+from a constant driving speed. Responses have the OSRM /table JSON shape, so
+get_distances cannot tell the difference.
+
+- In-process: OSRM_BASE_URL=local (no HTTP at all)
+- As a server: python -m bike_agent.tools.osrm_local --port 5001
+  and OSRM_BASE_URL=http://localhost:5001
+
+OSRM_LOCAL_METRIC: "haversine" (default) or "manhattan" (grid-like street networks)
+OSRM_LOCAL_DETOUR: road distance / metric distance (default 1.3)
+OSRM_LOCAL_SPEED_KMH: average driving speed (default 25)
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+OSRM_LOCAL_METRIC = os.getenv("OSRM_LOCAL_METRIC", "haversine")
+OSRM_LOCAL_DETOUR = float(os.getenv("OSRM_LOCAL_DETOUR", "1.3"))
+OSRM_LOCAL_SPEED_KMH = float(os.getenv("OSRM_LOCAL_SPEED_KMH", "25"))
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def parse_coords(coords: str):
+    """"lon,lat;lon,lat;..." -> (lat, lon) arrays."""
+    pts = np.array([[float(x) for x in p.split(",")] for p in coords.split(";")], dtype=float)
+    return pts[:, 1], pts[:, 0]
+
+
+def metric_matrix_m(lat, lon, metric: str = None) -> np.ndarray:
+    metric = metric or OSRM_LOCAL_METRIC
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    dlat = lat[None, :] - lat[:, None]
+    dlon = lon[None, :] - lon[:, None]
+
+    if metric == "manhattan":
+        # North-south plus east-west legs, east-west scaled at the mean latitude
+        mean_cos = np.cos((lat[:, None] + lat[None, :]) / 2)
+        return EARTH_RADIUS_M * (np.abs(dlat) + np.abs(dlon) * mean_cos)
+    if metric == "haversine":
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+        return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+    raise ValueError(f"Unknown OSRM_LOCAL_METRIC: {metric}")
+
+
+def local_table(lat, lon, metric: str = None, detour: float = None, speed_kmh: float = None):
+    """(distances_m, durations_s) matrices for the given points."""
+    detour = OSRM_LOCAL_DETOUR if detour is None else detour
+    speed_kmh = OSRM_LOCAL_SPEED_KMH if speed_kmh is None else speed_kmh
+
+    dist_m = metric_matrix_m(lat, lon, metric) * detour
+    dur_s = dist_m / (speed_kmh / 3.6)
+    return dist_m, dur_s
+
+
+def table_response(coords: str, metric: str = None, detour: float = None, speed_kmh: float = None) -> dict:
+    """OSRM /table JSON body for a coordinate string."""
+    lat, lon = parse_coords(coords)
+    dist_m, dur_s = local_table(lat, lon, metric, detour, speed_kmh)
+    waypoints = [{"location": [float(x), float(y)], "name": "", "distance": 0.0} for x, y in zip(lon, lat)]
+    return {
+        "code": "Ok",
+        "distances": np.round(dist_m, 1).tolist(),
+        "durations": np.round(dur_s, 1).tolist(),
+        "sources": waypoints,
+        "destinations": waypoints,
+    }
+
+
+def create_app():
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    async def table(request: Request):
+        try:
+            body = table_response(request.path_params["coords"])
+        except (ValueError, IndexError) as e:
+            return JSONResponse({"code": "InvalidQuery", "message": str(e)}, status_code=400)
+        return JSONResponse(body)
+
+    return Starlette(routes=[Route("/table/v1/{profile}/{coords:path}", table, methods=["GET"])])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local OSRM /table stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,47 @@
 # bike_agent/tools/registry.py
 
-from dataclasses import dataclass
-from typing import Any, Callable, Dict, Optional
+import importlib
+import inspect
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Union
 
-# Import tool callables
-from .get_nearby_stations import get_nearby_stations
-from .get_station_features import get_station_features
-from .get_distances import get_distances
-from .validate_plan import validate_plan
-from .score_plan import score_plan
+from bike_agent.resilience import HOPSWORKS_LOGIN_TIMEOUT_S
+
+from .tool_cache import CachePolicy, ToolCache, round_coord, snapshot_version, state_version, station_key
+from .travel_matrix import directed_mode, matrix_missing
+
+TOOL_TIMEOUT_S = float(os.getenv("TOOL_TIMEOUT_S", "15"))
+# Feature-store tools may have to log in to Hopsworks first; the login has its own budget
+FEATURE_TOOL_TIMEOUT_S = TOOL_TIMEOUT_S + HOPSWORKS_LOGIN_TIMEOUT_S
+
+
+class LazyTool:
+    """
+    Tool callable given as "module:function", imported on first call or signature
+    lookup. Keeps importing the registry (and the agent) free of pandas/hopsworks.
+    """
+
+    def __init__(self, target: str):
+        self.target = target
+        self.__name__ = target.rsplit(":", 1)[1]
+        self._fn = None
+
+    def resolve(self) -> Callable[..., Any]:
+        if self._fn is None:
+            module, attr = self.target.split(":")
+            self._fn = getattr(importlib.import_module(module), attr)
+        return self._fn
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    @property
+    def __signature__(self):
+        return inspect.signature(self.resolve())
+
+    def __repr__(self):
+        return f"<tool {self.target}>"
 
 
 @dataclass(frozen=True)
@@ -17,6 +50,14 @@ class ToolSpec:
     # Minimal type tags for coercion (used by your generic tool calling layer)
     arg_types: Dict[str, str]  # e.g. {"coords_df": "dataframe_records", "k": "int"}
     description: str = ""
+    # Memoized results for repeated requests (None: always call the tool)
+    cache: Optional[ToolCache] = None
+    # Deadline per call; the planner reports a timeout to the LLM instead of waiting
+    timeout_s: Optional[float] = None
+    # Exact JSON schemas for args whose tag is too loose (e.g. a list of station objects)
+    arg_schemas: Dict[str, dict] = field(default_factory=dict)
+    # (args, user_context) -> args, applied by the planner before the call (e.g. candidate pruning)
+    prepare: Optional[Callable[[dict, dict], dict]] = None
 
 
 _TOOLS: Dict[str, ToolSpec] = {}
@@ -24,15 +65,38 @@ _TOOLS: Dict[str, ToolSpec] = {}
 
 def register_tool(
     name: str,
-    fn: Callable[..., Any],
+    fn: Union[Callable[..., Any], str],
     arg_types: Optional[Dict[str, str]] = None,
     description: str = "",
+    cache: Optional[CachePolicy] = None,
+    timeout_s: Optional[float] = TOOL_TIMEOUT_S,
+    arg_schemas: Optional[Dict[str, dict]] = None,
+    prepare: Union[Callable[[dict, dict], dict], str, None] = None,
 ) -> None:
+    """
+    fn: the tool callable, or "module:function" to import it lazily.
+    cache: memoize results under this policy (see tool_cache).
+    timeout_s: per-call deadline (None: only the request deadline applies).
+    arg_schemas: JSON schemas refining arg_types for structured LLM output.
+    prepare: rewrites the LLM's args from the planner context (callable or "module:function").
+    """
     if not isinstance(name, str) or not name:
         raise ValueError("Tool name must be a non-empty string.")
     if name in _TOOLS:
         raise ValueError(f"Tool '{name}' is already registered.")
-    _TOOLS[name] = ToolSpec(fn=fn, arg_types=arg_types or {}, description=description)
+    if isinstance(fn, str):
+        fn = LazyTool(fn)
+    if isinstance(prepare, str):
+        prepare = LazyTool(prepare)
+    _TOOLS[name] = ToolSpec(
+        fn=fn,
+        arg_types=arg_types or {},
+        description=description,
+        cache=ToolCache(cache) if cache is not None else None,
+        timeout_s=timeout_s,
+        arg_schemas=arg_schemas or {},
+        prepare=prepare,
+    )
 
 
 def get_tool_spec(name: str) -> ToolSpec:
@@ -51,13 +115,24 @@ def list_tools():
     return list(_TOOLS.keys())
 
 
+def tool_cache_stats() -> Dict[str, dict]:
+    """Hits, misses and hit ratio per cached tool."""
+    return {name: spec.cache.stats() for name, spec in _TOOLS.items() if spec.cache is not None}
+
+
+def clear_tool_caches() -> None:
+    for spec in _TOOLS.values():
+        if spec.cache is not None:
+            spec.cache.clear()
+
+
 # ----------------------------
 # Register tools (single source of truth)
 # ----------------------------
 
 register_tool(
     "get_nearby_stations",
-    get_nearby_stations,
+    "bike_agent.tools.get_nearby_stations:get_nearby_stations",
     arg_types={
         "k": "int",
         "radius_km": "float",
@@ -69,20 +144,83 @@ register_tool(
         "Uses haversine distance for fast candidate selection. "
         "Use get_distances afterwards to compute driving distance/time."
     ),
+    # Reads station state minus reservation holds
+    cache=CachePolicy(
+        normalize=lambda a: (int(a["k"]), round(float(a["radius_km"]), 3), round_coord(a["lat"]), round_coord(a["lon"])),
+        version=state_version,
+    ),
+    timeout_s=FEATURE_TOOL_TIMEOUT_S,
 )
 
 register_tool(
     "get_station_features",
-    get_station_features,
+    "bike_agent.tools.get_station_features:get_station_features",
     arg_types={
-        "station_id": "str",
+        "station_ids": "list",
+        "fields": "list",
     },
-    description="Fetch features/status for a single station by station_id.",
+    description="Fetch the latest values of the given fields (e.g. free_bikes, empty_slots) for the given station_ids.",
+    cache=CachePolicy(
+        normalize=lambda a: (station_key(a["station_ids"]), tuple(a["fields"])),
+        version=snapshot_version,
+    ),
+    timeout_s=FEATURE_TOOL_TIMEOUT_S,
 )
 
 register_tool(
     "get_distances",
-    get_distances,
+    "bike_agent.tools.get_distances:get_distances",
     arg_types={"stations": "list", "start_coordinates": "dict"},
-    description="Compute pairwise driving distances and durations between candidate stations using OSRM. If start_coordinates is provided, includes a 'start' node in the matrices. When calling get_distances, include at most 10 stations.",
+    description="Compute pairwise driving distances and durations between candidate stations using OSRM. If start_coordinates is provided, includes a 'start' node in the matrices. The stations are pre-selected for you: the most imbalanced stations reachable in time from nearby_stations (at most 10), plus the start.",
+    # Road network only: no data version, just the TTL
+    cache=CachePolicy(
+        normalize=lambda a: (
+            station_key(a["stations"]),
+            tuple(round_coord(a["start_coordinates"][c]) for c in ("lat", "lon")) if a.get("start_coordinates") else None,
+            a.get("base_url"),
+            a.get("profile", "driving"),
+            directed_mode(),
+        ),
+        ttl_s=3600,
+        # A directed matrix evicted from the store makes the cached result useless
+        valid=lambda r: not matrix_missing(r),
+    ),
+    timeout_s=20,
+    # Rank the nearby index by imbalance and estimated travel time; keep the best few for OSRM
+    prepare="bike_agent.tools.candidates:prune_distance_args",
+    arg_schemas={
+        "stations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"id": {"type": "string"}, "latitude": {"type": "number"}, "longitude": {"type": "number"}},
+                "required": ["id", "latitude", "longitude"],
+                "additionalProperties": False,
+            },
+        },
+        "start_coordinates": {
+            "type": "object",
+            "properties": {"lat": {"type": "number"}, "lon": {"type": "number"}},
+            "required": ["lat", "lon"],
+            "additionalProperties": False,
+        },
+    },
+)
+
+register_tool(
+    "get_station_forecast",
+    "bike_agent.tools.get_station_forecast:get_station_forecast",
+    arg_types={"station_ids": "list", "horizon_min": "int"},
+    description=(
+        "Predict free_bikes/empty_slots for the given station_ids horizon_min minutes from now "
+        "(15, 30 or 60), from per-station time-of-day demand patterns. "
+        "Use it to plan against the state the truck will find on arrival."
+    ),
+    cache=CachePolicy(
+        normalize=lambda a: (station_key(a["station_ids"]), int(a.get("horizon_min", 60))),
+        version=snapshot_version,
+        # Predictions are relative to the current time of day
+        ttl_s=60,
+    ),
+    timeout_s=FEATURE_TOOL_TIMEOUT_S,
 )
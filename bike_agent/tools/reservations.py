@@ -0,0 +1,338 @@
+# bike_agent/tools/reservations.py
+"""
+Reservation ledger for in-flight plans.
+
+When a plan is approved, its pickups/dropoffs are held per station for a TTL so
+that concurrent requests reading the same feature snapshot do not plan to take
+the same bikes (or fill the same slots) again.
+
+- get_nearby_stations subtracts active holds from free_bikes / empty_slots.
+- The orchestrator commits the final plan with ReservationLedger.reserve(), which
+  re-validates against holds created since the request started and inserts the
+  new holds atomically for the stations involved.
+
+Two backends with the same interface:
+- ReservationLedger: in-process. Reads are lock-free (per-station tuples are
+  swapped atomically); writes take striped per-station locks, plus a small
+  global lock to hand out sequence numbers.
+- SqliteReservationLedger: shared between processes via a SQLite file
+  (selected with RESERVATION_DB=/path/to/file.db).
+"""
+
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+DEFAULT_TTL_S = float(os.getenv("RESERVATION_TTL_S", "3600"))
+# Interactive (UI) plans are not tracked to completion; their holds lapse sooner
+INTERACTIVE_TTL_S = float(os.getenv("INTERACTIVE_RESERVATION_TTL_S", "900"))
+# How often reserve() drops expired holds of owners that never called release()
+SWEEP_INTERVAL_S = float(os.getenv("RESERVATION_SWEEP_INTERVAL_S", "60"))
+
+
+@dataclass(frozen=True)
+class Reservation:
+    owner: str
+    station_id: str
+    pickup: int
+    dropoff: int
+    expires_at: float
+    seq: int
+
+
+def plan_holds(plan_json: dict) -> Dict[str, Dict[str, int]]:
+    """Aggregate a plan's stops into {station_id: {"pickup": n, "dropoff": n}}."""
+    holds = {}
+    for stop in plan_json.get("stops", []):
+        sid = stop.get("station_id")
+        action = stop.get("action")
+        try:
+            bikes = int(stop.get("bikes") or 0)
+        except (TypeError, ValueError):
+            continue
+        if sid is None or bikes <= 0 or action not in ("pickup", "dropoff"):
+            continue
+        h = holds.setdefault(sid, {"pickup": 0, "dropoff": 0})
+        h[action] += bikes
+    return holds
+
+
+def _sum_holds(reservations: Iterable[Reservation]) -> Dict[str, Dict[str, int]]:
+    out = {}
+    for r in reservations:
+        h = out.setdefault(r.station_id, {"pickup": 0, "dropoff": 0})
+        h["pickup"] += r.pickup
+        h["dropoff"] += r.dropoff
+    return out
+
+
+class ReservationLedger:
+    def __init__(
+        self,
+        default_ttl_s: float = DEFAULT_TTL_S,
+        n_stripes: int = 64,
+        sweep_interval_s: float = SWEEP_INTERVAL_S,
+    ):
+        self.default_ttl_s = default_ttl_s
+        self.sweep_interval_s = sweep_interval_s
+        self._next_sweep = 0.0
+        self._stations: Dict[str, tuple] = {}
+        self._owners: Dict[str, tuple] = {}
+        self._stripes = [threading.Lock() for _ in range(n_stripes)]
+        self._owner_lock = threading.Lock()
+        # Seqs are handed out under _seq_lock; _last_seq only advances past a seq
+        # once it and every lower one are in _stations, so `since` never skips a hold
+        self._seq_lock = threading.Lock()
+        self._next_seq = 1
+        self._pending = set()
+        self._last_seq = 0
+        self._versions = itertools.count(1)
+        self._version = 0
+
+    def _stripe(self, station_id: str) -> threading.Lock:
+        return self._stripes[hash(station_id) % len(self._stripes)]
+
+    def seq(self) -> int:
+        """Sequence number of the most recent reservation (use as `since` later)."""
+        return self._last_seq
+
+    def _allocate(self, n: int) -> range:
+        with self._seq_lock:
+            seqs = range(self._next_seq, self._next_seq + n)
+            self._next_seq += n
+            self._pending.update(seqs)
+        return seqs
+
+    def _publish(self, seqs: range) -> None:
+        with self._seq_lock:
+            self._pending.difference_update(seqs)
+            # Everything below the oldest seq still being inserted is visible
+            self._last_seq = min(self._pending) - 1 if self._pending else self._next_seq - 1
+
+    def version(self) -> int:
+        """Changes whenever holds are added or released (not on expiry)."""
+        return self._version
+
+    def _active(self, station_id: str, now: float) -> List[Reservation]:
+        return [r for r in self._stations.get(station_id, ()) if r.expires_at > now]
+
+    def holds(
+        self,
+        station_ids: Optional[Iterable[str]] = None,
+        since: Optional[int] = None,
+        exclude_owner: Optional[str] = None,
+    ) -> Dict[str, Dict[str, int]]:
+        """
+        Active held bikes/slots per station: {station_id: {"pickup": n, "dropoff": n}}.
+        since: only count reservations made after this seq.
+        """
+        now = time.time()
+        ids = list(self._stations.keys()) if station_ids is None else station_ids
+        active = []
+        for sid in ids:
+            for r in self._active(sid, now):
+                if since is not None and r.seq <= since:
+                    continue
+                if exclude_owner is not None and r.owner == exclude_owner:
+                    continue
+                active.append(r)
+        return _sum_holds(active)
+
+    def reserve(
+        self,
+        owner: str,
+        plan_json: dict,
+        ttl_s: Optional[float] = None,
+        since: Optional[int] = None,
+        check: Optional[Callable[[Dict[str, Dict[str, int]]], list]] = None,
+    ) -> list:
+        """
+        Hold a plan's pickups/dropoffs. If `check` is given it is called with the
+        holds made since `since` (other owners only) while the stations are locked;
+        a non-empty error list aborts the reservation and is returned.
+        """
+        wanted = plan_holds(plan_json)
+        if not wanted:
+            return []
+
+        ttl_s = self.default_ttl_s if ttl_s is None else ttl_s
+        locks = sorted({id(self._stripe(sid)): self._stripe(sid) for sid in wanted}.items())
+        for _, lock in locks:
+            lock.acquire()
+        try:
+            if check is not None:
+                errors = check(self.holds(wanted.keys(), since=since, exclude_owner=owner))
+                if errors:
+                    return errors
+
+            now = time.time()
+            created = []
+            seqs = self._allocate(len(wanted))
+            try:
+                for (sid, h), seq in zip(wanted.items(), seqs):
+                    r = Reservation(owner, sid, h["pickup"], h["dropoff"], now + ttl_s, seq)
+                    self._stations[sid] = tuple(self._active(sid, now)) + (r,)
+                    created.append(r)
+            finally:
+                self._publish(seqs)
+            self._version = next(self._versions)
+        finally:
+            for _, lock in reversed(locks):
+                lock.release()
+
+        with self._owner_lock:
+            self._owners[owner] = self._owners.get(owner, ()) + tuple(created)
+        if now >= self._next_sweep:
+            self._sweep(now)
+        return []
+
+    def _sweep(self, now: float) -> None:
+        """Forget expired holds, and owners left with none, so unreleased plans don't pile up."""
+        self._next_sweep = now + self.sweep_interval_s
+        with self._owner_lock:
+            for owner, mine in list(self._owners.items()):
+                live = tuple(r for r in mine if r.expires_at > now)
+                if not live:
+                    del self._owners[owner]
+                elif len(live) != len(mine):
+                    self._owners[owner] = live
+
+        for sid in list(self._stations):
+            with self._stripe(sid):
+                live = tuple(self._active(sid, now))
+                if live:
+                    self._stations[sid] = live
+                else:
+                    self._stations.pop(sid, None)
+
+    def release(self, owner: str) -> int:
+        """Drop all holds of `owner` (e.g. when the truck has finished). Returns count."""
+        with self._owner_lock:
+            mine = self._owners.pop(owner, ())
+
+        for sid in {r.station_id for r in mine}:
+            with self._stripe(sid):
+                self._stations[sid] = tuple(r for r in self._stations.get(sid, ()) if r.owner != owner)
+        if mine:
+            self._version = next(self._versions)
+        return len(mine)
+
+
+class SqliteReservationLedger:
+    def __init__(self, path: str, default_ttl_s: float = DEFAULT_TTL_S):
+        self.path = path
+        self.default_ttl_s = default_ttl_s
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS reservations ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " owner TEXT NOT NULL,"
+                " station_id TEXT NOT NULL,"
+                " pickup INTEGER NOT NULL,"
+                " dropoff INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_res_station ON reservations (station_id, expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not shareable across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def seq(self) -> int:
+        row = self._conn().execute("SELECT COALESCE(MAX(seq), 0) FROM reservations").fetchone()
+        return int(row[0])
+
+    def version(self) -> tuple:
+        # seq only grows on insert and the row count drops on release, so any change shows
+        row = self._conn().execute("SELECT COUNT(*), COALESCE(MAX(seq), 0) FROM reservations").fetchone()
+        return int(row[0]), int(row[1])
+
+    def _holds(self, conn, station_ids=None, since=None, exclude_owner=None):
+        sql = "SELECT station_id, SUM(pickup), SUM(dropoff) FROM reservations WHERE expires_at > ?"
+        params = [time.time()]
+        if since is not None:
+            sql += " AND seq > ?"
+            params.append(since)
+        if exclude_owner is not None:
+            sql += " AND owner != ?"
+            params.append(exclude_owner)
+        if station_ids is not None:
+            station_ids = list(station_ids)
+            if not station_ids:
+                return {}
+            sql += f" AND station_id IN ({','.join('?' * len(station_ids))})"
+            params.extend(station_ids)
+        sql += " GROUP BY station_id"
+        return {sid: {"pickup": int(p), "dropoff": int(d)} for sid, p, d in conn.execute(sql, params)}
+
+    def holds(self, station_ids=None, since=None, exclude_owner=None):
+        return self._holds(self._conn(), station_ids, since, exclude_owner)
+
+    def reserve(self, owner, plan_json, ttl_s=None, since=None, check=None):
+        wanted = plan_holds(plan_json)
+        if not wanted:
+            return []
+
+        ttl_s = self.default_ttl_s if ttl_s is None else ttl_s
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if check is not None:
+                errors = check(self._holds(conn, wanted.keys(), since=since, exclude_owner=owner))
+                if errors:
+                    conn.execute("ROLLBACK")
+                    return errors
+
+            now = time.time()
+            conn.execute("DELETE FROM reservations WHERE expires_at <= ?", (now,))
+            conn.executemany(
+                "INSERT INTO reservations (owner, station_id, pickup, dropoff, expires_at) VALUES (?, ?, ?, ?, ?)",
+                [(owner, sid, h["pickup"], h["dropoff"], now + ttl_s) for sid, h in wanted.items()],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return []
+
+    def release(self, owner: str) -> int:
+        cur = self._conn().execute("DELETE FROM reservations WHERE owner = ?", (owner,))
+        return cur.rowcount
+
+
+_LEDGER = None
+_LEDGER_LOCK = threading.Lock()
+
+
+def get_ledger():
+    """Process-wide ledger; SQLite-backed if RESERVATION_DB is set, else in-memory."""
+    global _LEDGER
+    if _LEDGER is None:
+        with _LEDGER_LOCK:
+            if _LEDGER is None:
+                path = os.getenv("RESERVATION_DB")
+                _LEDGER = SqliteReservationLedger(path) if path else ReservationLedger()
+    return _LEDGER
+
+
+def subtract_holds(records: List[dict], holds: Dict[str, Dict[str, int]]) -> List[dict]:
+    """Return copies of station records with held bikes/slots removed (never below 0)."""
+    out = []
+    for s in records:
+        h = holds.get(s["id"])
+        if h:
+            s = dict(s)
+            s["free_bikes"] = max(0, s.get("free_bikes", 0) - h["pickup"])
+            s["empty_slots"] = max(0, s.get("empty_slots", 0) - h["dropoff"])
+        out.append(s)
+    return out
@@ -1,19 +1,21 @@
-def score_plan(plan_json: dict, context: dict, low_threshold: int = 3) -> dict:
+import numpy as np
+
+from .station_table import station_table
+from .travel_matrix import is_directed, legs, matrix_missing, route_minutes
+
+# A station with fewer free bikes than this is short; drop-offs there score
+LOW_THRESHOLD = 3
+
+
+def score_plan(plan_json: dict, context: dict, low_threshold: int = LOW_THRESHOLD) -> dict:
     """
     Soft scoring:
     - No tool calls
     - Uses only provided context
     - Never raises due to missing context; returns warnings instead
     """
-    nearby = context.get("nearby_stations") or context.get("get_nearby_stations") or []
-
-    stations = {
-        s["id"]: {
-            "free_bikes": s.get("free_bikes", 0),
-            "empty_slots": s.get("empty_slots", 0)
-        }
-        for s in nearby
-    }
+    table = station_table(context)
+    free = table.data["free_bikes"]
 
     score = 0
 
@@ -29,13 +31,53 @@ def score_plan(plan_json: dict, context: dict, low_threshold: int = 3) -> dict:
         except Exception:
             bikes = 0
 
-        st = stations.get(sid)
+        idx = table.index.get(sid)
+        if idx is None:
+            continue
 
-        before = st["free_bikes"]
+        before = free[idx]
         if before < low_threshold and bikes > 0:
             score += bikes
 
-    return {
+    result = {
         "metric": f"dropoffs_to_stations_with_free_bikes<{low_threshold}",
         "score": score
     }
+
+    # With directed legs, report how long the route actually drives
+    distances = context.get("get_distances")
+    if is_directed(distances):
+        minutes = route_minutes(plan_json, distances)
+        if minutes is not None:
+            result["route_minutes"] = round(minutes, 1)
+    elif matrix_missing(distances):
+        result["warnings"] = [f"directed matrix {distances['matrix_id']} expired; route_minutes not computed"]
+    return result
+
+
+def score_upper_bound(context: dict, low_threshold: int = LOW_THRESHOLD, time_budget_min=None) -> int:
+    """
+    Cheap upper bound on score_plan over all valid plans for this context.
+
+    Every scored bike is dropped at a station with free_bikes < low_threshold
+    and was picked up somewhere first (at most the free_bikes on offer). A
+    receiver takes at most its empty_slots plus the free_bikes a pickup there
+    could clear first. With get_distances in the context, stations further
+    than time_budget_min from the start are left out.
+    """
+    table = station_table(context)
+    free = table.data["free_bikes"].astype(np.int64)
+    empty = table.data["empty_slots"].astype(np.int64)
+
+    reachable = np.ones(len(table.ids), dtype=bool)
+    distances = context.get("get_distances")
+    if time_budget_min is not None and isinstance(distances, dict):
+        # Driving out from the start (directed when the full matrix is available)
+        leg = legs(distances)
+        outbound = [leg("start", sid) for sid in table.ids]
+        if any(x is not None for x in outbound):
+            reachable = np.array([x is None or x[1] <= time_budget_min for x in outbound], dtype=bool)
+
+    receivers = reachable & (free < low_threshold)
+    room = np.maximum(empty, 0) + np.maximum(free, 0)
+    return int(min(room[receivers].sum(), np.maximum(free[reachable], 0).sum()))
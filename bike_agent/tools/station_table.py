@@ -0,0 +1,131 @@
+# bike_agent/tools/station_table.py
+"""
+Compact, array-backed station state shared by tools, validators and scoring.
+
+A StationTable is a NumPy structured array plus an id -> row map. Tools build it
+once from their DataFrame; it is turned into list[dict] records only at the
+LLM-prompt boundary (serialize_tool_result). The records are registered so that
+validate_plan / score_plan get the original table back instead of rebuilding
+dicts from the records on every call.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+STATION_DTYPE = np.dtype([
+    ("latitude", "f8"),
+    ("longitude", "f8"),
+    ("free_bikes", "i4"),
+    ("empty_slots", "i4"),
+    ("distance_km", "f8"),
+])
+
+
+def _counts(values) -> np.ndarray:
+    arr = np.asarray(values, dtype=float)
+    return np.nan_to_num(arr, nan=0.0).astype(np.int32)
+
+
+class StationTable:
+    __slots__ = ("ids", "index", "data")
+
+    def __init__(self, ids, data: np.ndarray):
+        self.ids = [str(i) for i in ids]
+        self.index = {sid: i for i, sid in enumerate(self.ids)}
+        self.data = data
+
+    @classmethod
+    def from_columns(cls, ids, latitude=None, longitude=None, free_bikes=None, empty_slots=None, distance_km=None):
+        n = len(ids)
+        data = np.zeros(n, dtype=STATION_DTYPE)
+        if latitude is not None:
+            data["latitude"] = latitude
+        if longitude is not None:
+            data["longitude"] = longitude
+        if free_bikes is not None:
+            data["free_bikes"] = _counts(free_bikes)
+        if empty_slots is not None:
+            data["empty_slots"] = _counts(empty_slots)
+        data["distance_km"] = np.nan if distance_km is None else distance_km
+        return cls(ids, data)
+
+    @classmethod
+    def from_frame(cls, df):
+        cols = {c: df[c].to_numpy() for c in STATION_DTYPE.names if c in df.columns}
+        return cls.from_columns(df["id"].astype(str).tolist(), **cols)
+
+    @classmethod
+    def from_records(cls, records):
+        ids = [s["id"] for s in records]
+        cols = {}
+        for c in STATION_DTYPE.names:
+            if any(c in s for s in records):
+                default = 0 if c in ("free_bikes", "empty_slots") else np.nan
+                cols[c] = [s.get(c, default) if s.get(c) is not None else default for s in records]
+        return cls.from_columns(ids, **cols)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __repr__(self):
+        return f"StationTable({len(self)} stations)"
+
+    def to_records(self) -> list:
+        """The only place station dicts are built (LLM-facing records)."""
+        d = self.data
+        lat, lon = d["latitude"].tolist(), d["longitude"].tolist()
+        free, empty = d["free_bikes"].tolist(), d["empty_slots"].tolist()
+        dist = d["distance_km"].tolist()
+        has_dist = not np.isnan(d["distance_km"]).all() if len(d) else False
+
+        records = []
+        for i, sid in enumerate(self.ids):
+            rec = {"id": sid, "latitude": lat[i], "longitude": lon[i], "free_bikes": free[i], "empty_slots": empty[i]}
+            if has_dist:
+                rec["distance_km"] = dist[i]
+            records.append(rec)
+        return records
+
+    def to_frame(self):
+        import pandas as pd
+
+        df = pd.DataFrame(self.data)
+        df.insert(0, "id", self.ids)
+        return df
+
+    def state(self):
+        """Mutable copies of (free_bikes, empty_slots) for simulating a plan."""
+        return self.data["free_bikes"].copy(), self.data["empty_slots"].copy()
+
+
+# records list (by identity) -> table it was built from
+_REGISTRY = OrderedDict()
+_REGISTRY_LOCK = threading.Lock()
+_REGISTRY_MAX = 256
+
+
+def remember(records: list, table: StationTable) -> None:
+    with _REGISTRY_LOCK:
+        # Keep `records` referenced so its id() cannot be reused while cached
+        _REGISTRY[id(records)] = (records, table)
+        _REGISTRY.move_to_end(id(records))
+        while len(_REGISTRY) > _REGISTRY_MAX:
+            _REGISTRY.popitem(last=False)
+
+
+def table_for_records(records: list) -> StationTable:
+    hit = _REGISTRY.get(id(records))
+    if hit is not None and hit[0] is records:
+        return hit[1]
+
+    table = StationTable.from_records(records)
+    remember(records, table)
+    return table
+
+
+def station_table(context: dict) -> StationTable:
+    """Station table for the nearby stations in a planner/critic context."""
+    nearby = context.get("nearby_stations") or context.get("get_nearby_stations") or []
+    return table_for_records(nearby)
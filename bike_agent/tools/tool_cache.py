@@ -0,0 +1,136 @@
+# bike_agent/tools/tool_cache.py
+"""
+Memoization of tool results for the planner (ToolSpec.cache).
+
+The planner often repeats a tool request verbatim or almost verbatim (e.g. the
+same get_nearby_stations call after a validation error, or the next request from
+the same depot). A CachePolicy says how to recognise those repeats:
+
+- normalize(args): canonical cache key (coordinates rounded to ~10 m, station
+  lists sorted by id, ...).
+- version(): what the result was computed from (pinned snapshot, latest-state
+  publication, reservation ledger state). Entries only hit while it is unchanged.
+- ttl_s: upper bound on age, for data sources without a version (feature store).
+- valid(value): entries it rejects are dropped on lookup (e.g. results naming
+  an in-process object that has since been evicted).
+
+Cached values are the serialized tool results the planner puts in its context.
+They are shared between requests and must not be mutated.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+TOOL_CACHE_TTL_S = float(os.getenv("TOOL_CACHE_TTL_S", "300"))
+TOOL_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", "1024"))
+TOOL_CACHE_ENABLED = os.getenv("TOOL_CACHE", "1").lower() not in ("0", "false", "off")
+
+# Decimal places of latitude/longitude in cache keys: 1e-4 degrees is ~11 m
+COORD_DECIMALS = 4
+
+
+def round_coord(value) -> float:
+    return round(float(value), COORD_DECIMALS)
+
+
+def station_key(stations) -> tuple:
+    """Station list (ids or {"id", "latitude", "longitude"} dicts) as a sorted tuple."""
+    out = []
+    for s in stations:
+        if isinstance(s, dict):
+            out.append((str(s.get("id")), round_coord(s.get("latitude", 0)), round_coord(s.get("longitude", 0))))
+        else:
+            out.append((str(s),))
+    return tuple(sorted(out))
+
+
+def snapshot_version():
+    """Version of the station data tools read right now (None: only the TTL applies)."""
+    from .feature_store import snapshot_version as _snapshot_version
+
+    return _snapshot_version()
+
+
+def ledger_version():
+    from .reservations import get_ledger
+
+    return get_ledger().version()
+
+
+def state_version():
+    """Station data and reservation holds (for tools that subtract holds)."""
+    return snapshot_version(), ledger_version()
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    normalize: Callable[[Dict[str, Any]], Any]
+    version: Optional[Callable[[], Any]] = None
+    ttl_s: float = TOOL_CACHE_TTL_S
+    max_entries: int = TOOL_CACHE_SIZE
+    valid: Optional[Callable[[Any], bool]] = None
+
+
+class ToolCache:
+    """Size-bounded LRU of serialized tool results with hit/miss counters."""
+
+    def __init__(self, policy: CachePolicy):
+        self.policy = policy
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, args: Dict[str, Any]):
+        """Cache key for `args`, or None if they cannot be normalized (never cached)."""
+        try:
+            normalized = self.policy.normalize(args)
+            version = self.policy.version() if self.policy.version is not None else None
+            key = (normalized, version)
+            hash(key)
+        except (TypeError, ValueError, KeyError):
+            return None
+        return key
+
+    def get(self, key):
+        if key is None or not TOOL_CACHE_ENABLED:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now and (self.policy.valid is None or self.policy.valid(entry[0])):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    def put(self, key, value) -> None:
+        if key is None or not TOOL_CACHE_ENABLED:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.policy.ttl_s)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.policy.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries),
+        }
@@ -0,0 +1,135 @@
+# bike_agent/tools/travel_matrix.py
+"""
+Directed travel matrices (opt-in with DIRECTED_DISTANCES=1).
+
+get_distances shows the LLM one averaged value per station pair. With one-way
+streets, i -> j and j -> i can differ a lot, so in directed mode the full OSRM
+matrices are also kept here, as float32 km / minutes, and the result only gains
+a short "matrix_id". Validation, scoring and the final instructions then look up
+legs in the direction they are driven; the LLM-facing pairs stay the same.
+
+The matrix_id is a hash of the ids and legs, so the same matrix always gets the
+same id and prompts carrying it stay cacheable. Matrices live in a process-wide
+LRU (MATRIX_STORE_SIZE). If one has been evicted, legs() falls back to the
+undirected pairs with a warning, validation reports DISTANCE_MATRIX_EXPIRED,
+scores carry a warning, and cached get_distances results naming it are dropped.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+MATRIX_STORE_SIZE = int(os.getenv("MATRIX_STORE_SIZE", "1024"))
+
+
+def directed_mode() -> bool:
+    return os.getenv("DIRECTED_DISTANCES", "0").lower() in ("1", "true", "yes")
+
+
+class TravelMatrix:
+    __slots__ = ("ids", "index", "km", "minutes")
+
+    def __init__(self, ids: List[str], dist_m: np.ndarray, dur_s: np.ndarray):
+        self.ids = list(ids)
+        self.index = {sid: i for i, sid in enumerate(self.ids)}
+        self.km = (np.asarray(dist_m, dtype=float) / 1000.0).astype(np.float32)
+        self.minutes = (np.asarray(dur_s, dtype=float) / 60.0).astype(np.float32)
+
+    def leg(self, frm: str, to: str) -> Optional[Tuple[float, float]]:
+        """(km, minutes) driving from `frm` to `to`, or None if unknown."""
+        i = self.index.get(frm)
+        j = self.index.get(to)
+        if i is None or j is None:
+            return None
+        km, minutes = float(self.km[i, j]), float(self.minutes[i, j])
+        if np.isnan(km) or np.isnan(minutes):
+            return None
+        return km, minutes
+
+
+_STORE: "OrderedDict[str, TravelMatrix]" = OrderedDict()
+_STORE_LOCK = threading.Lock()
+
+
+def matrix_key(matrix: TravelMatrix) -> str:
+    """Content hash: equal matrices share an id."""
+    h = hashlib.blake2b(digest_size=6)
+    h.update("\x1f".join(matrix.ids).encode())
+    h.update(matrix.km.tobytes())
+    h.update(matrix.minutes.tobytes())
+    return h.hexdigest()
+
+
+def store(matrix: TravelMatrix) -> str:
+    key = matrix_key(matrix)
+    with _STORE_LOCK:
+        _STORE[key] = matrix
+        _STORE.move_to_end(key)
+        while len(_STORE) > MATRIX_STORE_SIZE:
+            _STORE.popitem(last=False)
+    return key
+
+
+def lookup(key) -> Optional[TravelMatrix]:
+    with _STORE_LOCK:
+        matrix = _STORE.get(key)
+        if matrix is not None:
+            _STORE.move_to_end(key)
+        return matrix
+
+
+def legs(distances) -> Callable[[str, str], Optional[Tuple[float, float]]]:
+    """
+    (from, to) -> (km, minutes) for a get_distances result: directed when its
+    matrix is available, otherwise the undirected pairs.
+    """
+    if not isinstance(distances, dict):
+        return lambda frm, to: None
+
+    matrix = lookup(distances.get("matrix_id"))
+    if matrix is not None:
+        return matrix.leg
+    if distances.get("matrix_id") is not None:
+        print(f"[MATRIX] {distances['matrix_id']} was evicted; using undirected pairs")
+
+    pairs: Dict[tuple, tuple] = {}
+    for p in distances.get("pairs", []):
+        a, b = p.get("from"), p.get("to")
+        d, t = p.get("distance_km"), p.get("duration_min")
+        if a and b and isinstance(d, (int, float)) and isinstance(t, (int, float)):
+            pairs[(a, b)] = pairs[(b, a)] = (d, t)
+    return lambda frm, to: pairs.get((frm, to))
+
+
+def is_directed(distances) -> bool:
+    return isinstance(distances, dict) and lookup(distances.get("matrix_id")) is not None
+
+
+def matrix_missing(distances) -> bool:
+    """True if the result names a directed matrix that is no longer in the store."""
+    return (
+        isinstance(distances, dict)
+        and distances.get("matrix_id") is not None
+        and lookup(distances["matrix_id"]) is None
+    )
+
+
+def route_minutes(plan_json: dict, distances, start: str = "start") -> Optional[float]:
+    """Driving minutes from start through the plan's stops, or None if a leg is unknown."""
+    leg = legs(distances)
+    total = 0.0
+    prev = start
+    for stop in plan_json.get("stops", []):
+        sid = stop.get("station_id")
+        if sid == prev:
+            continue
+        info = leg(prev, sid)
+        if info is None:
+            return None
+        total += info[1]
+        prev = sid
+    return total
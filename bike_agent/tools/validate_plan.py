@@ -1,10 +1,17 @@
 # validate_plan.py
-def validate_plan(plan_json, context):
+from .station_table import StationTable, station_table
+from .travel_matrix import is_directed, matrix_missing, route_minutes
+
+
+def validate_plan(plan_json, context, reserved=None):
     """
     Pure validation:
     - No tool calls
     - Uses only provided context
     - Deterministic
+
+    reserved: optional {station_id: {"pickup": n, "dropoff": n}} held by in-flight
+    plans that the context does not reflect yet; subtracted before checking.
     """
     errors = []
 
@@ -18,16 +25,77 @@ def validate_plan(plan_json, context):
         })
         return errors
 
-    nearby = context.get("nearby_stations") or context.get("get_nearby_stations") or []
+    stations = _station_state(station_table(context), reserved)
+
+    errors.extend(_apply_stops(plan_json, stations, truck_capacity))
+    errors.extend(_check_route_time(plan_json, context))
+    return errors
+
+
+def validate_fleet_plan(plans, context, truck_capacities=None):
+    """
+    Joint validation of several truck plans against ONE shared station state.
+
+    Same per-stop rules as validate_plan, but stations are not reset between trucks:
+    bikes picked up by truck 0 are no longer available to truck 1, and slots filled
+    by one truck cannot be filled again by another. Errors carry a "truck" index.
+
+    truck_capacities: optional list; a plan may not assume more capacity than its truck has.
+    """
+    stations = _station_state(station_table(context))
+
+    errors = []
+    for t, plan_json in enumerate(plans):
+        if plan_json is None:
+            continue
+
+        truck_capacity = plan_json.get("assumptions", {}).get("truck_capacity")
+        if truck_capacity is None:
+            errors.append({
+                "truck": t,
+                "code": "MISSING_TRUCK_CAPACITY",
+                "detail": "truck_capacity missing from assumptions"
+            })
+            continue
+
+        if truck_capacities is not None and truck_capacity > truck_capacities[t]:
+            errors.append({
+                "truck": t,
+                "code": "CAPACITY_EXCEEDED",
+                "detail": f"Plan assumes capacity {truck_capacity}, truck {t} has {truck_capacities[t]}"
+            })
+            truck_capacity = truck_capacities[t]
+
+        for err in _apply_stops(plan_json, stations, truck_capacity):
+            errors.append({"truck": t, **err})
+
+    return errors
+
+
+class _State:
+    """Mutable (free_bikes, empty_slots) arrays over a StationTable's rows."""
+    __slots__ = ("index", "free", "empty")
 
-    stations = {
-        s["id"]: {
-            "free_bikes": s.get("free_bikes", 0),
-            "empty_slots": s.get("empty_slots", 0)
-        }
-        for s in nearby
-    }
+    def __init__(self, table: StationTable):
+        self.index = table.index
+        self.free, self.empty = table.state()
 
+
+def _station_state(table, reserved=None):
+    stations = _State(table)
+
+    for sid, held in (reserved or {}).items():
+        i = stations.index.get(sid)
+        if i is not None:
+            stations.free[i] = max(0, stations.free[i] - held.get("pickup", 0))
+            stations.empty[i] = max(0, stations.empty[i] - held.get("dropoff", 0))
+
+    return stations
+
+
+def _apply_stops(plan_json, stations, truck_capacity):
+    """Check stops in order, updating `stations` in place for every accepted stop."""
+    errors = []
     current_load = 0
 
     for i, stop in enumerate(plan_json.get("stops", [])):
@@ -35,7 +103,8 @@ def validate_plan(plan_json, context):
         action = stop.get("action")
         bikes = stop.get("bikes")
 
-        if station_id not in stations:
+        idx = stations.index.get(station_id)
+        if idx is None:
             errors.append({
                 "code": "UNKNOWN_STATION",
                 "detail": f"Station {station_id} not found in context"
@@ -49,31 +118,29 @@ def validate_plan(plan_json, context):
             })
             continue
 
-        station = stations[station_id]
-
         if action == "pickup":
-            if bikes > station["free_bikes"]:
+            if bikes > stations.free[idx]:
                 errors.append({
                     "code": "PICKUP_EXCEEDS_AVAILABLE",
-                    "detail": f"Pickup {bikes} from {station_id}, only {station['free_bikes']} available"
+                    "detail": f"Pickup {bikes} from {station_id}, only {stations.free[idx]} available"
                 })
                 continue
 
             current_load += bikes
-            station["free_bikes"] -= bikes
-            station["empty_slots"] += bikes
+            stations.free[idx] -= bikes
+            stations.empty[idx] += bikes
 
         elif action == "dropoff":
-            if bikes > station["empty_slots"]:
+            if bikes > stations.empty[idx]:
                 errors.append({
                     "code": "DROPOFF_EXCEEDS_CAPACITY",
-                    "detail": f"Dropoff {bikes} to {station_id}, only {station['empty_slots']} slots available"
+                    "detail": f"Dropoff {bikes} to {station_id}, only {stations.empty[idx]} slots available"
                 })
                 continue
 
             current_load -= bikes
-            station["free_bikes"] += bikes
-            station["empty_slots"] -= bikes
+            stations.free[idx] += bikes
+            stations.empty[idx] -= bikes
 
         else:
             errors.append({
@@ -95,3 +162,26 @@ def validate_plan(plan_json, context):
             })
 
     return errors
+
+
+def _check_route_time(plan_json, context):
+    """Driving time along the stops vs time_budget_min, only with directed legs (DIRECTED_DISTANCES=1)."""
+    distances = context.get("get_distances")
+    budget = plan_json.get("assumptions", {}).get("time_budget_min")
+    if budget is None:
+        return []
+    if matrix_missing(distances):
+        return [{
+            "code": "DISTANCE_MATRIX_EXPIRED",
+            "detail": f"Directed legs of matrix_id {distances['matrix_id']} are gone; request get_distances again"
+        }]
+    if not is_directed(distances):
+        return []
+
+    minutes = route_minutes(plan_json, distances)
+    if minutes is None or minutes <= budget:
+        return []
+    return [{
+        "code": "TIME_BUDGET_EXCEEDED",
+        "detail": f"Driving the stops in order takes {minutes:.1f} min (one-way streets included), budget is {budget} min"
+    }]
@@ -0,0 +1,273 @@
+# bike_agent/tracing.py
+"""
+Lightweight request tracing (no SDK dependency).
+
+    with start_trace("orchestration") as trace:
+        with span("planner"):
+            with span("llm.call", model=...) as s:
+                s.set(prompt_tokens=...)
+    trace.summary()
+
+Spans nest through a ContextVar, so tools can add to whatever span is current
+(`incr("cache_hits")`) without knowing who called them. Finished traces are
+exported according to TRACE_EXPORT:
+
+- "none" (default): only the in-process summary
+- "jsonl": one JSON line per span appended to TRACE_JSONL_PATH
+- "otlp": OTLP/HTTP JSON to OTEL_EXPORTER_OTLP_ENDPOINT (/v1/traces), sent from
+  a background thread so a slow collector never adds request latency
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "none").lower()
+TRACE_JSONL_PATH = Path(os.getenv("TRACE_JSONL_PATH", "traces.jsonl"))
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "citybike-rebalancing-agent")
+
+_CURRENT = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attrs", "start_ns", "end_ns", "start_wall", "error")
+
+    def __init__(self, trace, name, parent_id=None, attrs=None):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.start_wall = time.time()
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def incr(self, key, n=1):
+        self.attrs[key] = self.attrs.get(key, 0) + n
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_wall,
+            "duration_ms": round(self.duration_ms, 3),
+            "attrs": self.attrs,
+            "error": self.error,
+        }
+
+
+class Trace:
+    def __init__(self, name):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def _add(self, s):
+        with self._lock:
+            self.spans.append(s)
+
+    def summary(self) -> dict:
+        """Per-request totals: phases, LLM calls/tokens, tool calls, validations, critic budget."""
+        with self._lock:
+            spans = list(self.spans)
+
+        root = next((s for s in spans if s.parent_id is None), None)
+        out = {
+            "trace_id": self.trace_id,
+            "total_ms": round(root.duration_ms, 1) if root else 0.0,
+            "phases_ms": {},
+            "llm": {"calls": 0, "ms": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "cache_hits": 0, "roles": {}},
+            "tools": {},
+            "validations": {"calls": 0, "ms": 0.0},
+        }
+        for s in spans:
+            if root is not None and s.parent_id == root.span_id:
+                out["phases_ms"][s.name] = round(out["phases_ms"].get(s.name, 0.0) + s.duration_ms, 1)
+            if s.name == "llm.call":
+                llm = out["llm"]
+                llm["calls"] += 1
+                llm["ms"] = round(llm["ms"] + s.duration_ms, 1)
+                llm["prompt_tokens"] += s.attrs.get("prompt_tokens") or 0
+                llm["completion_tokens"] += s.attrs.get("completion_tokens") or 0
+                role = llm["roles"].setdefault(
+                    s.attrs.get("role", "default"), {"calls": 0, "ms": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+                )
+                role["calls"] += 1
+                role["ms"] = round(role["ms"] + s.duration_ms, 1)
+                role["prompt_tokens"] += s.attrs.get("prompt_tokens") or 0
+                role["completion_tokens"] += s.attrs.get("completion_tokens") or 0
+            elif s.name == "llm.cache":
+                out["llm"]["cache_hits"] += 1 if s.attrs.get("hit") else 0
+            elif s.name.startswith("tool."):
+                tool = out["tools"].setdefault(s.name[5:], {"calls": 0, "ms": 0.0, "cache_hits": 0})
+                tool["calls"] += 1
+                tool["ms"] = round(tool["ms"] + s.duration_ms, 1)
+                tool["cache_hits"] += s.attrs.get("cache_hits", 0)
+            elif s.name == "validate":
+                out["validations"]["calls"] += 1
+                out["validations"]["ms"] = round(out["validations"]["ms"] + s.duration_ms, 1)
+            elif s.name == "critic" and s.attrs:
+                out["critic"] = dict(s.attrs)
+        return out
+
+
+@contextmanager
+def span(name, **attrs):
+    """Child span of the current one; a no-op-cheap span if no trace is active."""
+    parent = _CURRENT.get()
+    if parent is None:
+        s = Span(_NULL_TRACE, name, attrs=attrs)
+    else:
+        s = Span(parent.trace, name, parent_id=parent.span_id, attrs=attrs)
+
+    token = _CURRENT.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end_ns = time.perf_counter_ns()
+        _CURRENT.reset(token)
+        if parent is not None:
+            parent.trace._add(s)
+
+
+@contextmanager
+def start_trace(name, **attrs):
+    """Root span of a new trace; the trace is exported when the block exits."""
+    trace = Trace(name)
+    root = Span(trace, name, attrs=attrs)
+    token = _CURRENT.set(root)
+    try:
+        yield trace
+    except BaseException as e:
+        root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        root.end_ns = time.perf_counter_ns()
+        _CURRENT.reset(token)
+        trace._add(root)
+        export(trace)
+
+
+def current_span():
+    return _CURRENT.get()
+
+
+def incr(key, n=1):
+    """Add to a counter on the current span (e.g. cache hits inside a tool)."""
+    s = _CURRENT.get()
+    if s is not None:
+        s.incr(key, n)
+
+
+class _NullTrace(Trace):
+    def _add(self, s):
+        pass
+
+
+_NULL_TRACE = _NullTrace("untraced")
+
+
+# ----------------------------
+# Export
+# ----------------------------
+
+_JSONL_LOCK = threading.Lock()
+_OTLP_QUEUE = queue.Queue(maxsize=1000)
+_OTLP_THREAD = None
+
+
+def export(trace: Trace) -> None:
+    if TRACE_EXPORT == "jsonl":
+        _export_jsonl(trace)
+    elif TRACE_EXPORT == "otlp":
+        _export_otlp(trace)
+
+
+def _export_jsonl(trace, path: Path = None):
+    path = path or TRACE_JSONL_PATH
+    lines = "".join(json.dumps(s.to_dict(), default=str) + "\n" for s in trace.spans)
+    with _JSONL_LOCK, open(path, "a", encoding="utf-8") as f:
+        f.write(lines)
+
+
+def _otlp_value(v):
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def otlp_payload(trace: Trace) -> dict:
+    """OTLP/HTTP JSON body (ExportTraceServiceRequest) for one trace."""
+    spans = []
+    for s in trace.spans:
+        start_ns = int(s.start_wall * 1e9)
+        otlp = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(start_ns + int(s.duration_ms * 1e6)),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attrs.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            otlp["parentSpanId"] = s.parent_id
+        spans.append(otlp)
+
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "bike_agent"}, "spans": spans}],
+    }]}
+
+
+def _export_otlp(trace):
+    global _OTLP_THREAD
+    if _OTLP_THREAD is None:
+        with _JSONL_LOCK:
+            if _OTLP_THREAD is None:
+                _OTLP_THREAD = threading.Thread(target=_otlp_worker, name="otlp-exporter", daemon=True)
+                _OTLP_THREAD.start()
+    try:
+        _OTLP_QUEUE.put_nowait(otlp_payload(trace))
+    except queue.Full:
+        print("[TRACING] OTLP export queue full, dropping trace")
+
+
+def _otlp_worker():
+    import requests
+
+    session = requests.Session()
+    url = OTLP_ENDPOINT.rstrip("/") + "/v1/traces"
+    while True:
+        payload = _OTLP_QUEUE.get()
+        try:
+            session.post(url, json=payload, timeout=5)
+        except Exception as e:
+            print(f"[TRACING] OTLP export failed: {e}")
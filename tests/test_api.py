@@ -0,0 +1,115 @@
+from pathlib import Path
+from dotenv import load_dotenv
+
+# ------------------------------------------------------------------
+# Load .env from project root
+# ------------------------------------------------------------------
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+load_dotenv(PROJECT_ROOT / ".env")
+
+import numpy as np
+from starlette.testclient import TestClient
+
+import api as api_mod
+import bike_agent.agent.batch as batch_mod
+
+
+def test_plan_endpoint(monkeypatch):
+    def fake_run_orchestration(task_payload):
+        out = dict(task_payload)
+        out["approved_plan"] = {"type": "PLAN", "stops": [{"station_id": "a101", "action": "dropoff", "bikes": 3}]}
+        out["approved_score"] = {"metric": "m", "score": 3}
+        out["reservation_id"] = "r1"
+        return out
+
+    monkeypatch.setattr(api_mod, "run_orchestration", fake_run_orchestration)
+    client = TestClient(api_mod.api)
+
+    r = client.post("/api/plan", json={"user_request": "x", "start_coordinates": {"lat": 39.5, "lon": 2.6}})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["approved_score"]["score"] == 3
+    assert body["approved_plan"]["stops"][0]["station_id"] == "a101"
+
+    r = client.post("/api/plan", json={"user_request": "x"})
+    assert r.status_code == 400
+
+
+def test_batch_contexts_share_one_matrix(monkeypatch):
+    stations = {
+        (39.50, 2.60): [{"id": "a101", "latitude": 39.501, "longitude": 2.601, "free_bikes": 1, "empty_slots": 10.0, "distance_km": 0.1}],
+        (39.60, 2.70): [
+            {"id": "a101", "latitude": 39.501, "longitude": 2.601, "free_bikes": 1, "empty_slots": 10.0, "distance_km": 1.9},
+            {"id": "b202", "latitude": 39.601, "longitude": 2.701, "free_bikes": 9, "empty_slots": 1.0, "distance_km": 0.1},
+        ],
+    }
+    matrix_calls = []
+
+    def fake_nearby(k, radius_km, lat, lon):
+        return stations[(lat, lon)]
+
+    def fake_matrix(points):
+        matrix_calls.append(points)
+        n = len(points)
+        m = np.arange(n * n, dtype=float).reshape(n, n) * 60.0
+        return {"ids": [p["id"] for p in points], "distances_m": m, "durations_s": m}
+
+    monkeypatch.setattr(batch_mod, "get_nearby_stations", fake_nearby)
+    monkeypatch.setattr(batch_mod, "get_distance_matrix", fake_matrix)
+
+    requests = [
+        {"user_request": "x", "start_coordinates": {"lat": 39.50, "lon": 2.60}},
+        {"user_request": "y", "start_coordinates": {"lat": 39.60, "lon": 2.70}},
+    ]
+    contexts = batch_mod.prepare_batch_contexts(requests)
+
+    # One OSRM call for both trucks; shared station only sent once
+    assert len(matrix_calls) == 1
+    assert [p["id"] for p in matrix_calls[0]] == ["start:0", "a101", "start:1", "b202"]
+
+    assert contexts[0]["get_distances"]["ids"] == ["start", "a101"]
+    assert contexts[1]["get_distances"]["ids"] == ["start", "a101", "b202"]
+    assert len(contexts[1]["get_distances"]["pairs"]) == 3
+
+
+def test_batch_reserves_against_the_holds_it_subtracted(monkeypatch):
+    from bike_agent.tools.reservations import ReservationLedger
+
+    ledger = ReservationLedger()
+    calls = []
+    ctx = {"get_nearby_stations": [{"id": "a101", "free_bikes": 8, "empty_slots": 2}]}
+    ctx["nearby_stations"] = ctx["get_nearby_stations"]
+
+    def fake_contexts(requests, k, radius_km):
+        # Another truck reserves after the batch started, before this one is planned
+        ledger.reserve("other", {"stops": [{"station_id": "a101", "action": "pickup", "bikes": 5}]})
+        return [dict(ctx)]
+
+    def fake_run_orchestration(task_payload, reservation_since=None):
+        calls.append((task_payload["context"]["nearby_stations"][0]["free_bikes"], reservation_since))
+        return {"approved_plan": {}, "approved_score": {}, "reservation_id": "r"}
+
+    monkeypatch.setattr(batch_mod, "get_features", lambda api_key=None: None)
+    monkeypatch.setattr(batch_mod, "get_ledger", lambda: ledger)
+    monkeypatch.setattr(batch_mod, "prepare_batch_contexts", fake_contexts)
+    monkeypatch.setattr(batch_mod, "run_orchestration", fake_run_orchestration)
+
+    batch_mod.plan_batch([{"start_coordinates": {"lat": 39.5, "lon": 2.6}}], max_workers=1)
+    # The hold is subtracted once, and the reserve-time check starts after it
+    assert calls == [(3, ledger.seq())]
+
+
+def test_fleet_payload_keeps_time_budget():
+    from bike_agent.agent.fleet import _truck_payload
+
+    truck = api_mod._parse_request({"start_coordinates": {"lat": 39.5, "lon": 2.6}, "time_budget_min": 30})
+    truck["truck_capacity"] = 12
+    assert _truck_payload(truck, "x")["time_budget_min"] == 30.0
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,32 @@
+from benchmarks import run as bench
+
+
+def test_orchestrator_replays_recorded_session():
+    text = bench.setup_orchestrator(100)()
+    assert "Station b202" in text and "Drop off" in text
+
+
+def test_measure_and_compare():
+    stats = bench.measure(bench.setup_validate(100), repeat=3, max_seconds=1.0)
+    assert stats["runs"] == 3 and stats["p50_ms"] <= stats["p99_ms"]
+
+    baseline = {"validate/100": {"p50_ms": 1.0}, "score/100": {"p50_ms": 1.0}}
+    results = {"validate/100": {"p50_ms": 5.0}, "score/100": {"p50_ms": 1.2}, "nearby/100": {"p50_ms": 9.0}}
+    regressions = bench.compare(results, baseline)
+    assert len(regressions) == 1 and regressions[0].startswith("validate/100")
+
+
+def test_import_stays_light():
+    stats = bench.measure_import("bike_agent.agent.orchestrator", repeat=1)
+    assert stats["heavy_modules"] == []
+
+    failures = bench.check_imports({"import/api": {"p50_ms": 900.0, "heavy_modules": ["pandas"]}})
+    assert len(failures) == 2
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
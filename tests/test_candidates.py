@@ -0,0 +1,90 @@
+from bike_agent.tools.candidates import prune_distance_args, select_candidates
+from bike_agent.tools.registry import get_tool_spec
+
+START = {"lat": 39.5696, "lon": 2.6502}
+
+
+def _station(i, free, empty, dlat):
+    return {"id": f"s{i}", "latitude": START["lat"] + dlat, "longitude": START["lon"], "free_bikes": free, "empty_slots": empty}
+
+
+def test_prefers_imbalanced_stations_over_nearest():
+    # Ten balanced stations right next to the start, two imbalanced ones a bit further out
+    balanced = [_station(i, 3, 3, 0.0005 * i) for i in range(10)]
+    receiver = _station(10, 0, 12, 0.01)
+    donor = _station(11, 15, 1, 0.012)
+
+    chosen = select_candidates(balanced + [receiver, donor], START, n=4)
+    ids = [s["id"] for s in chosen]
+    assert len(ids) == 4
+    assert ids[:2] == ["s10", "s11"]
+
+
+def test_out_of_budget_stations_lose_their_value():
+    near = _station(0, 0, 5, 0.005)
+    far = _station(1, 0, 20, 0.3)  # ~40 km
+    filler = [_station(i, 3, 3, 0.001 * i) for i in range(2, 6)]
+
+    chosen = select_candidates([far, near] + filler, START, n=2, time_budget_min=60)
+    assert chosen[0]["id"] == "s0"
+    assert "s1" not in [s["id"] for s in chosen]
+
+
+def test_prune_distance_args_uses_nearby_index():
+    nearby = [_station(i, i % 7, 7 - i % 7, 0.001 * i) for i in range(20)]
+    user_context = {"start_coordinates": START, "context": {"nearby_stations": nearby}}
+
+    args = prune_distance_args({"stations": [{"id": "s1", "latitude": 0.0, "longitude": 0.0}]}, user_context)
+    assert len(args["stations"]) == 10
+    assert set(args["stations"][0]) == {"id", "latitude", "longitude"}
+    assert args["start_coordinates"] == START
+
+    assert get_tool_spec("get_distances").prepare is not None
+
+
+def test_prune_keeps_requested_stations():
+    nearby = [_station(i, i % 7, 7 - i % 7, 0.001 * i) for i in range(20)]
+    # s99 is balanced and ~30 km out: ranking alone would never pick it
+    nearby.append(_station(99, 3, 3, 0.3))
+    user_context = {"start_coordinates": START, "context": {"nearby_stations": nearby}}
+
+    asked = [{"id": "s99", "latitude": 0.0, "longitude": 0.0}, {"id": "s7", "latitude": 0.0, "longitude": 0.0}]
+    ids = [s["id"] for s in prune_distance_args({"stations": asked}, user_context)["stations"]]
+    assert ids[:2] == ["s99", "s7"]
+    assert len(ids) == 10 and len(set(ids)) == 10
+
+
+def test_prune_caps_requested_stations():
+    balanced = [_station(i, 3, 3, 0.0005 * i) for i in range(20)]
+    receivers = [_station(i, 0, 10, 0.01) for i in range(20, 25)]
+    user_context = {"start_coordinates": START, "context": {"nearby_stations": balanced + receivers}}
+
+    # Asking for all 25 still yields one 10-station table, with the valuable ones kept
+    asked = [{"id": s["id"], "latitude": 0.0, "longitude": 0.0} for s in balanced + receivers]
+    ids = [s["id"] for s in prune_distance_args({"stations": asked}, user_context)["stations"]]
+    assert len(ids) == 10
+    assert {s["id"] for s in receivers} <= set(ids)
+
+
+def test_prune_uses_request_time_budget():
+    near = _station(0, 0, 5, 0.005)
+    far = _station(1, 0, 20, 0.05)  # ~6 km: in a 60 min budget, not in a 5 min one
+    filler = [_station(i, 3, 3, 0.0005 * i) for i in range(2, 14)]
+    nearby = [far, near] + filler
+
+    def picked(budget):
+        user_context = {"start_coordinates": START, "context": {"nearby_stations": nearby}}
+        if budget is not None:
+            user_context["time_budget_min"] = budget
+        return [s["id"] for s in prune_distance_args({"stations": []}, user_context)["stations"]]
+
+    assert picked(None)[0] == "s1"
+    assert picked(5)[0] == "s0"
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
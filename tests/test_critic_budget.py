@@ -0,0 +1,69 @@
+import json
+
+import bike_agent.agent.orchestrator as orch
+from bike_agent.tools.score_plan import score_upper_bound
+
+
+CONTEXT = {
+    "nearby_stations": [
+        {"id": "a101", "free_bikes": 8, "empty_slots": 2},
+        {"id": "b202", "free_bikes": 0, "empty_slots": 10},
+        {"id": "c303", "free_bikes": 1, "empty_slots": 4},
+    ],
+    "get_distances": {
+        "ids": ["start", "a101", "b202", "c303"],
+        "pairs": [
+            {"from": "start", "to": "a101", "distance_km": 1.0, "duration_min": 4.0},
+            {"from": "start", "to": "b202", "distance_km": 2.0, "duration_min": 8.0},
+            {"from": "start", "to": "c303", "distance_km": 20.0, "duration_min": 90.0},
+        ],
+    },
+}
+
+PLAN = {
+    "assumptions": {"truck_capacity": 10, "time_budget_min": 60},
+    "stops": [
+        {"station_id": "a101", "action": "pickup", "bikes": 8},
+        {"station_id": "b202", "action": "dropoff", "bikes": 8},
+    ],
+}
+
+
+def test_upper_bound():
+    # Receivers b202 (10 slots) and c303 (4 slots); bikes on offer: 8 + 0 + 1
+    assert score_upper_bound(CONTEXT, low_threshold=3) == 9
+    # c303 is out of reach within 60 min
+    assert score_upper_bound(CONTEXT, low_threshold=3, time_budget_min=60) == 8
+
+    # A full receiver still scores if it is emptied first: pick up 2, drop 2 back
+    full = {"nearby_stations": [{"id": "d404", "free_bikes": 2, "empty_slots": 0}]}
+    assert score_upper_bound(full, low_threshold=3) == 2
+
+
+def test_critic_skipped_at_bound(monkeypatch):
+    calls = []
+    monkeypatch.setattr(orch, "call_llm", lambda _: calls.append(1) or json.dumps({"type": "APPROVED"}))
+
+    plan, score = orch.improve_with_critic(context=dict(CONTEXT), initial_plan=PLAN, max_revisions=4)
+    assert calls == [] and plan is PLAN and score["score"] == 8
+
+
+def test_critic_stops_on_small_delta(monkeypatch):
+    smaller = {**PLAN, "stops": [
+        {"station_id": "a101", "action": "pickup", "bikes": 4},
+        {"station_id": "b202", "action": "dropoff", "bikes": 4},
+    ]}
+    revised = {"type": "PLAN", "expected_score_delta": 0, **PLAN}
+    calls = []
+    monkeypatch.setattr(orch, "call_llm", lambda _: calls.append(1) or json.dumps({**revised, "stops": smaller["stops"]}))
+
+    plan, score = orch.improve_with_critic(context=dict(CONTEXT), initial_plan=smaller, max_revisions=4)
+    assert len(calls) == 1 and score["score"] == 4
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
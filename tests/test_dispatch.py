@@ -0,0 +1,77 @@
+import json
+import time
+
+import pytest
+
+import bike_agent.agent.dispatch as dispatch
+import bike_agent.agent.llm_client as llm_client
+from bike_agent.agent.dispatch import RateLimits, TokenBucket, dispatch_many
+from bike_agent.resilience import DeadlineExceeded, deadline
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(per_minute=600)  # 10 per second
+    assert bucket.acquire(600) == 0.0
+
+    t0 = time.perf_counter()
+    bucket.acquire(2)
+    assert time.perf_counter() - t0 >= 0.15
+
+    bucket.refund(600)
+    assert bucket.acquire(100) == 0.0
+
+
+def test_token_bucket_respects_deadline():
+    bucket = TokenBucket(per_minute=60)
+    bucket.acquire(60)
+    with deadline(0.2), pytest.raises(DeadlineExceeded):
+        bucket.acquire(30)
+
+
+def test_unlimited_bucket_never_waits():
+    limits = RateLimits(rpm=0, tpm=0)
+    assert all(limits.acquire(10**6) == 0.0 for _ in range(100))
+
+
+def test_dispatch_many_runs_concurrently(monkeypatch):
+    monkeypatch.setenv("LLM_BACKEND", "openai")
+    monkeypatch.setenv("LLM_DISPATCH", "sync")
+    monkeypatch.setitem(dispatch._LIMITS, "limits", RateLimits(rpm=0, tpm=0))
+
+    def create(**kwargs):
+        time.sleep(0.1)
+        if "fail" in kwargs["messages"][1]["content"]:
+            raise ValueError("bad request")
+        message = type("M", (), {"content": kwargs["messages"][1]["content"], "tool_calls": None})
+        return type("R", (), {"choices": [type("C", (), {"message": message})], "usage": None})
+
+    client = type("Client", (), {})()
+    client.chat = type("Chat", (), {"completions": type("Completions", (), {"create": staticmethod(create)})})
+    monkeypatch.setitem(llm_client._STATE, "client", client)
+
+    inputs = [{"system_prompt": "", "user_message": f"req {i}"} for i in range(8)]
+    inputs.append({"system_prompt": "", "user_message": "fail"})
+
+    t0 = time.perf_counter()
+    out = dispatch_many(inputs, max_concurrency=9)
+    assert time.perf_counter() - t0 < 0.5
+
+    assert out[:8] == [f"req {i}" for i in range(8)]
+    assert isinstance(out[8], ValueError)
+
+
+def test_parse_response_reads_batch_results():
+    message = {
+        "content": None,
+        "tool_calls": [{"function": {"name": "approve_plan", "arguments": json.dumps({"reason": "ok", "expected_score_delta": 0})}}],
+    }
+    out = llm_client.parse_response({"response_schema": "critic"}, message)
+    assert json.loads(out)["type"] == "APPROVED"
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
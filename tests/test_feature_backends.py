@@ -0,0 +1,136 @@
+from collections import OrderedDict
+
+import pandas as pd
+import pytest
+
+import bike_agent.tools.feature_backends as feature_backends
+import bike_agent.tools.feature_store as feature_store
+from bike_agent.tools.feature_backends import FeatureBackend, HopsworksBackend, ParquetBackend, get_backend
+
+
+def _rows(day, hour, free_a):
+    ts = pd.Timestamp(f"2025-06-0{day} {hour:02d}:00", tz="UTC")
+    return pd.DataFrame([
+        {"id": "a101", "latitude": 39.56, "longitude": 2.65, "free_bikes": free_a, "empty_slots": 10 - free_a, "timestamp": ts},
+        {"id": "b202", "latitude": 39.57, "longitude": 2.66, "free_bikes": 4, "empty_slots": 6, "timestamp": ts},
+    ])
+
+
+def test_parquet_backend(tmp_path):
+    store = ParquetBackend(tmp_path)
+    assert not store.has_data()
+
+    store.write(_rows(1, 10, 1))
+    store.write(_rows(1, 11, 2))
+    store.write(_rows(2, 10, 3))
+    assert store.has_data()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["date=2025-06-01", "date=2025-06-02"]
+
+    full = store.read()
+    assert len(full) == 6
+    assert "date" not in full.columns
+
+    # Column projection + id filter + time window
+    df = store.read(columns=["id", "free_bikes"], station_ids=["a101"], since="2025-06-01 11:00+00:00")
+    assert list(df.columns) == ["id", "free_bikes"]
+    assert sorted(df["free_bikes"].tolist()) == [2, 3]
+
+    df = store.read(station_ids=["b202"], until="2025-06-02 00:00+00:00")
+    assert len(df) == 2
+
+    store.compact()
+    assert len(list((tmp_path / "date=2025-06-01").glob("*.parquet"))) == 1
+    assert len(store.read()) == 6
+
+
+def test_latest_only_pushdown(tmp_path, monkeypatch):
+    store = ParquetBackend(tmp_path)
+    store.write(_rows(1, 10, 1))
+    store.write(_rows(2, 10, 2))
+    store.write(_rows(3, 10, 3))
+
+    latest = store.read(columns=["id", "free_bikes"], latest_only=True)
+    assert list(latest.columns) == ["id", "free_bikes"]
+    assert latest.set_index("id")["free_bikes"].to_dict() == {"a101": 3, "b202": 4}
+
+    # Station only present in an old partition → full-scan fallback finds it
+    store.write(pd.DataFrame([{
+        "id": "c303", "latitude": 39.58, "longitude": 2.67, "free_bikes": 9, "empty_slots": 1,
+        "timestamp": pd.Timestamp("2025-05-01 10:00", tz="UTC"),
+    }]))
+    assert store.read(columns=["free_bikes"], station_ids=["c303"], latest_only=True)["free_bikes"].tolist() == [9]
+
+    # get_features routes the request to the backend
+    monkeypatch.setenv("FEATURE_BACKEND", "local")
+    monkeypatch.setattr("bike_agent.tools.feature_backends.FEATURE_STORE_DIR", tmp_path)
+    monkeypatch.setattr(feature_store, "read_latest", lambda: None)
+    df = feature_store.get_latest_features(api_key=None, columns=["id", "empty_slots"], station_ids=["a101"])
+    assert df.to_dict(orient="records") == [{"id": "a101", "empty_slots": 7}]
+
+
+def test_online_lookup_batches_and_caches(monkeypatch):
+    calls = []
+
+    class _FakeView:
+        def get_feature_vectors(self, entry, return_type):
+            calls.append([e["id"] for e in entry])
+            return pd.DataFrame([
+                {"id": e["id"], "free_bikes": 5, "empty_slots": 5, "latitude": 39.5} for e in entry if e["id"] != "zzzz"
+            ])
+
+    monkeypatch.setattr(feature_backends, "_SERVING", {"key": _FakeView()})
+    monkeypatch.setattr(feature_backends, "_ONLINE_CACHE", OrderedDict())
+    backend = HopsworksBackend(api_key="key")
+
+    df = backend.lookup(["a101", "b202", "zzzz"], columns=["id", "free_bikes"])
+    assert df.to_dict(orient="records") == [{"id": "a101", "free_bikes": 5}, {"id": "b202", "free_bikes": 5}]
+
+    # Cached stations are not looked up again; only the new one goes to the online store
+    backend.lookup(["a101", "c303"])
+    assert calls == [["a101", "b202", "zzzz"], ["c303"]]
+
+    # Entries are per API key and the cache is bounded
+    monkeypatch.setattr(feature_backends, "_SERVING", {"key": _FakeView(), "other": _FakeView()})
+    HopsworksBackend(api_key="other").lookup(["a101"])
+    assert calls[-1] == ["a101"]
+    monkeypatch.setattr(feature_backends, "ONLINE_CACHE_SIZE", 2)
+    backend.lookup(["d404"])
+    assert list(feature_backends._ONLINE_CACHE) == [("other", "a101"), ("key", "d404")]
+
+
+def test_auto_skips_stale_local_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("FEATURE_BACKEND", "auto")
+    monkeypatch.setattr(feature_backends, "FEATURE_STORE_DIR", tmp_path)
+    store = ParquetBackend(tmp_path)
+
+    # Ingest stopped in June 2025: stale, so Hopsworks serves reads when a key is configured
+    store.write(_rows(1, 10, 1))
+    assert get_backend("key").name == "hopsworks"
+    monkeypatch.delenv("HOPSWORKS_API_KEY", raising=False)
+    assert get_backend(None).name == "local"
+
+    now = pd.Timestamp.now(tz="UTC").floor("s")
+    store.write(_rows(1, 10, 1).assign(timestamp=now))
+    assert get_backend("key").name == "local"
+    # An explicit choice (build_forecasts --backend) overrides auto
+    assert get_backend("key", "hopsworks").name == "hopsworks"
+
+
+def test_backends_implement_the_interface():
+    with pytest.raises(TypeError):
+        FeatureBackend()
+
+    class _ReadOnly(FeatureBackend):
+        def read(self, columns=None, station_ids=None, since=None, until=None, latest_only=False):
+            return pd.DataFrame()
+
+    with pytest.raises(TypeError):
+        _ReadOnly()
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
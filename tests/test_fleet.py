@@ -0,0 +1,50 @@
+import pandas as pd
+
+from bike_agent.agent.fleet import partition_stations
+from bike_agent.tools.validate_plan import validate_fleet_plan
+
+
+def test_partition_stations():
+    latest = pd.DataFrame([
+        {"id": "a101", "latitude": 39.560, "longitude": 2.650},
+        {"id": "b202", "latitude": 39.561, "longitude": 2.651},
+        {"id": "c303", "latitude": 39.600, "longitude": 2.700},
+    ])
+    starts = [{"lat": 39.5605, "lon": 2.6505}, {"lat": 39.6, "lon": 2.7}]
+
+    owner = partition_stations(latest, starts)
+    assert owner.tolist() == [0, 0, 1]
+
+
+def test_validate_fleet_plan_shared_state():
+    context = {
+        "nearby_stations": [
+            {"id": "a101", "free_bikes": 10, "empty_slots": 2},
+            {"id": "b202", "free_bikes": 0, "empty_slots": 8},
+        ]
+    }
+    plan = {
+        "assumptions": {"truck_capacity": 8},
+        "stops": [
+            {"station_id": "a101", "action": "pickup", "bikes": 6},
+            {"station_id": "b202", "action": "dropoff", "bikes": 6},
+        ],
+    }
+
+    # Each plan alone is feasible; together they overdraw a101 and b202
+    assert validate_fleet_plan([plan], context) == []
+    errors = validate_fleet_plan([plan, plan], context)
+    assert [e["truck"] for e in errors] == [1, 1]
+    assert {e["code"] for e in errors} == {"PICKUP_EXCEEDS_AVAILABLE", "DROPOFF_EXCEEDS_CAPACITY"}
+
+    # Plan may not assume more capacity than the truck has
+    errors = validate_fleet_plan([plan], context, truck_capacities=[4])
+    assert errors[0]["code"] == "CAPACITY_EXCEEDED"
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    test_partition_stations()
+    test_validate_fleet_plan_shared_state()
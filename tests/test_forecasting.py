@@ -0,0 +1,90 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from bike_agent.tools.forecasting import (
+    N_SLOTS,
+    cumulative_rates,
+    fit_rates,
+    predict_free_bikes,
+    rates_from_frame,
+    rates_to_frame,
+)
+from bike_agent.tools import feature_backends, get_station_forecast
+from bike_agent.tools.feature_backends import ParquetBackend
+from bike_agent.tools.get_station_forecast import RATES_FEATURE_GROUP, forecast_latest, load_forecaster
+
+
+def _history():
+    # Station a101 gains 1 bike every 15 min, b202 stays constant (local time, 2 days)
+    ts = pd.date_range("2025-06-01 00:00", periods=2 * 96, freq="15min", tz="Europe/Madrid").tz_convert("UTC")
+    rows = []
+    for i, t in enumerate(ts):
+        rows.append({"id": "a101", "timestamp": t, "free_bikes": i % 96, "empty_slots": 100 - i % 96})
+        rows.append({"id": "b202", "timestamp": t, "free_bikes": 5, "empty_slots": 5})
+    return pd.DataFrame(rows)
+
+
+def test_fit_and_forecast():
+    station_ids, rates = fit_rates(_history())
+    assert station_ids.tolist() == ["a101", "b202"]
+    assert rates.shape == (2, N_SLOTS)
+
+    # Round-trip through the storage format
+    ids2, rates2 = rates_from_frame(rates_to_frame(station_ids, rates))
+    assert ids2.tolist() == station_ids.tolist()
+    assert np.allclose(rates, rates2)
+
+    model = {"index": {"a101": 0, "b202": 1}, "rates": rates, "cum": cumulative_rates(rates)}
+    latest = pd.DataFrame([
+        {"id": "a101", "free_bikes": 40, "empty_slots": 60},
+        {"id": "b202", "free_bikes": 5, "empty_slots": 5},
+        {"id": "zzzz", "free_bikes": 3, "empty_slots": 7},  # no model → persistence
+    ])
+    noon = pd.Timestamp("2025-06-03 12:00", tz="Europe/Madrid")
+    fc = forecast_latest(latest, model, now=noon)
+
+    assert fc.loc[0, "free_bikes_60m"] > fc.loc[0, "free_bikes_15m"] > 40
+    assert fc.loc[1, "free_bikes_60m"] == 5
+    assert fc.loc[2, "free_bikes_30m"] == 3
+    assert fc.loc[0, "free_bikes_60m"] + fc.loc[0, "empty_slots_60m"] == 100
+
+
+def test_batch_inference_is_fast():
+    n = 10_000
+    rng = np.random.default_rng(0)
+    rates = rng.normal(0, 0.05, size=(n, N_SLOTS))
+    cum = cumulative_rates(rates)
+    free = rng.integers(0, 20, n)
+
+    t0 = time.perf_counter()
+    out = predict_free_bikes(rates, free, free + 10, minute_now=1430.0, cum=cum)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+
+    assert out.shape == (n, 3)
+    assert elapsed_ms < 100
+
+
+def test_local_backend_rates(tmp_path, monkeypatch):
+    monkeypatch.setenv("FEATURE_BACKEND", "local")
+    monkeypatch.setattr(feature_backends, "FEATURE_STORE_DIR", tmp_path)
+    monkeypatch.setattr(get_station_forecast, "_MODEL", {"loaded_at": 0.0, "model": None})
+
+    # Forecast stage never ran: zero drift instead of a Hopsworks call
+    model = load_forecaster(force=True)
+    assert model["index"] == {} and model["rates"].shape == (0, N_SLOTS)
+
+    station_ids, rates = fit_rates(_history())
+    ParquetBackend().write_group(RATES_FEATURE_GROUP, rates_to_frame(station_ids, rates), primary_key=["id", "slot"])
+    model = load_forecaster(force=True)
+    assert list(model["index"]) == ["a101", "b202"]
+    assert np.allclose(model["rates"], rates)
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    test_fit_and_forecast()
+    test_batch_inference_is_fast()
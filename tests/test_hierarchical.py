@@ -0,0 +1,66 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import bike_agent.tools.hierarchical as hierarchical
+from bike_agent.tools.hierarchical import cluster, hierarchical_table
+from bike_agent.tools.osrm_local import local_table
+
+
+def _points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return 39.57 + rng.uniform(-0.05, 0.05, n), 2.65 + rng.uniform(-0.07, 0.07, n)
+
+
+def test_clusters_respect_max_size():
+    lat, lon = _points(500)
+    for method in ("grid", "kmeans"):
+        labels = cluster(lat, lon, method, max_size=25)
+        assert np.bincount(labels).max() <= 25
+
+
+def test_hierarchical_table_matches_full_table():
+    lat, lon = _points(400)
+    sizes = []
+
+    def table(lat, lon):
+        sizes.append(len(lat))
+        return local_table(lat, lon)
+
+    dist, dur = hierarchical_table(lat, lon, table, max_points=100, max_size=25)
+    full_dist, full_dur = local_table(lat, lon)
+
+    assert max(sizes) <= 100
+    # Routing cost grows linearly: far fewer cells than the full n^2 matrix
+    assert sum(s * s for s in sizes) < 0.2 * len(lat) ** 2
+
+    # The stand-in has one road factor everywhere, so scaled hub legs are exact
+    off = ~np.eye(len(lat), dtype=bool)
+    for approx, exact in ((dist, full_dist), (dur, full_dur)):
+        assert np.isfinite(approx).all()
+        assert np.allclose(approx[off], exact[off], rtol=1e-6)
+
+
+def test_no_n_by_n_temporaries_and_size_guard(monkeypatch):
+    n = 1500
+    lat, lon = _points(n)
+
+    tracemalloc.start()
+    hierarchical_table(lat, lon, local_table, max_points=100, max_size=25)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # The two float64 outputs plus small per-cluster blocks
+    assert peak < 2.5 * 8 * n * n
+
+    monkeypatch.setattr(hierarchical, "OSRM_MAX_MATRIX_POINTS", 1000)
+    with pytest.raises(ValueError, match="OSRM_MAX_MATRIX_POINTS"):
+        hierarchical_table(lat, lon, local_table, max_points=100, max_size=25)
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
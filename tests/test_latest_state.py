@@ -0,0 +1,96 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import bike_agent.tools.latest_state as ls
+from bike_agent.tools.feature_store import get_latest_features
+
+
+def test_publish_and_read(tmp_path, monkeypatch):
+    path = tmp_path / "latest.feather"
+    monkeypatch.setattr(ls, "LATEST_STATE_PATH", path)
+    _fresh_process(monkeypatch)
+
+    assert ls.read_latest() is None
+
+    df = pd.DataFrame([{"id": "a101", "latitude": 39.56, "longitude": 2.65, "free_bikes": 3, "empty_slots": 7}])
+    ls.publish_latest(df)
+    assert path.exists()
+    assert ls.read_latest()["id"].tolist() == ["a101"]
+
+    # Another process publishing is picked up via the shared file
+    _fresh_process(monkeypatch)
+    assert ls.read_latest()["free_bikes"].tolist() == [3]
+
+    # Tools read it without touching Hopsworks
+    assert get_latest_features(api_key=None)["id"].tolist() == ["a101"]
+
+    # Too old → ignored
+    assert ls.read_latest(max_age_s=-1) is None
+
+
+def _fresh_process(monkeypatch):
+    monkeypatch.setattr(ls, "_STATE", {"df": None, "published_at": 0.0, "key": None, "version": None, "rejected": None})
+
+
+def test_304_keeps_snapshot_fresh(tmp_path, monkeypatch):
+    path = tmp_path / "state" / "latest.feather"
+    monkeypatch.setattr(ls, "LATEST_STATE_PATH", path)
+    _fresh_process(monkeypatch)
+
+    ls.publish_latest(pd.DataFrame([{"id": "a101", "free_bikes": 3}]))
+    assert (path.parent.stat().st_mode & 0o777) == 0o700
+
+    # Published 20 minutes ago and unchanged since
+    old = time.time() - 1200
+    os.utime(path, (old, old))
+    _fresh_process(monkeypatch)
+    assert ls.read_latest(max_age_s=900) is None
+    version = ls.latest_version()
+
+    ls.touch_latest()
+    assert ls.read_latest(max_age_s=900)["id"].tolist() == ["a101"]
+    assert ls.latest_version() == version
+
+
+def test_reused_inode_is_reloaded(tmp_path, monkeypatch):
+    path = tmp_path / "state" / "latest.feather"
+    monkeypatch.setattr(ls, "LATEST_STATE_PATH", path)
+    _fresh_process(monkeypatch)
+    ls.publish_latest(pd.DataFrame([{"id": "a101", "free_bikes": 3}]))
+    _fresh_process(monkeypatch)
+    assert ls.read_latest()["free_bikes"].tolist() == [3]
+    version = ls.latest_version()
+
+    # Rewrite in place, as if a later publish had been given the same inode back
+    ino = path.stat().st_ino
+    pd.DataFrame([{"id": "a101", "free_bikes": 4}]).to_feather(path)
+    os.utime(path, ns=(time.time_ns() + 10**9,) * 2)
+    assert path.stat().st_ino == ino
+
+    assert ls.read_latest()["free_bikes"].tolist() == [4]
+    assert ls.latest_version() != version
+
+
+def test_ignores_files_others_can_write(tmp_path, monkeypatch):
+    path = tmp_path / "state" / "latest.feather"
+    monkeypatch.setattr(ls, "LATEST_STATE_PATH", path)
+    _fresh_process(monkeypatch)
+    ls.publish_latest(pd.DataFrame([{"id": "a101", "free_bikes": 3}]))
+
+    path.parent.chmod(0o777)
+    _fresh_process(monkeypatch)
+    assert ls.read_latest() is None
+
+    with pytest.raises(PermissionError):
+        ls.publish_latest(pd.DataFrame([{"id": "a101", "free_bikes": 4}]))
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,66 @@
+import json
+from types import SimpleNamespace
+
+import bike_agent.agent.llm_client as llm_client
+from bike_agent.agent.llm_cache import LLMCache, cache_key
+
+
+class _CountingClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls += 1
+        call = SimpleNamespace(function=SimpleNamespace(
+            name="approve_plan" if kwargs["tools"][0]["function"]["name"] == "approve_plan" else "submit_plan",
+            arguments=json.dumps({"reason": "ok", "expected_score_delta": 0, "assumptions": {}, "stops": []}),
+        ))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=None, tool_calls=[call]))],
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5),
+        )
+
+
+def test_cache_ttl_and_eviction(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.db"), ttl_s=60, max_entries=2)
+    # Whitespace differences in the prompt do not change the key
+    assert cache_key("m", 0.2, 512, "text", "sys  prompt\n", "{}") == cache_key("m", 0.2, 512, "text", "sys prompt", "{}")
+
+    for i in range(3):
+        cache.put(f"k{i}", f"v{i}")
+    assert cache.get("k0") == "v0"
+    assert cache.evict() == 1 and len(cache) == 2
+    assert cache.get("k1") is None
+
+    expired = LLMCache(str(tmp_path / "expired.db"), ttl_s=0)
+    expired.put("k", "v")
+    assert expired.get("k") is None
+
+
+def test_call_llm_uses_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("LLM_BACKEND", "openai")
+    monkeypatch.setenv("LLM_OUTPUT_MODE", "tools")
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm.db"))
+    client = _CountingClient()
+    monkeypatch.setitem(llm_client._STATE, "client", client)
+
+    planner = {"system_prompt": "plan", "user_message": {"context": {"get_nearby_stations": [], "get_distances": {}}},
+               "response_schema": "planner"}
+    first = llm_client.call_llm(planner)
+    assert llm_client.call_llm(planner) == first
+    assert client.calls == 1
+
+    # The critic samples (temperature > 0): always a fresh call
+    critic = {"system_prompt": "critic", "user_message": {"context": {}}, "response_schema": "critic"}
+    llm_client.call_llm(critic)
+    llm_client.call_llm(critic)
+    assert client.calls == 3
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
@@ -53,6 +53,8 @@ def test_orchestrator(monkeypatch):
     # Mock the tools registry calls
     # ----------------------------
     class _Spec:
+        cache = prepare = timeout_s = None
+
         def __init__(self, fn, arg_types=None):
             self.fn = fn
             self.arg_types = arg_types or {}
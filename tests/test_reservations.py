@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+
+from bike_agent.tools.reservations import ReservationLedger, SqliteReservationLedger, subtract_holds
+from bike_agent.tools.validate_plan import validate_plan
+
+
+PLAN = {
+    "assumptions": {"truck_capacity": 10},
+    "stops": [
+        {"station_id": "a101", "action": "pickup", "bikes": 6},
+        {"station_id": "b202", "action": "dropoff", "bikes": 6},
+    ],
+}
+
+CONTEXT = {
+    "nearby_stations": [
+        {"id": "a101", "free_bikes": 8, "empty_slots": 2},
+        {"id": "b202", "free_bikes": 0, "empty_slots": 10},
+    ]
+}
+
+
+def _check_ledger(ledger):
+    since = ledger.seq()
+    assert ledger.reserve("r1", PLAN) == []
+    assert ledger.holds() == {"a101": {"pickup": 6, "dropoff": 0}, "b202": {"pickup": 0, "dropoff": 6}}
+
+    # A second request that read the snapshot before r1 reserved must be rejected
+    errors = ledger.reserve(
+        "r2", PLAN, since=since,
+        check=lambda held: validate_plan(PLAN, CONTEXT, reserved=held),
+    )
+    assert [e["code"] for e in errors] == ["PICKUP_EXCEEDS_AVAILABLE", "DROPOFF_EXCEEDS_CAPACITY"]
+    assert ledger.holds(["a101"]) == {"a101": {"pickup": 6, "dropoff": 0}}
+
+    # Nothing reserved since r1 → no conflict reported
+    assert ledger.holds(since=ledger.seq()) == {}
+
+    assert subtract_holds(CONTEXT["nearby_stations"], ledger.holds())[0]["free_bikes"] == 2
+
+    assert ledger.release("r1") == 2
+    assert ledger.holds() == {}
+
+    # Expired holds are ignored
+    ledger.reserve("r3", PLAN, ttl_s=0.01)
+    time.sleep(0.02)
+    assert ledger.holds() == {}
+
+
+def test_in_memory_ledger():
+    _check_ledger(ReservationLedger())
+
+
+def test_sqlite_ledger(tmp_path):
+    _check_ledger(SqliteReservationLedger(str(tmp_path / "reservations.db")))
+
+
+def test_unreleased_owners_are_swept():
+    ledger = ReservationLedger(sweep_interval_s=0)
+    for i in range(50):
+        ledger.reserve(f"gone{i}", PLAN, ttl_s=0.01)
+    time.sleep(0.02)
+
+    # The next reservation drops owners (and stations) whose holds have all expired
+    ledger.reserve("live", PLAN)
+    assert list(ledger._owners) == ["live"]
+    assert sorted(ledger._stations) == ["a101", "b202"]
+    assert ledger.release("live") == 2
+
+
+class _SlowLedger(ReservationLedger):
+    # Widen the window between taking a seq and the hold becoming visible
+    def _active(self, station_id, now):
+        time.sleep(random.random() * 0.001)
+        return super()._active(station_id, now)
+
+
+def test_seq_never_skips_a_hold_in_flight():
+    ledger = _SlowLedger()
+    done = threading.Event()
+    violations = []
+
+    def reserve(t):
+        for i in range(20):
+            plan = {"stops": [{"station_id": f"s{t}-{i}", "action": "pickup", "bikes": 1}]}
+            ledger.reserve(f"r{t}-{i}", plan)
+
+    def observe():
+        while not done.is_set():
+            since = ledger.seq()
+            # Every hold up to `since` must already be visible, or `since` filters would skip it
+            visible = sum(1 for rs in list(ledger._stations.values()) for r in rs if r.seq <= since)
+            if visible != since:
+                violations.append((since, visible))
+
+    writers = [threading.Thread(target=reserve, args=(t,)) for t in range(8)]
+    observer = threading.Thread(target=observe)
+    observer.start()
+    for w in writers:
+        w.start()
+    for w in writers:
+        w.join()
+    done.set()
+    observer.join()
+
+    assert violations == []
+    assert ledger.seq() == 8 * 20
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_in_memory_ledger()
+    test_unreleased_owners_are_swept()
+    test_seq_never_skips_a_hold_in_flight()
+    with tempfile.TemporaryDirectory() as d:
+        test_sqlite_ledger(Path(d))
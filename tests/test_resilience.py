@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+from dataclasses import dataclass
+
+import pytest
+
+import bike_agent.agent.orchestrator as orch
+import bike_agent.resilience as resilience
+from bike_agent.resilience import (
+    CircuitBreaker,
+    CircuitOpen,
+    DeadlineExceeded,
+    call_with_deadline,
+    check,
+    deadline,
+    remaining,
+)
+
+
+def test_deadlines_nest_and_cancel_slow_calls():
+    with deadline(5):
+        with deadline(60):
+            assert remaining() <= 5
+
+        seen = {}
+
+        def slow():
+            time.sleep(0.3)
+            try:
+                check("slow")
+            except DeadlineExceeded as e:
+                seen["cancelled"] = str(e)
+            done.set()
+
+        done = threading.Event()
+        t0 = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            call_with_deadline(slow, 0.05, "slow")
+        assert time.monotonic() - t0 < 0.25
+
+        # The worker notices the cancellation at its next check
+        done.wait(2)
+        assert "cancelled" in seen["cancelled"]
+
+    with deadline(0):
+        with pytest.raises(DeadlineExceeded):
+            check()
+
+
+def _single_worker_pool(monkeypatch, workers):
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(resilience, "_EXECUTOR", {"pool": pool, "stuck": 0})
+    monkeypatch.setattr(resilience, "DEADLINE_WORKERS", workers)
+    return pool
+
+
+def test_nested_calls_do_not_deadlock(monkeypatch):
+    _single_worker_pool(monkeypatch, workers=4)
+
+    # The outer call holds the only pool worker; the inner one needs its own thread
+    inner = lambda: call_with_deadline(lambda: "login", 1, "hopsworks.login")
+    assert call_with_deadline(inner, 2, "tool") == "login"
+
+
+def test_timed_out_calls_do_not_drain_the_pool(monkeypatch):
+    _single_worker_pool(monkeypatch, workers=2)
+    release = threading.Event()
+
+    with pytest.raises(DeadlineExceeded):
+        call_with_deadline(lambda: release.wait(5), 0.05, "stuck")
+    assert resilience._EXECUTOR["stuck"] == 1
+
+    # The pool's only worker is still stuck, yet new calls complete
+    assert call_with_deadline(lambda: "ok", 1, "next") == "ok"
+
+    release.set()
+    deadline_at = time.monotonic() + 2
+    while resilience._EXECUTOR["stuck"] and time.monotonic() < deadline_at:
+        time.sleep(0.01)
+    assert resilience._EXECUTOR["stuck"] == 0
+
+
+def test_breaker_opens_and_probes():
+    b = CircuitBreaker("backend", failures=2, reset_s=0.1)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            with b.guard():
+                raise ConnectionError("down")
+    assert b.state == "open"
+    with pytest.raises(CircuitOpen):
+        b.allow()
+
+    # Bad input does not count against the backend
+    time.sleep(0.12)
+    with pytest.raises(ValueError):
+        with b.guard():
+            raise ValueError("bad args")
+    assert b.state == "half_open"
+
+    with b.guard():
+        pass
+    assert b.state == "closed"
+
+
+@dataclass
+class _Spec:
+    fn: object
+    arg_types: dict
+    timeout_s: float = None
+    cache: object = None
+    prepare: object = None
+
+
+def test_planner_reports_tool_timeout(monkeypatch):
+    def stuck(**kwargs):
+        time.sleep(1.0)
+
+    monkeypatch.setattr(orch, "get_tool_spec", lambda name: _Spec(fn=stuck, arg_types={}, timeout_s=0.05))
+    outputs = iter([
+        json.dumps({"type": "TOOL_REQUEST", "tool": "get_distances", "args": {}}),
+        json.dumps({"type": "PLAN", "assumptions": {}, "stops": []}),
+    ])
+    monkeypatch.setattr(orch, "call_llm", lambda _: next(outputs))
+    monkeypatch.setattr(orch, "_traced_validate", lambda plan, ctx, source: [])
+
+    user_context = {}
+    t0 = time.monotonic()
+    plan = orch.planner_step(user_context, "", max_steps=2)
+    assert time.monotonic() - t0 < 0.5
+    assert plan["type"] == "PLAN"
+    assert user_context["tool_errors"][0]["tool"] == "get_distances"
+
+
+def test_planner_retries_empty_output(monkeypatch):
+    # parse_response returns None when the model sends no content
+    outputs = iter([None, json.dumps({"type": "PLAN", "assumptions": {}, "stops": []})])
+    monkeypatch.setattr(orch, "call_llm", lambda _: next(outputs))
+    monkeypatch.setattr(orch, "_traced_validate", lambda plan, ctx, source: [])
+
+    user_context = {}
+    assert orch.planner_step(user_context, "", max_steps=2)["type"] == "PLAN"
+    assert user_context["validation_errors"][0]["code"] == "EMPTY_OUTPUT"
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
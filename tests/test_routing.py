@@ -0,0 +1,41 @@
+import json
+
+from bike_agent.agent import routing
+from bike_agent.agent.llm_client import call_llm
+from bike_agent.agent.routing import call_role, reload_routes, route_stats
+
+
+def test_roles():
+    planner = {"response_schema": "planner", "user_message": {"context": {}}}
+    assert call_role(planner) == "planner_tool"
+
+    ready = {"get_nearby_stations": [], "get_distances": {}}
+    assert call_role({**planner, "user_message": {"context": ready}}) == "planner_plan"
+    assert call_role({**planner, "user_message": {"context": {}, "validation_errors": [{}]}}) == "planner_plan"
+    assert call_role({"response_schema": "critic"}) == "critic"
+    assert call_role({}) == "default"
+
+
+def test_overrides_and_stats(monkeypatch):
+    monkeypatch.setenv("LLM_ROUTES", json.dumps({"planner_plan": {"model": "big-model", "max_tokens": 2048}}))
+    try:
+        table = reload_routes()
+        assert table["planner_plan"].model == "big-model" and table["planner_plan"].max_tokens == 2048
+        assert table["planner_tool"].model == routing.DEFAULT_MODEL
+    finally:
+        monkeypatch.delenv("LLM_ROUTES")
+        reload_routes()
+
+    monkeypatch.setenv("LLM_BACKEND", "scripted")
+    routing.reset_stats()
+    call_llm({"response_schema": "planner", "user_message": {"start_coordinates": {"lat": 39.5, "lon": 2.6}}})
+    stats = route_stats()
+    assert stats["planner_tool"]["calls"] == 1 and stats["planner_tool"]["models"] == {"standin:scripted": 1}
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
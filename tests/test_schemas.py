@@ -0,0 +1,82 @@
+import json
+from types import SimpleNamespace
+
+import bike_agent.agent.llm_client as llm_client
+from bike_agent.agent.schemas import output_token_budget, response_functions, to_output
+
+
+def _assert_strict(schema):
+    if "object" in schema.get("type", ()):
+        assert schema["additionalProperties"] is False
+        assert sorted(schema["required"]) == sorted(schema["properties"])
+        for sub in schema["properties"].values():
+            _assert_strict(sub)
+    if "array" in schema.get("type", ()):
+        _assert_strict(schema["items"])
+
+
+def test_functions_are_strict():
+    planner = response_functions("planner")
+    names = [f["function"]["name"] for f in planner]
+    assert "get_distances" in names and names[-1] == "submit_plan"
+    for f in planner + response_functions("critic"):
+        assert f["function"]["strict"] is True
+        _assert_strict(f["function"]["parameters"])
+
+    distances = next(f for f in planner if f["function"]["name"] == "get_distances")
+    # Optional argument: nullable, dropped when null
+    assert distances["function"]["parameters"]["properties"]["start_coordinates"]["type"] == ["object", "null"]
+    out = to_output("planner", "get_distances", json.dumps({"stations": [], "start_coordinates": None}))
+    assert out == {"type": "TOOL_REQUEST", "tool": "get_distances", "args": {"stations": []}}
+
+
+def test_token_budget_grows_with_context():
+    small = output_token_budget({"context": {}})
+    large = output_token_budget({"context": {"nearby_stations": [{"id": str(i)} for i in range(50)]}})
+    # Never below the fixed budget free-text responses had
+    assert 512 <= small < large <= 4096
+
+
+class _FakeClient:
+    def __init__(self, name, arguments):
+        self.kwargs = None
+        call = SimpleNamespace(function=SimpleNamespace(name=name, arguments=arguments))
+        self.response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=None, tool_calls=[call]))],
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5),
+        )
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.kwargs = kwargs
+        return self.response
+
+
+def test_call_llm_returns_protocol_json(monkeypatch):
+    monkeypatch.setenv("LLM_BACKEND", "openai")
+    monkeypatch.setenv("LLM_OUTPUT_MODE", "tools")
+    client = _FakeClient("approve_plan", json.dumps({"reason": "ok", "expected_score_delta": 0}))
+    monkeypatch.setitem(llm_client._STATE, "client", client)
+
+    out = llm_client.call_llm({"system_prompt": "", "user_message": {"context": {}}, "response_schema": "critic"})
+    assert json.loads(out) == {"type": "APPROVED", "reason": "ok", "expected_score_delta": 0}
+    assert client.kwargs["tool_choice"] == "required"
+    assert client.kwargs["max_tokens"] == output_token_budget({"context": {}})
+
+
+def test_text_mode_keeps_fixed_budget(monkeypatch):
+    monkeypatch.setenv("LLM_OUTPUT_MODE", "text")
+    stations = [{"id": str(i)} for i in range(50)]
+    _, body = llm_client.build_request({
+        "system_prompt": "", "user_message": {"context": {"nearby_stations": stations}}, "response_schema": "planner",
+    })
+    assert body["max_tokens"] == 512
+    assert "tools" not in body
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,54 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+import bike_agent.agent.serialization as ser
+from bike_agent.agent.orchestrator import serialize_tool_result
+from bike_agent.tools.station_table import StationTable
+
+
+def test_dumps_compact_and_numpy():
+    text = ser.dumps({"a": np.int64(3), "b": np.array([1.5, 2.5]), "c": "Palma"})
+    assert json.loads(text) == {"a": 3, "b": [1.5, 2.5], "c": "Palma"}
+    assert " " not in text
+
+
+def test_encode_value_matches_records():
+    df = pd.DataFrame([{"id": "a101", "free_bikes": 3, "distance_km": 0.25}])
+    table = StationTable.from_columns(["a101"], latitude=[39.57], longitude=[2.65], free_bikes=[3], empty_slots=[7])
+
+    assert json.loads(ser.encode_value(df)) == df.to_dict(orient="records")
+    # distance_km is omitted when the table has none, like to_records()
+    assert json.loads(ser.encode_value(table)) == table.to_records()
+
+
+def test_message_reuses_cached_tool_results(monkeypatch):
+    df = pd.DataFrame([{"id": "a101", "free_bikes": 3}, {"id": "b202", "free_bikes": 0}])
+    serialized = serialize_tool_result(df)
+
+    calls = []
+    encode_value = ser.encode_value
+    monkeypatch.setattr(ser, "encode_value", lambda v: calls.append(v) or encode_value(v))
+
+    message = {"user_request": "rebalance", "context": {"get_station_features": serialized}}
+    first = ser.encode_message(message)
+    message["validation_errors"] = [{"code": "UNKNOWN_STATION"}]
+    second = ser.encode_message(message)
+
+    # Encoded once, from the DataFrame itself
+    assert len(calls) == 1 and calls[0] is df
+    assert json.loads(first) == {"user_request": "rebalance", "context": {"get_station_features": serialized}}
+    assert json.loads(second)["validation_errors"] == [{"code": "UNKNOWN_STATION"}]
+
+    # Unregistered (replaced) context entries are encoded fresh
+    message["context"]["get_station_features"] = [{"id": "a101", "free_bikes": 9}]
+    assert json.loads(ser.encode_message(message))["context"]["get_station_features"][0]["free_bikes"] == 9
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
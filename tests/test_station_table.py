@@ -0,0 +1,85 @@
+import pandas as pd
+
+import bike_agent.tools.get_nearby_stations as gns
+from bike_agent.agent.orchestrator import serialize_tool_result
+from bike_agent.tools.reservations import ReservationLedger
+from bike_agent.tools.score_plan import score_plan
+from bike_agent.tools.station_table import StationTable, station_table
+from bike_agent.tools.validate_plan import validate_plan
+
+
+LATEST = pd.DataFrame([
+    {"id": "a101", "latitude": 39.5700, "longitude": 2.6500, "free_bikes": 8, "empty_slots": 2},
+    {"id": "b202", "latitude": 39.5710, "longitude": 2.6510, "free_bikes": 1, "empty_slots": 9},
+    {"id": "c303", "latitude": 39.9000, "longitude": 2.9000, "free_bikes": 5, "empty_slots": 5},
+])
+
+
+def _nearby(monkeypatch, ledger=None):
+    monkeypatch.setattr(gns, "get_latest_features", lambda api_key, columns=None: LATEST[columns].copy())
+    monkeypatch.setattr(gns, "get_ledger", lambda: ledger or ReservationLedger())
+    return gns.get_nearby_stations(8, 2.0, 39.5696, 2.6502)
+
+
+def test_nearby_returns_table(monkeypatch):
+    table = _nearby(monkeypatch)
+
+    assert isinstance(table, StationTable)
+    assert table.ids == ["a101", "b202"]
+    assert table.data["free_bikes"].tolist() == [8, 1]
+
+    records = serialize_tool_result(table)
+    assert records[0]["id"] == "a101"
+    assert set(records[0]) == {"id", "latitude", "longitude", "free_bikes", "empty_slots", "distance_km"}
+
+    # Validation/scoring get the original table back, not a rebuilt one
+    assert station_table({"nearby_stations": records}) is table
+
+
+def test_nearby_subtracts_holds(monkeypatch):
+    ledger = ReservationLedger()
+    ledger.reserve("other", {"stops": [{"station_id": "a101", "action": "pickup", "bikes": 5}]})
+
+    table = _nearby(monkeypatch, ledger)
+    assert table.data["free_bikes"].tolist() == [3, 1]
+
+
+def test_validate_and_score_on_table(monkeypatch):
+    context = {"nearby_stations": serialize_tool_result(_nearby(monkeypatch))}
+    plan = {
+        "assumptions": {"truck_capacity": 10},
+        "stops": [
+            {"station_id": "a101", "action": "pickup", "bikes": 6},
+            {"station_id": "b202", "action": "dropoff", "bikes": 6},
+        ],
+    }
+
+    assert validate_plan(plan, context) == []
+    assert score_plan(plan, context)["score"] == 6
+
+    # Simulation works on copies: the shared table is unchanged
+    assert station_table(context).data["free_bikes"].tolist() == [8, 1]
+
+    plan["stops"][1]["bikes"] = 12
+    codes = [e["code"] for e in validate_plan(plan, context)]
+    assert codes == ["DROPOFF_EXCEEDS_CAPACITY"]
+
+    # Unknown stations are skipped by scoring, reported by validation
+    plan["stops"].append({"station_id": "zzzz", "action": "dropoff", "bikes": 1})
+    assert score_plan(plan, context)["score"] == 12
+    assert "UNKNOWN_STATION" in [e["code"] for e in validate_plan(plan, context)]
+
+
+def test_plain_records_context():
+    context = {"nearby_stations": [{"id": "a101", "free_bikes": 2, "empty_slots": 1}]}
+    plan = {"assumptions": {"truck_capacity": 5}, "stops": [{"station_id": "a101", "action": "pickup", "bikes": 3}]}
+
+    assert [e["code"] for e in validate_plan(plan, context)] == ["PICKUP_EXCEEDS_AVAILABLE"]
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,96 @@
+import json
+
+import pandas as pd
+
+import bike_agent.agent.orchestrator as orch
+import bike_agent.tools.feature_store as fs
+import bike_agent.tools.get_nearby_stations as gns
+import bike_agent.tools.reservations as reservations
+from bike_agent.tools.feature_store import use_snapshot
+from bike_agent.tools.registry import clear_tool_caches, get_tool_spec
+from bike_agent.tools.reservations import ReservationLedger
+from bike_agent.tools.tool_cache import CachePolicy, ToolCache, station_key
+
+
+SNAPSHOT = pd.DataFrame([
+    {"id": "a101", "latitude": 39.5700, "longitude": 2.6500, "free_bikes": 8, "empty_slots": 2},
+    {"id": "b202", "latitude": 39.5710, "longitude": 2.6510, "free_bikes": 1, "empty_slots": 9},
+]).assign(timestamp=pd.Timestamp("2025-01-01", tz="UTC"))
+
+
+def _nearby_request(lat):
+    return json.dumps({
+        "type": "TOOL_REQUEST",
+        "tool": "get_nearby_stations",
+        "args": {"k": 8, "radius_km": 2.0, "lat": lat, "lon": 2.6502},
+    })
+
+
+def test_planner_reuses_near_identical_tool_calls(monkeypatch):
+    clear_tool_caches()
+    ledger = ReservationLedger()
+    monkeypatch.setattr(reservations, "get_ledger", lambda: ledger)
+    monkeypatch.setattr(gns, "get_ledger", lambda: ledger)
+
+    reads = []
+    real = gns.get_latest_features
+    monkeypatch.setattr(gns, "get_latest_features", lambda *a, **kw: reads.append(1) or real(*a, **kw))
+
+    plan = {
+        "type": "PLAN",
+        "assumptions": {"truck_capacity": 10, "time_budget_min": 60},
+        "stops": [
+            {"station_id": "a101", "action": "pickup", "bikes": 5},
+            {"station_id": "b202", "action": "dropoff", "bikes": 5},
+        ],
+    }
+    # Same request again, 1 m further north: served from the cache
+    outputs = iter([_nearby_request(39.5696), _nearby_request(39.569609), json.dumps(plan)])
+    monkeypatch.setattr(orch, "call_llm", lambda _: next(outputs))
+
+    with use_snapshot(SNAPSHOT):
+        orch.planner_step({"start_coordinates": {"lat": 39.5696, "lon": 2.6502}}, "", max_steps=3)
+        assert len(reads) == 1
+        assert get_tool_spec("get_nearby_stations").cache.stats()["hits"] == 1
+
+        # New reservations change what the tool returns
+        ledger.reserve("r1", plan)
+        outputs = iter([_nearby_request(39.5696), json.dumps(plan)])
+        monkeypatch.setattr(orch, "call_llm", lambda _: next(outputs))
+        ctx = {"start_coordinates": {"lat": 39.5696, "lon": 2.6502}}
+        try:
+            orch.planner_step(ctx, "", max_steps=1)
+        except RuntimeError:
+            pass
+        assert len(reads) == 2
+        assert ctx["context"]["get_nearby_stations"][0]["free_bikes"] == 3
+
+    # A different snapshot is a different version
+    with use_snapshot(SNAPSHOT.copy()):
+        assert fs.snapshot_version() != ("snapshot", fs._pinned_version(SNAPSHOT))
+
+
+def test_cache_policy_normalizes_and_bounds():
+    cache = ToolCache(CachePolicy(normalize=lambda a: station_key(a["station_ids"]), max_entries=2))
+    cache.put(cache.key({"station_ids": ["b", "a"]}), "ab")
+    assert cache.get(cache.key({"station_ids": ["a", "b"]})) == "ab"
+
+    cache.put(cache.key({"station_ids": ["c"]}), "c")
+    cache.put(cache.key({"station_ids": ["d"]}), "d")
+    assert cache.get(cache.key({"station_ids": ["a", "b"]})) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_ratio": 0.5, "entries": 2}
+
+    # Unnormalizable args are never cached
+    assert cache.key({}) is None
+
+    expired = ToolCache(CachePolicy(normalize=lambda a: a["x"], ttl_s=0))
+    expired.put(expired.key({"x": 1}), "v")
+    assert expired.get(expired.key({"x": 1})) is None
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
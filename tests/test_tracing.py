@@ -0,0 +1,83 @@
+import json
+
+import bike_agent.agent.orchestrator as orch_mod
+import bike_agent.tracing as tracing
+from bike_agent.tracing import incr, span, start_trace
+
+
+def test_spans_nest_and_summarise():
+    with start_trace("orchestration") as trace:
+        with span("planner"):
+            with span("llm.call", model="m") as s:
+                s.set(prompt_tokens=100, completion_tokens=20)
+            with span("tool.get_nearby_stations"):
+                incr("cache_hits", 3)
+            with span("validate"):
+                pass
+        with span("critic"):
+            with span("llm.call", model="m") as s:
+                s.set(prompt_tokens=50, completion_tokens=5)
+
+    summary = trace.summary()
+    assert set(summary["phases_ms"]) == {"planner", "critic"}
+    assert summary["llm"]["calls"] == 2
+    assert summary["llm"]["prompt_tokens"] == 150 and summary["llm"]["completion_tokens"] == 25
+    assert summary["tools"]["get_nearby_stations"]["cache_hits"] == 3
+    assert summary["validations"]["calls"] == 1
+
+    names = {s.span_id: s.name for s in trace.spans}
+    llm = [s for s in trace.spans if s.name == "llm.call"]
+    assert [names[s.parent_id] for s in llm] == ["planner", "critic"]
+
+
+def test_untraced_spans_are_noops():
+    with span("tool.x") as s:
+        incr("cache_hits")
+    assert s.attrs == {"cache_hits": 1}
+
+
+def test_errors_are_recorded():
+    try:
+        with start_trace("orchestration") as trace:
+            with span("planner"):
+                raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert {s.name: s.error for s in trace.spans}["planner"] == "RuntimeError: boom"
+
+
+def test_jsonl_and_otlp_export(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_EXPORT", "jsonl")
+    monkeypatch.setattr(tracing, "TRACE_JSONL_PATH", path)
+
+    with start_trace("orchestration") as trace:
+        with span("planner", step=1):
+            pass
+
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["name"] for r in rows] == ["planner", "orchestration"]
+    assert rows[0]["parent_id"] == rows[1]["span_id"]
+
+    spans = tracing.otlp_payload(trace)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert spans[0]["traceId"] == trace.trace_id
+    assert spans[0]["attributes"] == [{"key": "step", "value": {"intValue": "1"}}]
+
+
+def test_run_orchestration_returns_summary(monkeypatch):
+    plan = {"assumptions": {"truck_capacity": 10}, "stops": []}
+    monkeypatch.setattr(orch_mod, "planner_step", lambda *a, **k: plan)
+    monkeypatch.setattr(orch_mod, "improve_with_critic", lambda **k: (plan, {"score": 0}))
+
+    out = orch_mod.run_orchestration({"user_request": "x", "start_coordinates": {"lat": 39.57, "lon": 2.65}})
+
+    assert set(out["trace"]["phases_ms"]) == {"planner", "critic", "reserve"}
+    assert out["trace"]["total_ms"] >= 0
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
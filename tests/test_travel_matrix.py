@@ -0,0 +1,84 @@
+import numpy as np
+
+import bike_agent.tools.travel_matrix as travel_matrix
+from bike_agent.tools.get_distances import distances_from_matrix
+from bike_agent.tools.registry import get_tool_spec
+from bike_agent.tools.score_plan import score_plan
+from bike_agent.tools.travel_matrix import legs
+from bike_agent.tools.validate_plan import validate_plan
+
+IDS = ["start", "a", "b"]
+# One-way street: a -> b takes 40 min, b -> a only 4
+DURATIONS_S = np.array([
+    [0, 300, 600],
+    [300, 0, 2400],
+    [600, 240, 0],
+], dtype=float)
+MATRIX = {"ids": IDS, "distances_m": DURATIONS_S * 8.0, "durations_s": DURATIONS_S}
+
+STATIONS = [
+    {"id": "a", "latitude": 39.57, "longitude": 2.65, "free_bikes": 8, "empty_slots": 2},
+    {"id": "b", "latitude": 39.58, "longitude": 2.66, "free_bikes": 0, "empty_slots": 10},
+]
+
+
+def _plan(first, second):
+    return {
+        "assumptions": {"truck_capacity": 10, "time_budget_min": 30},
+        "stops": [
+            {"station_id": first, "action": "pickup" if first == "a" else "dropoff", "bikes": 0},
+            {"station_id": second, "action": "pickup" if second == "a" else "dropoff", "bikes": 0},
+        ],
+    }
+
+
+def test_undirected_by_default(monkeypatch):
+    monkeypatch.delenv("DIRECTED_DISTANCES", raising=False)
+    distances = distances_from_matrix(MATRIX, IDS)
+    assert "matrix_id" not in distances
+    assert legs(distances)("a", "b") == legs(distances)("b", "a")
+
+
+def test_directed_legs_in_validation_and_scoring(monkeypatch):
+    monkeypatch.delenv("DIRECTED_DISTANCES", raising=False)
+    undirected = distances_from_matrix(MATRIX, IDS)
+    monkeypatch.setenv("DIRECTED_DISTANCES", "1")
+    distances = distances_from_matrix(MATRIX, IDS)
+    # The LLM sees the same averaged pairs either way
+    assert distances["pairs"] == undirected["pairs"]
+
+    leg = legs(distances)
+    assert leg("a", "b")[1] == 40.0 and leg("b", "a")[1] == 4.0
+
+    context = {"nearby_stations": STATIONS, "get_distances": distances}
+    slow = _plan("a", "b")  # 5 + 40 min
+    fast = _plan("b", "a")  # 10 + 4 min
+    assert [e["code"] for e in validate_plan(slow, context)] == ["TIME_BUDGET_EXCEEDED"]
+    assert validate_plan(fast, context) == []
+    assert score_plan(fast, context)["route_minutes"] == 14.0
+
+
+def test_matrix_id_is_stable_and_eviction_is_reported(monkeypatch):
+    monkeypatch.setenv("DIRECTED_DISTANCES", "1")
+    distances = distances_from_matrix(MATRIX, IDS)
+    # Same matrix, same id: prompts carrying it stay cacheable
+    assert distances_from_matrix(MATRIX, IDS)["matrix_id"] == distances["matrix_id"]
+
+    cache = get_tool_spec("get_distances").cache
+    key = ("test-key", None)
+    cache.put(key, distances)
+    assert cache.get(key) is distances
+
+    monkeypatch.setattr(travel_matrix, "_STORE", travel_matrix.OrderedDict())
+    context = {"nearby_stations": STATIONS, "get_distances": distances}
+    assert [e["code"] for e in validate_plan(_plan("b", "a"), context)] == ["DISTANCE_MATRIX_EXPIRED"]
+    assert "expired" in score_plan(_plan("b", "a"), context)["warnings"][0]
+    assert cache.get(key) is None
+
+
+# -------------------------------
+# RUN TEST
+# -------------------------------
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])